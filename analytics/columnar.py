@@ -0,0 +1,233 @@
+# analytics/columnar.py
+
+import threading
+
+import numpy as np
+from django.db import connection
+
+from consultas.services import FilterManager
+from dashboard.services.dataset_version import get_dataset_version
+from dashboard.services.snapshots import get_current_snapshot, get_snapshot_dir
+
+# Columnas categóricas que se pueden filtrar con `campo__in` (códigos de 8 bits)
+FILTER_COLUMNS = ['job', 'marital', 'education', 'contact']
+# Columnas numéricas (con el tipo más angosto del snapshot) y booleanas (`success`: poutcome = 'success')
+NUMERIC_COLUMNS = ['age', 'campaign', 'duration']
+BOOLEAN_COLUMNS = ['y', 'default', 'housing', 'loan', 'success']
+
+
+class ColumnarDataset:
+    """
+    Vista de `CampaignRecord` en arreglos de NumPy, para calcular los KPIs
+    sin consultar la base de datos.
+
+    Se arma una vez por versión del dataset y dimensiones (ver
+    `get_columnar_dataset`) a partir del snapshot columnar de esa versión,
+    sin leer los registros de la base de datos: los números y los booleanos son las columnas del
+    snapshot (mapeadas en memoria), las categóricas sus códigos corridos en
+    uno (0 queda para NULL) y cada dimensión de gráfico se calcula con NumPy
+    sobre los valores distintos de su columna (ver
+    `KpiManager.COLUMNAR_DIMENSIONS`), unos 15 bytes por registro en memoria.
+    Los filtros de `FilterManager` se evalúan como máscaras booleanas y cada
+    gráfico es un `np.bincount` sobre los códigos de su dimensión.
+    """
+
+    def __init__(self, version, columns, categories, dimensions, labels, discard_null):
+        self.version = version
+        self.columns = columns
+        self.categories = categories  # campo -> (códigos, etiqueta de cada código)
+        self.dimensions = dimensions  # alias -> códigos (0 = etiqueta NULL)
+        self.labels = labels  # alias -> etiquetas ordenadas como en la base de datos
+        self.discard_null = discard_null
+        self.rows = len(columns['y'])
+
+    @classmethod
+    def from_snapshot(cls, snapshot, dimensions):
+        """
+        Arma el dataset de `snapshot` (un `DatasetSnapshot`). `dimensions` es
+        `KpiManager.COLUMNAR_DIMENSIONS` (alias -> (columna, etiquetas,
+        descartar NULL)).
+        """
+        distinct = {}
+
+        def distinct_values(name):
+            # Valores distintos de la columna (decodificados) y la posición de cada fila entre ellos
+            if name not in distinct:
+                uniques, inverse = np.unique(snapshot.column(name), return_inverse=True)
+                values = uniques.tolist()
+                if name in snapshot.meta['categories']:
+                    categories = snapshot.categories(name)
+                    values = [categories[code] if code >= 0 else None for code in values]
+                distinct[name] = values, inverse
+            return distinct[name]
+
+        dimension_codes, by_code = {}, {}
+        for alias, (column, labels_of, _) in dimensions.items():
+            values, inverse = distinct_values(column)
+            labels = labels_of(values)
+            codes = {}  # etiqueta -> código (0 queda para NULL)
+            lookup = np.array([0 if label is None else codes.setdefault(label, len(codes) + 1) for label in labels], dtype=np.uint8)
+            dimension_codes[alias] = lookup[inverse]
+            by_code[alias] = [None] + list(codes)
+
+        order = cls._label_order([label for labels in by_code.values() for label in labels[1:] if isinstance(label, str)])
+        ordered = {
+            alias: sorted(
+                range(1, len(by_code[alias])),
+                key=lambda code, alias=alias: order.get(by_code[alias][code], by_code[alias][code]),
+            )
+            for alias in dimensions
+        }
+
+        # Códigos del snapshot corridos en uno: -1 (valor fuera de las categorías) pasa a 0
+        categories = {
+            name: ((snapshot.column(name).astype(np.int16) + 1).astype(np.uint8), [None] + snapshot.categories(name))
+            for name in FILTER_COLUMNS
+        }
+        poutcome = snapshot.categories('poutcome')
+        success_code = poutcome.index('success') if 'success' in poutcome else -2
+        columns = {name: snapshot.column(name) for name in [*NUMERIC_COLUMNS, 'y', 'default', 'housing', 'loan']}
+        columns['success'] = snapshot.column('poutcome') == success_code
+        return cls(
+            snapshot.meta.get('dataset_version'),
+            columns,
+            categories,
+            dimension_codes,
+            {alias: (by_code[alias], ordered[alias]) for alias in dimensions},
+            {alias: discard for alias, (_, _, discard) in dimensions.items()},
+        )
+
+    @staticmethod
+    def _label_order(labels):
+        """
+        Posición de cada etiqueta de texto según el ORDER BY de la base de
+        datos, para que los gráficos salgan en el mismo orden (la intercalación
+        puede ignorar espacios y signos, así que no basta con `sorted`).
+        """
+        labels = sorted(set(labels))
+        if not labels:
+            return {}
+        values_sql = ', '.join(['(%s)'] * len(labels))
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT label FROM (VALUES {values_sql}) AS labels(label) ORDER BY label', labels)
+            return {label: position for position, (label,) in enumerate(cursor.fetchall())}
+
+    def mask(self, filters):
+        """
+        Traduce los filtros de `FilterManager.apply_filters` a una máscara
+        booleana (None si no hay filtros activos, False si alguno no se puede
+        evaluar sobre las columnas cargadas).
+        """
+        filters = dict(filters)
+        mask = None
+
+        def combine(condition):
+            return condition if mask is None else mask & condition
+
+        y_value = filters.pop('y', None)
+        if y_value:
+            y_value = y_value[0] if isinstance(y_value, list) else y_value
+            y = self.columns['y']
+            mask = combine(y if y_value.lower() == 'yes' else ~y)
+
+        for field, compare in (('age_min', np.greater_equal), ('age_max', np.less_equal)):
+            value = filters.pop(field, None)
+            if value:
+                value = value[0] if isinstance(value, list) else value
+                if str(value).isdigit():
+                    mask = combine(compare(self.columns['age'], int(value)))
+
+        for field, values in filters.items():
+            if not values or field in FilterManager.IGNORED_PARAMS:
+                continue
+            if field not in FILTER_COLUMNS:
+                return False
+            column_codes, by_code = self.categories[field]
+            wanted = [code for code, label in enumerate(by_code) if code and label in values]
+            mask = combine(np.isin(column_codes, wanted))
+        return mask
+
+    def aggregate(self, filters):
+        """
+        Devuelve `(totales, grupos)` con la misma forma que
+        `KpiManager._aggregate_single_pass`, o None si algún filtro no se
+        puede evaluar en memoria.
+        """
+        mask = self.mask(filters)
+        if mask is False:
+            return None
+        columns = self.columns
+        if mask is None:
+            mask = np.ones(self.rows, dtype=np.bool_)
+        converted = mask & columns['y']
+        success = mask & columns['success']
+
+        total = int(np.count_nonzero(mask))
+        duration_sum = int(columns['duration'].sum(where=mask, dtype=np.int64))
+        totals = {
+            'total': total,
+            'yes': int(np.count_nonzero(converted)),
+            'campaign_sum': int(columns['campaign'].sum(where=mask, dtype=np.int64)),
+            'duration_avg': duration_sum / total if total else None,
+            'success_outcome': int(np.count_nonzero(success)),
+            'success_outcome_yes': int(np.count_nonzero(success & columns['y'])),
+            'default_yes': int(np.count_nonzero(mask & columns['default'])),
+            'housing_yes': int(np.count_nonzero(mask & columns['housing'])),
+            'loan_yes': int(np.count_nonzero(mask & columns['loan'])),
+        }
+
+        groups = {}
+        for alias, codes in self.dimensions.items():
+            by_code, ordered = self.labels[alias]
+            totals_by_code = np.bincount(codes[mask], minlength=len(by_code))
+            yes_by_code = np.bincount(codes[converted], minlength=len(by_code))
+            # La etiqueta NULL va al final, como en el ORDER BY de PostgreSQL
+            codes_in_order = ordered if self.discard_null[alias] else ordered + [0]
+            groups[alias] = [
+                (by_code[code], int(totals_by_code[code]), int(yes_by_code[code]))
+                for code in codes_in_order if totals_by_code[code]
+            ]
+        return totals, groups
+
+
+_lock = threading.Lock()
+_load_lock = threading.Lock()
+_dataset = None  # ((directorio de snapshots, versión del dataset, dimensiones), ColumnarDataset)
+
+
+def get_columnar_dataset(dimensions):
+    """
+    Devuelve el `ColumnarDataset` de la versión actual del dataset, o None
+    si el snapshot vigente no corresponde a esa versión (p. ej. mientras se
+    escribe el de una importación recién confirmada): entonces los KPIs se
+    calculan en la base de datos.
+
+    El dataset se arma una sola vez por versión, dimensiones y proceso. Las
+    consultas de la versión ya cargada no toman ningún lock; la carga de una
+    versión nueva se hace fuera de `_lock` (las cargas se turnan en
+    `_load_lock`) y solo el reemplazo se hace bajo `_lock`.
+    """
+    global _dataset
+    version = get_dataset_version()
+    key = (get_snapshot_dir(), version, tuple(dimensions))
+    cached = _dataset
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    with _load_lock:
+        cached = _dataset
+        if cached is not None and cached[0] == key:
+            return cached[1]  # Otro hilo la cargó mientras se esperaba
+        snapshot = get_current_snapshot(key[0])
+        if snapshot is None or snapshot.meta.get('dataset_version') != version:
+            return None
+        dataset = ColumnarDataset.from_snapshot(snapshot, dimensions)
+        with _lock:
+            _dataset = (key, dataset)
+    return dataset
+
+
+def clear_columnar_dataset():
+    global _dataset
+    with _lock:
+        _dataset = None
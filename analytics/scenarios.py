@@ -0,0 +1,55 @@
+# analytics/scenarios.py
+
+import numpy as np
+
+
+def parse_grid(text):
+    """
+    Lee una grilla de valores: una lista `a,b,c` o un rango `inicio:fin:cantidad`
+    (`cantidad` valores equiespaciados, extremos incluidos). ValueError si no
+    es válida.
+    """
+    try:
+        if ':' in text:
+            start, stop, count = text.split(':')
+            count = int(count)
+            if count < 1:
+                raise ValueError
+            values = np.linspace(float(start), float(stop), count)
+        else:
+            values = np.array([float(value) for value in text.split(',')])
+    except ValueError:
+        raise ValueError(f"Grilla inválida: {text!r}") from None
+    if not np.isfinite(values).all():
+        raise ValueError(f"Grilla inválida: {text!r}")
+    return values
+
+
+def profit_surface(totals, gains, costs):
+    """
+    Rentabilidad de cada escenario (ganancia por conversión G, costo por
+    llamada C) a partir de los totales de `KpiManager.get_totals`, con la
+    misma fórmula que `rentabilidad_proyectada` y `ganancia_por_llamada`:
+    `yes * G - total * C` y esa cifra dividida por la suma de `campaign`.
+
+    Las superficies se calculan por broadcasting (filas = ganancias,
+    columnas = costos), sin recorrer los escenarios uno por uno.
+    """
+    total, yes, calls = totals['total'], totals['yes'], totals['campaign_sum']
+    profit = yes * gains[:, np.newaxis] - total * costs[np.newaxis, :]
+    per_call = profit / (calls if calls > 0 else 1)
+    best_gain, best_cost = np.unravel_index(np.argmax(profit), profit.shape)
+    return {
+        'ganancias': gains.tolist(),
+        'costos': costs.tolist(),
+        'base': {'total_contactos': total, 'clientes_aceptaron': yes, 'llamadas': calls},
+        # Redondeados: con cientos de miles de celdas, el JSON es la parte más costosa
+        'rentabilidad': profit.round(2).tolist(),
+        'ganancia_por_llamada': per_call.round(4).tolist(),
+        # Costo por llamada a partir del cual cada ganancia deja de ser rentable
+        'costo_equilibrio': (yes * gains / total).tolist() if total else [None] * len(gains),
+        'mejor_escenario': {
+            'ganancia': float(gains[best_gain]), 'costo': float(costs[best_cost]),
+            'rentabilidad': float(profit[best_gain, best_cost]),
+        },
+    }
@@ -1,25 +1,193 @@
 # analytics/services.py
 
-from django.db import models
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from statistics import NormalDist
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, models
 from django.db.models import (
     Avg, Count, Sum, Case, When, Value, IntegerField, F, Q, FloatField
 )
-from django.db.models.functions import Coalesce, Cast
+from django.db.models.functions import Coalesce, Cast, NullIf
 from collections import OrderedDict
 
+from dashboard.models import CampaignCube
+from .columnar import get_columnar_dataset
+from dashboard.services.async_db import limit_db_concurrency
+from dashboard.services.binning import DEFAULT_BINS
+from dashboard.services.cube import CUBE_FILTER_FIELDS, age_band_range, cube_is_built
+from dashboard.services.dataset_version import aget_dataset_version, get_dataset_version
+from consultas.services import FilterManager
+
+MONTHS_ORDER = ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+
+
 class KpiManager:
     """
     GestorKPIs: Calcula todas las métricas y datos para gráficos
     a partir de un QuerySet filtrado de CampaignRecord.
+
+    En PostgreSQL todo se calcula en una sola consulta (`single_pass=True`,
+    ver `_get_all_kpis_single_pass`); el cálculo original, con una consulta
+    por métrica y por gráfico, se conserva para otras bases de datos.
+
+    Si se indican los filtros (`filters`, el `cleaned_data` de
+    `CampaignFilterForm`) y todos se pueden aplicar sobre `CampaignCube`,
+    la consulta única se hace sobre el cubo pre-agregado en lugar de sobre
+    los registros, así que su costo no depende de la cantidad de filas.
+
+    Con `engine='columnar'` (o `KPI_ENGINE = 'columnar'`) y los filtros
+    indicados, los KPIs se calculan en memoria sobre `ColumnarDataset` (el
+    snapshot de la versión actual), sin consultar la base de datos salvo
+    para leer la versión del dataset.
+
+    Los histogramas numéricos (`BINNED_DIMENSIONS`) agrupan por número de
+    intervalo (`WidthBucket`) y se etiquetan al armar la respuesta, así que
+    salen en orden numérico. `bins` (alias -> `Bins`) reemplaza los
+    intervalos por defecto; en ese caso se calcula sobre los registros.
     """
-    def __init__(self, queryset):
+    # Dimensiones de la consulta única: alias -> (expresión, descartar el grupo NULL).
+    # Cada una es un conjunto de agrupación (GROUPING SET) propio.
+    SINGLE_PASS_DIMENSIONS = OrderedDict([
+        ('g_conv_age', (DEFAULT_BINS['conv_age'].expression, True)),
+        ('g_month', (lambda: F('month'), False)),
+        ('g_contact', (lambda: Case(When(~Q(contact='unknown'), then=F('contact'))), True)),
+        ('g_age', (DEFAULT_BINS['age'].expression, False)),
+        ('g_balance', (DEFAULT_BINS['balance'].expression, False)),
+        ('g_marital', (lambda: F('marital'), False)),
+        ('g_duration', (DEFAULT_BINS['duration'].expression, False)),
+        ('g_day', (lambda: F('day'), False)),
+        ('g_previous', (lambda: Case(When(previous__lte=10, then=F('previous'))), True)),
+        ('g_pdays', (DEFAULT_BINS['pdays'].expression, False)),
+    ])
+    # Las mismas dimensiones para el motor columnar, evaluadas con NumPy sobre el
+    # snapshot: alias -> (columna, etiquetas de una lista de valores distintos
+    # (None = grupo NULL), descartar el grupo NULL)
+    COLUMNAR_DIMENSIONS = OrderedDict([
+        ('g_conv_age', ('age', DEFAULT_BINS['conv_age'].buckets, True)),
+        ('g_month', ('month', list, False)),
+        ('g_contact', ('contact', lambda values: [value if value != 'unknown' else None for value in values], True)),
+        ('g_age', ('age', DEFAULT_BINS['age'].buckets, False)),
+        ('g_balance', ('balance', DEFAULT_BINS['balance'].buckets, False)),
+        ('g_marital', ('marital', list, False)),
+        ('g_duration', ('duration', DEFAULT_BINS['duration'].buckets, False)),
+        ('g_day', ('day', list, False)),
+        ('g_previous', ('previous', lambda values: [value if value <= 10 else None for value in values], True)),
+        ('g_pdays', ('pdays', DEFAULT_BINS['pdays'].buckets, False)),
+    ])
+    # En el cubo, las dimensiones de filtro se leen de las filas de totales
+    # (`dimension=''`) y las de gráfico de su desglose, con la agrupación ya
+    # calculada en `label`. Toda fila que no corresponde a un conjunto queda
+    # en su grupo NULL, que se descarta; `g_base` marca las filas de totales.
+    CUBE_TOTALS_DIMENSION = 'g_base'
+    CUBE_DIMENSIONS = OrderedDict([
+        ('g_base', (lambda: Case(When(dimension='', then=Value(1)), output_field=IntegerField()), True)),
+        ('g_conv_age', (lambda: Case(When(dimension='conv_age', then=Cast('label', IntegerField()))), True)),
+        ('g_month', (lambda: Case(When(dimension='month', then=F('label'))), True)),
+        ('g_contact', (lambda: Case(When(Q(dimension='') & ~Q(contact='unknown'), then=F('contact'))), True)),
+        ('g_age', (lambda: Case(When(dimension='age', then=Cast('label', IntegerField()))), True)),
+        ('g_balance', (lambda: Case(When(dimension='balance', then=Cast('label', IntegerField()))), True)),
+        ('g_marital', (lambda: Case(When(dimension='', then=F('marital'))), True)),
+        ('g_duration', (lambda: Case(When(dimension='duration', then=Cast('label', IntegerField()))), True)),
+        ('g_day', (lambda: Case(When(dimension='day', then=Cast('label', IntegerField()))), True)),
+        ('g_previous', (lambda: Case(When(dimension='previous', then=Cast('label', IntegerField()))), True)),
+        ('g_pdays', (lambda: Case(When(dimension='pdays', then=Cast('label', IntegerField()))), True)),
+    ])
+
+    # Medidas de cada fila: nombre -> plantilla SQL (`{c}` cita los nombres de columna)
+    RAW_MEASURES = OrderedDict([
+        ('total', "COUNT(*)"),
+        ('yes', "COUNT(*) FILTER (WHERE {c[y]})"),
+        ('campaign_sum', "COALESCE(SUM({c[campaign]}), 0)"),
+        ('duration_avg', "AVG({c[duration]})"),
+        ('success_outcome', "COUNT(*) FILTER (WHERE {c[poutcome]} = 'success')"),
+        ('success_outcome_yes', "COUNT(*) FILTER (WHERE {c[poutcome]} = 'success' AND {c[y]})"),
+        ('default_yes', "COUNT(*) FILTER (WHERE {c[default]})"),
+        ('housing_yes', "COUNT(*) FILTER (WHERE {c[housing]})"),
+        ('loan_yes', "COUNT(*) FILTER (WHERE {c[loan]})"),
+    ])
+    CUBE_MEASURES = OrderedDict([
+        ('total', "COALESCE(SUM({c[record_count]}), 0)"),
+        ('yes', "COALESCE(SUM({c[record_count]}) FILTER (WHERE {c[y]}), 0)"),
+        ('campaign_sum', "COALESCE(SUM({c[campaign_sum]}), 0)"),
+        # Misma división en `numeric` que hace AVG, para obtener el mismo valor
+        ('duration_avg', "SUM({c[duration_sum]}) / NULLIF(SUM({c[record_count]}), 0)"),
+        ('success_outcome', "COALESCE(SUM({c[success_count]}), 0)"),
+        ('success_outcome_yes', "COALESCE(SUM({c[success_count]}) FILTER (WHERE {c[y]}), 0)"),
+        ('default_yes', "COALESCE(SUM({c[default_count]}), 0)"),
+        ('housing_yes', "COALESCE(SUM({c[housing_count]}), 0)"),
+        ('loan_yes', "COALESCE(SUM({c[loan_count]}), 0)"),
+    ])
+    RAW_COLUMNS = ['y', 'campaign', 'duration', 'poutcome', 'default', 'housing', 'loan']
+    CUBE_COLUMNS = [
+        'y', 'record_count', 'campaign_sum', 'duration_sum', 'success_count',
+        'default_count', 'housing_count', 'loan_count',
+    ]
+
+    # Secciones de la respuesta y dimensión que necesita cada gráfico (None = solo los totales)
+    SECTIONS = ('kpi_cards', 'charts')
+    CHARTS = OrderedDict([
+        ('conversion_por_edad', 'g_conv_age'),
+        ('distribucion_resultados', None),
+        ('tendencia_mensual', 'g_month'),
+        ('exito_por_canal', 'g_contact'),
+        ('distribucion_demora', None),
+        ('distribucion_hipoteca', None),
+        ('distribucion_prestamo', None),
+        ('distribucion_edades', 'g_age'),
+        ('distribucion_balance', 'g_balance'),
+        ('distribucion_estado_civil', 'g_marital'),
+        ('distribucion_duracion', 'g_duration'),
+        ('distribucion_dia_mes', 'g_day'),
+        ('contactos_previos_conversion', 'g_previous'),
+        ('dias_ultimo_contacto', 'g_pdays'),
+    ])
+
+    # Dimensiones agrupadas en intervalos: alias -> intervalos por defecto (`DEFAULT_BINS`)
+    BINNED_DIMENSIONS = OrderedDict([
+        ('g_conv_age', 'conv_age'), ('g_age', 'age'), ('g_balance', 'balance'),
+        ('g_duration', 'duration'), ('g_pdays', 'pdays'),
+    ])
+    # Gráficos de tasas de conversión (con `mode=approx` llevan sus intervalos de confianza)
+    RATE_CHARTS = ('conversion_por_edad', 'tendencia_mensual', 'exito_por_canal', 'distribucion_dia_mes', 'contactos_previos_conversion')
+    # Semilla de `TABLESAMPLE ... REPEATABLE`: la misma muestra mientras la tabla no cambie
+    SAMPLE_SEED = 0
+
+    # Campos categóricos por los que se pueden comparar segmentos (`get_segment_kpis`)
+    SEGMENT_FIELDS = ('job', 'marital', 'education', 'contact', 'y', 'month', 'poutcome', 'default', 'housing', 'loan')
+    SEGMENT_ALIAS = 'kpi_segment'
+    # Suma de duraciones, para promediar segmentos que se arman sumando grupos
+    DURATION_SUM_MEASURE = {'raw': "COALESCE(SUM({c[duration]}), 0)", 'cube': "COALESCE(SUM({c[duration_sum]}), 0)"}
+
+    ENGINE_DATABASE = 'database'
+    ENGINE_COLUMNAR = 'columnar'
+
+    def __init__(self, queryset, single_pass=True, filters=None, use_cube=None, engine=None, bins=None):
         self.queryset = queryset
-        self.total_count = self.queryset.count()
-        self.yes_count = self.queryset.filter(y=True).count()
+        self.single_pass = single_pass
+        self.filters = filters
+        self.use_cube = getattr(settings, 'KPI_USE_CUBE', True) if use_cube is None else use_cube
+        self.engine = engine or getattr(settings, 'KPI_ENGINE', self.ENGINE_DATABASE)
+        self.custom_bins = bool(bins)
+        self._cube_built = None  # Se consulta una vez por cálculo (ver `can_use_cube`)
+        self.bins = {alias: DEFAULT_BINS[name] for alias, name in self.BINNED_DIMENSIONS.items()} | (bins or {})
+        # Dimensiones de la consulta única sobre los registros, con los intervalos pedidos
+        self.dimensions = OrderedDict(
+            (alias, (self.bins[alias].expression, discard) if alias in self.bins else (build, discard))
+            for alias, (build, discard) in self.SINGLE_PASS_DIMENSIONS.items()
+        )
 
-        # Parámetros para rentabilidad
-        self.G = 10  # Ganancia unitaria
-        self.C = 1   # Costo por llamada
+        # Parámetros para rentabilidad (ver `analytics.scenarios` para evaluar otros valores)
+        self.G = getattr(settings, 'KPI_PROFIT_GAIN', 10)  # Ganancia unitaria
+        self.C = getattr(settings, 'KPI_PROFIT_COST', 1)   # Costo por llamada
 
     def _safe_division(self, numerator, denominator, as_percentage=True):
         if denominator == 0:
@@ -31,6 +199,510 @@ class KpiManager:
         """
         Calcula todos los KPIs y los devuelve en un diccionario.
         """
+        aggregated = self._aggregate_columnar()
+        if aggregated is not None:
+            return self._build_kpis(*aggregated)
+        if self._uses_single_pass():
+            return self._get_all_kpis_single_pass()
+        return self._get_all_kpis_by_query()
+
+    def get_kpis(self, sections=None, charts=None):
+        """
+        Calcula solo lo pedido y devuelve `(datos, tiempos)`, con los
+        milisegundos de cada sección (`kpi_cards` y cada gráfico) y el total.
+
+        `sections` es una lista de `SECTIONS` y `charts` una de nombres de
+        `CHARTS` (pedir gráficos incluye la sección 'charts' solo con ellos);
+        sin ninguno de los dos se calcula todo, como `get_all_kpis`. En la
+        consulta única solo se agrupan las dimensiones de los gráficos pedidos,
+        repartidas en varias consultas que se ejecutan en paralelo en el pool
+        de `get_section_executor`; el tiempo de un gráfico es el de su consulta.
+        """
+        start = time.perf_counter()
+        if sections is None and charts is None:
+            return self.get_all_kpis(), {'total': _elapsed_ms(start)}
+        sections = sections or []
+        cards = 'kpi_cards' in sections
+        if charts is None:
+            charts = list(self.CHARTS) if 'charts' in sections else []
+
+        aggregated = self._aggregate_columnar()
+        if aggregated is not None:
+            return self._build_kpis(*aggregated, cards=cards, charts=charts), {'total': _elapsed_ms(start)}
+        if not self._uses_single_pass():
+            data = self.get_all_kpis()
+            selected = {'kpi_cards': data['kpi_cards']} if cards else {}
+            if charts:
+                selected['charts'] = {name: chart for name, chart in data['charts'].items() if name in charts}
+            return selected, {'total': _elapsed_ms(start)}
+
+        if self.can_use_cube():
+            source = CampaignCube.objects.filter(self._cube_q(self.filters))
+            dimension_exprs, measures, columns = self.CUBE_DIMENSIONS, self.CUBE_MEASURES, self.CUBE_COLUMNS
+            base, totals_dimension = [self.CUBE_TOTALS_DIMENSION], self.CUBE_TOTALS_DIMENSION
+        else:
+            source, dimension_exprs, measures, columns = self.queryset, self.dimensions, self.RAW_MEASURES, self.RAW_COLUMNS
+            base, totals_dimension = [], None
+
+        def run(batch):
+            started = time.perf_counter()
+            exprs = OrderedDict((alias, dimension_exprs[alias]) for alias in base + batch)
+            result = self._aggregate_single_pass(source, exprs, measures, columns, totals_dimension=totals_dimension)
+            return result, _elapsed_ms(started)
+
+        # Las dimensiones pedidas se reparten en hasta `KPI_SECTION_WORKERS`
+        # consultas (una por dimensión si alcanzan); todas calculan los totales
+        dimensions = sorted({self.CHARTS[name] for name in charts} - {None})
+        workers = max(getattr(settings, 'KPI_SECTION_WORKERS', 4), 1)
+        batches = [dimensions[i::workers] for i in range(min(workers, len(dimensions)))] or [[]]
+        results = run_sections(run, batches)
+
+        groups, batch_timings = {}, {}
+        for batch, ((_, batch_groups), duration) in zip(batches, results):
+            groups.update(batch_groups)
+            batch_timings.update((dimension, duration) for dimension in batch)
+        (totals, _), totals_duration = results[0]
+        data = self._build_kpis(totals, groups, cards=cards, charts=charts) if cards or charts else {}
+
+        timings = {'kpi_cards': totals_duration} if cards else {}
+        timings.update((name, batch_timings.get(self.CHARTS[name], totals_duration)) for name in charts)
+        timings['total'] = _elapsed_ms(start)
+        return data, timings
+
+    def get_totals(self):
+        """
+        Solo las medidas totales de los registros filtrados (`total`, `yes`,
+        `campaign_sum`, ...), sin agrupar por ninguna dimensión, por el camino
+        más rápido disponible (columnar, cubo o consulta única).
+        """
+        aggregated = self._aggregate_columnar()
+        if aggregated is not None:
+            return aggregated[0]
+        if not self._uses_single_pass():
+            return self.queryset.aggregate(
+                total=Count('id'), yes=Count('id', filter=Q(y=True)), campaign_sum=Coalesce(Sum('campaign'), Value(0)),
+            )
+        if self.can_use_cube():
+            cube = CampaignCube.objects.filter(self._cube_q(self.filters))
+            dimensions = OrderedDict([(self.CUBE_TOTALS_DIMENSION, self.CUBE_DIMENSIONS[self.CUBE_TOTALS_DIMENSION])])
+            totals, _ = self._aggregate_single_pass(
+                cube, dimensions, self.CUBE_MEASURES, self.CUBE_COLUMNS, totals_dimension=self.CUBE_TOTALS_DIMENSION,
+            )
+            return totals
+        totals, _ = self._aggregate_single_pass(self.queryset, OrderedDict(), self.RAW_MEASURES, self.RAW_COLUMNS)
+        return totals
+
+    def get_segment_kpis(self, segment_by=None, segments=None):
+        """
+        Tarjetas y gráficos de varios segmentos de los registros filtrados,
+        en un `OrderedDict` segmento -> datos (como `get_all_kpis`). Los
+        segmentos son los valores de `segment_by` (uno de `SEGMENT_FIELDS`,
+        en orden) o `segments`, un diccionario clave -> filtros (el
+        `cleaned_data` de `CampaignFilterForm`, p. ej. de un `SavedFilter`)
+        que se aplican además de los filtros base.
+
+        En PostgreSQL es una sola consulta: los conjuntos de agrupación de
+        `_aggregate_single_pass` se anteponen con la clave del segmento, así
+        que la tabla (o el cubo) se recorre una vez para todos. Los segmentos
+        de `segments` pueden superponerse: se agrupa por la máscara de los
+        segmentos que incluyen cada fila (ver `segment_membership`) y cada
+        segmento suma sus máscaras. En otras bases de datos se calcula un
+        segmento por vez.
+        """
+        if (segment_by is None) == (segments is None):
+            raise ValueError("Se debe indicar `segment_by` o `segments` (solo uno de los dos).")
+        if segment_by is not None and segment_by not in self.SEGMENT_FIELDS:
+            raise ValueError(f"Campo de segmento desconocido: {segment_by}")
+
+        if not self._uses_single_pass():
+            if segment_by is not None:
+                values = self.queryset.order_by(segment_by).values_list(segment_by, flat=True).distinct()
+                segments = OrderedDict((value, {segment_by: value}) for value in values)
+                subsets = {key: self.queryset.filter(**lookup) for key, lookup in segments.items()}
+            else:
+                subsets = {key: FilterManager.apply_filters(self.queryset, filters) for key, filters in segments.items()}
+            return OrderedDict(
+                (key, KpiManager(subset, single_pass=False, bins=self.bins if self.custom_bins else None).get_all_kpis())
+                for key, subset in subsets.items()
+            )
+
+        use_cube = self.can_use_cube() and (
+            segment_by in CUBE_FILTER_FIELDS if segment_by is not None
+            else all(self._cube_covers(filters) for filters in segments.values())
+        )
+        if use_cube:
+            source = CampaignCube.objects.filter(self._cube_q(self.filters))
+            dimension_exprs, measures, columns = self.CUBE_DIMENSIONS, self.CUBE_MEASURES, self.CUBE_COLUMNS
+            totals_dimension = self.CUBE_TOTALS_DIMENSION
+        else:
+            source, dimension_exprs, measures, columns = self.queryset, self.dimensions, self.RAW_MEASURES, self.RAW_COLUMNS
+            totals_dimension = None
+
+        if segment_by is not None:
+            results = self._aggregate_single_pass(
+                source, dimension_exprs, measures, columns, totals_dimension=totals_dimension, segment=F(segment_by),
+            )
+            return OrderedDict((key, self._build_kpis(*aggregated)) for key, aggregated in results.items())
+
+        # Una fila por máscara de pertenencia (no por segmento): la tabla no se
+        # multiplica y cada segmento suma las máscaras que lo incluyen
+        measures = measures | {'duration_sum': self.DURATION_SUM_MEASURE['cube' if use_cube else 'raw']}
+        as_q = self._cube_q if use_cube else FilterManager.as_q
+        membership = segment_membership([as_q(filters) for filters in segments.values()])
+        results = self._aggregate_single_pass(
+            source, dimension_exprs, measures, columns, totals_dimension=totals_dimension, segment=membership,
+        )
+        aliases = [alias for alias in dimension_exprs if alias != totals_dimension]
+        return OrderedDict(
+            (key, self._build_kpis(*_merge_aggregates(
+                [aggregated for mask, aggregated in results.items() if mask & (1 << index)], measures, aliases,
+            )))
+            for index, key in enumerate(segments)
+        )
+
+    def get_approximate_kpis(self, sections=None, charts=None):
+        """
+        Vista previa de `get_kpis` sobre una muestra de bloques de la tabla
+        (`TABLESAMPLE SYSTEM`), para tablas en las que la consulta exacta
+        tarda segundos. Devuelve `(datos, tiempos)` como `get_kpis`: los
+        conteos y sumas se escalan por la inversa de la fracción muestreada y
+        `datos['approximate']` informa el tamaño de la muestra, los
+        intervalos de confianza de las tasas de conversión y `refine: True`,
+        para que el cliente pida después el resultado exacto.
+
+        Los intervalos (de Wilson) suponen una muestra aleatoria simple; al
+        muestrear bloques quedan algo angostos si los registros están
+        agrupados físicamente. Si la tabla tiene menos de
+        `KPI_APPROX_SAMPLE_ROWS` registros, o los filtros se resuelven con el
+        cubo o el motor columnar, se devuelve el resultado exacto.
+        """
+        start = time.perf_counter()
+        percent = self._sample_percent()
+        if percent is None:
+            return self.get_kpis(sections=sections, charts=charts)
+        cards = sections is None and charts is None or 'kpi_cards' in (sections or [])
+        if charts is None and sections is not None:
+            charts = list(self.CHARTS) if 'charts' in sections else []
+
+        needed = {self.CHARTS[name] for name in (self.CHARTS if charts is None else charts)}
+        dimensions = OrderedDict((alias, expr) for alias, expr in self.dimensions.items() if alias in needed)
+        sample_totals, sample_groups = self._aggregate_single_pass(
+            self.queryset, dimensions, self.RAW_MEASURES, self.RAW_COLUMNS, tablesample=percent,
+        )
+        scale = 100 / percent
+        totals = {name: value if name == 'duration_avg' else round(value * scale) for name, value in sample_totals.items()}
+        groups = {
+            alias: [(label, round(total * scale), round(yes * scale)) for label, total, yes in rows]
+            for alias, rows in sample_groups.items()
+        }
+        data = self._build_kpis(totals, groups, cards=cards, charts=charts)
+        confidence = getattr(settings, 'KPI_APPROX_CONFIDENCE', 0.95)
+        data['approximate'] = {
+            'sample_percent': percent,
+            'sample_size': sample_totals['total'],
+            'confidence': confidence,
+            'intervals': self._confidence_intervals(data, sample_totals, sample_groups, confidence),
+            'refine': True,
+        }
+        return data, {'total': _elapsed_ms(start)}
+
+    def _sample_percent(self):
+        """
+        Porcentaje de bloques a muestrear para obtener unos
+        `KPI_APPROX_SAMPLE_ROWS` registros (según la estimación de filas de
+        `pg_class`), o None si conviene el cálculo exacto.
+        """
+        if not self._uses_single_pass() or self.can_use_cube():
+            return None
+        if self.engine == self.ENGINE_COLUMNAR and self.filters is not None:
+            return None
+        with connections[self.queryset.db].cursor() as cursor:
+            cursor.execute("SELECT reltuples FROM pg_class WHERE oid = %s::regclass", [self.queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        estimated_rows = row[0] if row else -1  # -1: la tabla todavía no se analizó
+        target = getattr(settings, 'KPI_APPROX_SAMPLE_ROWS', 200000)
+        if estimated_rows <= target:
+            return None
+        return 100 * target / estimated_rows
+
+    def _confidence_intervals(self, data, sample_totals, sample_groups, confidence):
+        """Intervalos de las tasas de la respuesta, calculados con los conteos de la muestra."""
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        intervals = {}
+        if 'kpi_cards' in data:
+            intervals['tasa_conversion'] = _wilson_interval(sample_totals['yes'], sample_totals['total'], z)
+            intervals['impacto_historial'] = _wilson_interval(sample_totals['success_outcome_yes'], sample_totals['success_outcome'], z)
+        for name in self.RATE_CHARTS:
+            chart = data.get('charts', {}).get(name)
+            if chart is None:
+                continue
+            alias = self.CHARTS[name]
+            counts = {label: (total, yes) for label, total, yes in self._label_bins(alias, sample_groups[alias])}
+            intervals[name] = [_wilson_interval(yes, total, z) for total, yes in (counts.get(label, (0, 0)) for label in chart['labels'])]
+        return intervals
+
+    def _aggregate_columnar(self):
+        """
+        `(totales, grupos)` del motor columnar, o None si no se usa, no cubre
+        los filtros o todavía no hay snapshot de la versión actual del dataset.
+        """
+        if self.engine != self.ENGINE_COLUMNAR or self.filters is None or self.custom_bins:
+            return None
+        dataset = get_columnar_dataset(self.COLUMNAR_DIMENSIONS)
+        return dataset.aggregate(self.filters) if dataset is not None else None
+
+    def _uses_single_pass(self):
+        return self.single_pass and connections[self.queryset.db].vendor == 'postgresql'
+
+    def can_use_cube(self):
+        """
+        True si los filtros son todos dimensiones del cubo (o no hay filtros
+        activos) y el cubo ya está construido (ver `cube_is_built`). Lo
+        segundo se consulta una sola vez por instancia: cada cálculo crea la
+        suya, así que un cubo vaciado después nunca se da por construido.
+        """
+        if not self.use_cube or self.filters is None or self.custom_bins:
+            return False
+        if not self._cube_covers(self.filters):
+            return False
+        if self._cube_built is None:
+            self._cube_built = cube_is_built()
+        return self._cube_built
+
+    @staticmethod
+    def _cube_covers(filters):
+        active = {field for field, value in filters.items() if value not in (None, '', [], ()) and field not in FilterManager.IGNORED_PARAMS}
+        return active <= CUBE_FILTER_FIELDS and age_band_range(filters) is not None
+
+    @staticmethod
+    def _cube_q(filters):
+        """
+        Los filtros de `FilterManager.as_q` como condición sobre `CampaignCube`:
+        los de edad pasan a un rango de `age_band` (ver `age_band_range`).
+        """
+        first, last = age_band_range(filters)
+        condition = FilterManager.as_q({field: value for field, value in filters.items() if field not in ('age_min', 'age_max')})
+        if first is not None:
+            condition &= Q(age_band__gte=first)
+        if last is not None:
+            condition &= Q(age_band__lte=last)
+        return condition
+
+    # --- Cálculo en una sola consulta ---
+    def _get_all_kpis_single_pass(self):
+        """
+        Calcula tarjetas y gráficos con una única consulta: las tarjetas salen
+        de agregaciones condicionales (`FILTER (WHERE ...)`) sobre el total y
+        cada gráfico de un conjunto de `GROUPING SETS` sobre su dimensión, así
+        que la tabla (o el cubo) filtrada se recorre una sola vez.
+        """
+        if self.can_use_cube():
+            cube = CampaignCube.objects.filter(self._cube_q(self.filters))
+            totals, groups = self._aggregate_single_pass(
+                cube, self.CUBE_DIMENSIONS, self.CUBE_MEASURES, self.CUBE_COLUMNS, totals_dimension=self.CUBE_TOTALS_DIMENSION,
+            )
+        else:
+            totals, groups = self._aggregate_single_pass(self.queryset, self.dimensions, self.RAW_MEASURES, self.RAW_COLUMNS)
+        return self._build_kpis(totals, groups)
+
+    def _build_kpis(self, totals, groups, cards=True, charts=None):
+        """
+        Arma la respuesta a partir de los totales (medidas de `RAW_MEASURES`)
+        y, por dimensión, la lista ordenada de `(etiqueta, total, conversiones)`.
+        Con `cards=False` se omiten las tarjetas y con `charts` (lista de
+        nombres de `CHARTS`) solo se incluyen esos gráficos.
+        """
+        total_count, yes_count = totals['total'], totals['yes']
+        total_contacts_sum = totals['campaign_sum']
+        profitability = (yes_count * self.G) - (total_count * self.C)
+        groups = {alias: self._label_bins(alias, dimension_rows) for alias, dimension_rows in groups.items()}
+
+        def rows(dimension):
+            return groups[dimension]
+
+        def rates(dimension):
+            return {label: self._safe_division(yes, total) for label, total, yes in rows(dimension)}
+
+        def boolean_distribution(measure):
+            return {'labels': ['No', 'Sí'], 'data': [total_count - totals[measure], totals[measure]]}
+
+        def histogram(dimension):
+            return {
+                'labels': [label for label, _, _ in rows(dimension)],
+                'data': [total for _, total, _ in rows(dimension)],
+                'rates': [self._safe_division(yes, total) for _, total, yes in rows(dimension)],
+            }
+
+        def by_month():
+            month_rates = rates('g_month')
+            return {'labels': MONTHS_ORDER, 'data': [month_rates.get(month, 0) for month in MONTHS_ORDER]}
+
+        def by_age():
+            age_rates, labels = rates('g_conv_age'), self.bins['g_conv_age'].bin_labels()
+            return {'labels': labels, 'data': [age_rates.get(label, 0) for label in labels]}
+
+        def by_day():
+            day_rates = rates('g_day')
+            return {'labels': list(range(1, 32)), 'data': [day_rates.get(day, 0) for day in range(1, 32)]}
+
+        # Cada gráfico se arma solo si se pidió (sus grupos pueden no estar calculados)
+        chart_builders = {
+            "conversion_por_edad": by_age,
+            "distribucion_resultados": lambda: {'labels': ['No Aceptaron', 'Sí Aceptaron'], 'data': [total_count - yes_count, yes_count]},
+            "tendencia_mensual": by_month,
+            "exito_por_canal": lambda: {'labels': [label for label, _, _ in rows('g_contact')], 'data': [self._safe_division(yes, total) for _, total, yes in rows('g_contact')]},
+            "distribucion_demora": lambda: boolean_distribution('default_yes'),
+            "distribucion_hipoteca": lambda: boolean_distribution('housing_yes'),
+            "distribucion_prestamo": lambda: boolean_distribution('loan_yes'),
+            "distribucion_edades": lambda: histogram('g_age'),
+            "distribucion_balance": lambda: histogram('g_balance'),
+            "distribucion_estado_civil": lambda: histogram('g_marital'),
+            "distribucion_duracion": lambda: histogram('g_duration'),
+            "distribucion_dia_mes": by_day,
+            "contactos_previos_conversion": lambda: {'labels': [label for label, _, _ in rows('g_previous')], 'data': [(float(yes) / float(total)) * 100 for _, total, yes in rows('g_previous')]},
+            "dias_ultimo_contacto": lambda: histogram('g_pdays'),
+        }
+
+        result = {}
+        if cards:
+            result["kpi_cards"] = {
+                "tasa_conversion": self._safe_division(yes_count, total_count),
+                "total_contactos": total_count,
+                "duracion_promedio": float(totals['duration_avg'] or 0.0),
+                "rentabilidad_proyectada": profitability,
+                "clientes_aceptaron": yes_count,
+                "historiales_exitosos": totals['success_outcome'],
+                "impacto_historial": self._safe_division(totals['success_outcome_yes'], totals['success_outcome']),
+                "indice_eficiencia": self._safe_division(yes_count, total_contacts_sum if total_contacts_sum > 0 else 1, as_percentage=False),
+                "ganancia_por_llamada": self._safe_division(profitability, total_contacts_sum if total_contacts_sum > 0 else 1, as_percentage=False)
+            }
+        if charts is None or charts:
+            result["charts"] = {name: build() for name, build in chart_builders.items() if charts is None or name in charts}
+        return result
+
+    def _label_bins(self, alias, rows):
+        """Cambia los números de intervalo de `rows` por sus etiquetas, sin los intervalos excluidos."""
+        bins = self.bins.get(alias)
+        if bins is None:
+            return rows
+        return [(bins.label(bucket), total, yes) for bucket, total, yes in rows if bucket is None or bins.label(bucket) is not None]
+
+    @classmethod
+    def binned_charts(cls):
+        """Gráficos cuyos intervalos se pueden elegir en la API."""
+        return [name for name, alias in cls.CHARTS.items() if alias in cls.BINNED_DIMENSIONS]
+
+    @classmethod
+    def resolve_bins(cls, specs, queryset):
+        """Convierte `{gráfico: BinSpec}` en el argumento `bins` (alias -> `Bins`) para `queryset`."""
+        bins = {}
+        for chart, spec in specs.items():
+            alias = cls.CHARTS[chart]
+            bins[alias] = spec.resolve(DEFAULT_BINS[cls.BINNED_DIMENSIONS[alias]].field, queryset)
+        return bins
+
+    def _aggregate_single_pass(self, queryset, dimension_exprs, measures, columns, totals_dimension=None, tablesample=None, segment=None):
+        """
+        Ejecuta la consulta única sobre `queryset` y devuelve `(totales, grupos)`:
+        las medidas del conjunto vacío `()` (o del grupo no NULL de
+        `totals_dimension`) y, por dimensión, una lista ordenada de
+        `(etiqueta, total, conversiones)`. Con `tablesample` (un porcentaje)
+        se lee solo esa fracción de los bloques de la tabla.
+
+        Con `segment` (una expresión por fila) cada conjunto de agrupación
+        se antepone con ella y se devuelve `{segmento: (totales, grupos)}`,
+        solo con los segmentos que tienen filas; las filas con segmento NULL
+        se descartan.
+        """
+        dimensions = list(dimension_exprs)
+        connection = connections[queryset.db]
+        qn = connection.ops.quote_name
+
+        annotations = {alias: build() for alias, (build, _) in dimension_exprs.items()}
+        segment_columns = []
+        if segment is not None:
+            annotations[self.SEGMENT_ALIAS] = segment
+            segment_columns = [self.SEGMENT_ALIAS]
+        base = queryset.order_by().annotate(**annotations).values(*segment_columns, *dimensions, *columns)
+
+        def empty():
+            groups = {alias: [] for alias in dimensions if alias != totals_dimension}
+            return {name: 0 for name in measures} | {'duration_avg': None}, groups
+
+        results = {}
+        try:
+            base_sql, params = base.query.sql_with_params()
+        except EmptyResultSet:  # p. ej. `queryset.none()`: no hay nada que consultar
+            return results if segment is not None else empty()
+        if tablesample is not None:
+            table = qn(queryset.model._meta.db_table)
+            base_sql = base_sql.replace(
+                f'FROM {table}', f'FROM {table} TABLESAMPLE SYSTEM ({float(tablesample)!r}) REPEATABLE ({self.SAMPLE_SEED})', 1,
+            )
+
+        quoted = {column: qn(column) for column in columns}
+        dims_sql = ', '.join(qn(alias) for alias in dimensions)
+        segment_sql = ''.join(f'{qn(column)}, ' for column in segment_columns)
+        measures_sql = ', '.join(f"{template.format(c=quoted)} AS {name}" for name, template in measures.items())
+        grouping_sets = [f'({segment_sql}{qn(alias)})' for alias in dimensions]
+        if totals_dimension is None:
+            grouping_sets.insert(0, f"({segment_sql.rstrip(', ')})")
+        if dimensions:
+            select_sql = f"GROUPING({dims_sql}) AS grouping_id, {segment_sql}{dims_sql}, {measures_sql}"
+            order_sql = f"ORDER BY {segment_sql}{dims_sql}"
+        else:  # Solo totales
+            select_sql = f"0 AS grouping_id, {segment_sql}{measures_sql}"
+            order_sql = f"ORDER BY {segment_sql.rstrip(', ')}" if segment_columns else ''
+        where_sql = f"WHERE {qn(self.SEGMENT_ALIAS)} IS NOT NULL" if segment_columns else ''
+        sql = f"""
+            SELECT {select_sql}
+            FROM ({base_sql}) AS kpi_base
+            {where_sql}
+            GROUP BY GROUPING SETS ({', '.join(grouping_sets)})
+            {order_sql}
+        """
+
+        # GROUPING() pone un bit en 1 por cada dimensión que no agrupa la fila
+        all_bits = (1 << len(dimensions)) - 1
+        set_ids = {all_bits ^ (1 << (len(dimensions) - 1 - i)): i for i in range(len(dimensions))}
+        offset = 1 + len(segment_columns)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            for row in cursor.fetchall():
+                grouping_id, labels = row[0], row[offset:offset + len(dimensions)]
+                key = row[1] if segment_columns else None
+                if key not in results:
+                    results[key] = empty()
+                totals, groups = results[key]
+                values = dict(zip(measures, row[offset + len(dimensions):]))
+                # Las sumas del cubo llegan como `numeric`: los conteos se pasan a int
+                values.update({name: int(value) for name, value in values.items() if name != 'duration_avg'})
+                if grouping_id == all_bits:
+                    results[key] = (values, groups)
+                    continue
+                index = set_ids[grouping_id]
+                alias = dimensions[index]
+                label = labels[index]
+                if label is None and dimension_exprs[alias][1]:
+                    continue
+                if alias == totals_dimension:
+                    results[key] = (values, groups)
+                    continue
+                groups[alias].append((label, values['total'], values['yes']))
+        if segment is not None:
+            return results
+        return results.get(None) or empty()
+
+    # --- Cálculo original (una consulta por métrica) ---
+    def _get_all_kpis_by_query(self):
+        match = FilterManager.match(self.filters) if self.filters is not None else None
+        if match is not None:  # Conteos por popcount sobre el índice de bitmaps
+            self.total_count = match.count
+            self.yes_count = (match & match.index.field_bitmap('y', [True])).count
+        else:
+            self.total_count = self.queryset.count()
+            self.yes_count = self.queryset.filter(y=True).count()
+
         # --- TARJETAS KPI ---
         total_contacts_sum = self.queryset.aggregate(total=Coalesce(Sum('campaign'), Value(0)))['total']
         profitability = (self.yes_count * self.G) - (self.total_count * self.C)
@@ -73,17 +745,9 @@ class KpiManager:
     
     # --- Métodos auxiliares para cada gráfico ---
     def _get_conversion_by_age_data(self):
-        age_groups = {
-            '17-25': (17, 25), '26-35': (26, 35), '36-45': (36, 45),
-            '46-55': (46, 55), '56+': (56, 100)
-        }
-        data = {'labels': list(age_groups.keys()), 'data': []}
-        for group, (min_age, max_age) in age_groups.items():
-            group_qs = self.queryset.filter(age__gte=min_age, age__lte=max_age)
-            total = group_qs.count()
-            yes = group_qs.filter(y=True).count()
-            data['data'].append(self._safe_division(yes, total))
-        return data
+        age_rates = {label: self._safe_division(yes, total) for label, total, yes in self._get_binned_rows('g_conv_age')}
+        labels = self.bins['g_conv_age'].bin_labels()
+        return {'labels': labels, 'data': [age_rates.get(label, 0) for label in labels]}
 
     def _get_results_distribution_data(self):
         results = self.queryset.values('y').annotate(count=Count('y')).order_by('y')
@@ -94,7 +758,6 @@ class KpiManager:
         }
         
     def _get_monthly_trend_data(self):
-        months_order = ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
         monthly_data = self.queryset.values('month').annotate(
             total=Count('id'),
             conversions=Count('id', filter=Q(y=True))
@@ -103,12 +766,12 @@ class KpiManager:
         data_dict = {d['month']: d for d in monthly_data}
         
         rates = []
-        for month in months_order:
+        for month in MONTHS_ORDER:
             if month in data_dict:
                 rates.append(self._safe_division(data_dict[month]['conversions'], data_dict[month]['total']))
             else:
                 rates.append(0)
-        return {'labels': months_order, 'data': rates}
+        return {'labels': MONTHS_ORDER, 'data': rates}
     
     def _get_success_by_contact_data(self):
         contact_data = self.queryset.exclude(contact='unknown').values('contact').annotate(
@@ -127,51 +790,36 @@ class KpiManager:
                      next((r['count'] for r in results if r[field_name] is True), 0)]
         }
         
+    def _get_binned_rows(self, alias):
+        """`(etiqueta, total, conversiones)` por intervalo de `alias`, en orden numérico y en una consulta."""
+        results = self.queryset.annotate(bucket=self.bins[alias].expression()).values('bucket').annotate(
+            total=Count('id'), conversions=Count('id', filter=Q(y=True))
+        ).order_by('bucket')
+        return self._label_bins(alias, [(r['bucket'], r['total'], r['conversions']) for r in results])
+
+    def _get_histogram_data(self, alias):
+        rows = self._get_binned_rows(alias)
+        return {
+            'labels': [label for label, _, _ in rows],
+            'data': [total for _, total, _ in rows],
+            'rates': [self._safe_division(yes, total) for _, total, yes in rows],
+        }
+
     def _get_age_distribution_data(self):
-        results = self.queryset.annotate(
-            age_group=Case(
-                When(age__range=(17, 25), then=Value('17-25')),
-                When(age__range=(26, 34), then=Value('26-34')),
-                When(age__range=(35, 43), then=Value('35-43')),
-                When(age__range=(44, 52), then=Value('44-52')),
-                When(age__range=(53, 61), then=Value('53-61')),
-                When(age__gte=62, then=Value('62+')),
-                default=Value('Otro'),
-                output_field=models.CharField(),
-            )
-        ).values('age_group').annotate(count=Count('id')).order_by('age_group')
-        return {'labels': [r['age_group'] for r in results], 'data': [r['count'] for r in results]}
-        
+        return self._get_histogram_data('g_age')
+
     def _get_balance_distribution_data(self):
-        results = self.queryset.annotate(
-            balance_group=Case(
-                When(balance__lt=0, then=Value('< 0')),
-                When(balance__range=(0, 1000), then=Value('0-1k')),
-                When(balance__range=(1001, 2000), then=Value('1k-2k')),
-                When(balance__range=(2001, 5000), then=Value('2k-5k')),
-                When(balance__gt=5000, then=Value('> 5k')),
-                output_field=models.CharField()
-            )
-        ).values('balance_group').annotate(count=Count('id')).order_by('balance_group')
-        return {'labels': [r['balance_group'] for r in results], 'data': [r['count'] for r in results]}
+        return self._get_histogram_data('g_balance')
 
     def _get_marital_distribution_data(self):
-        results = self.queryset.values('marital').annotate(count=Count('id'))
-        return {'labels': [r['marital'] for r in results], 'data': [r['count'] for r in results]}
-        
+        results = self.queryset.values('marital').annotate(count=Count('id'), conversions=Count('id', filter=Q(y=True)))
+        return {
+            'labels': [r['marital'] for r in results], 'data': [r['count'] for r in results],
+            'rates': [self._safe_division(r['conversions'], r['count']) for r in results],
+        }
+
     def _get_duration_distribution_data(self):
-        results = self.queryset.annotate(
-            duration_group=Case(
-                When(duration__range=(0, 100), then=Value('0-100s')),
-                When(duration__range=(101, 200), then=Value('101-200s')),
-                When(duration__range=(201, 300), then=Value('201-300s')),
-                When(duration__range=(301, 400), then=Value('301-400s')),
-                When(duration__range=(401, 500), then=Value('401-500s')),
-                When(duration__gt=500, then=Value('500s+')),
-                output_field=models.CharField()
-            )
-        ).values('duration_group').annotate(count=Count('id')).order_by('duration_group')
-        return {'labels': [r['duration_group'] for r in results], 'data': [r['count'] for r in results]}
+        return self._get_histogram_data('g_duration')
 
     def _get_day_of_month_data(self):
         days_in_month = list(range(1, 32))
@@ -198,14 +846,192 @@ class KpiManager:
         return {'labels': [r['previous'] for r in data], 'data': [r['rate'] for r in data]}
         
     def _get_pdays_analysis_data(self):
-        results = self.queryset.annotate(
-            pdays_group=Case(
-                When(pdays=-1, then=Value('No contactado')),
-                When(pdays__range=(0, 90), then=Value('0-90 días')),
-                When(pdays__range=(91, 180), then=Value('91-180 días')),
-                When(pdays__range=(181, 270), then=Value('181-270 días')),
-                When(pdays__gt=270, then=Value('270+ días')),
-                output_field=models.CharField()
+        return self._get_histogram_data('g_pdays')
+
+
+
+def _wilson_interval(successes, trials, z):
+    """Intervalo de Wilson de una proporción, en porcentaje (None sin ensayos)."""
+    if not trials:
+        return None
+    rate = successes / trials
+    denominator = 1 + z * z / trials
+    center = (rate + z * z / (2 * trials)) / denominator
+    margin = z * ((rate * (1 - rate) / trials + z * z / (4 * trials * trials)) ** 0.5) / denominator
+    return [round(max(center - margin, 0) * 100, 2), round(min(center + margin, 1) * 100, 2)]
+
+
+def segment_membership(conditions):
+    """
+    Máscara de los segmentos a los que pertenece cada fila: la suma de
+    `CASE WHEN c_i THEN 2^i ELSE 0 END` (NULL si no cumple ninguna, para
+    que `_aggregate_single_pass` la descarte). Un `Q()` vacío incluye todo.
+    """
+    members = [
+        Case(When(condition, then=Value(1 << index)), default=Value(0)) if condition else Value(1 << index)
+        for index, condition in enumerate(conditions)
+    ]
+    return NullIf(sum(members[1:], members[0]), Value(0), output_field=IntegerField())
+
+
+def _merge_aggregates(parts, measures, aliases):
+    """
+    Suma varios `(totales, grupos)` de `_aggregate_single_pass` (los de cada
+    máscara de un segmento). Los totales deben incluir `duration_sum` para
+    recalcular el promedio. Las etiquetas son números o textos ASCII en
+    minúsculas, así que ordenarlas en Python da el mismo orden que la consulta.
+    """
+    totals = {name: 0 for name in measures if name != 'duration_avg'}
+    merged = {alias: {} for alias in aliases}
+    for part_totals, part_groups in parts:
+        for name in totals:
+            totals[name] += part_totals[name]
+        for alias, rows in part_groups.items():
+            for label, total, yes in rows:
+                counts = merged[alias].setdefault(label, [0, 0])
+                counts[0] += total
+                counts[1] += yes
+    totals['duration_avg'] = Decimal(totals['duration_sum']) / totals['total'] if totals['total'] else None
+    groups = {
+        alias: [(label, total, yes) for label, (total, yes) in sorted(rows.items(), key=lambda item: (item[0] is None, item[0]))]
+        for alias, rows in merged.items()
+    }
+    return totals, groups
+
+
+def _elapsed_ms(start):
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+_section_executor = None
+_section_executor_lock = threading.Lock()
+
+
+def get_section_executor():
+    """
+    Pool de hilos compartido para las consultas de `KpiManager.get_kpis`.
+    Su tamaño (`KPI_SECTION_WORKERS`) acota las conexiones a la base de
+    datos que usan las secciones en paralelo, sumando todas las peticiones.
+    """
+    global _section_executor
+    with _section_executor_lock:
+        if _section_executor is None:
+            _section_executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'KPI_SECTION_WORKERS', 4),
+                thread_name_prefix='kpi-section',
             )
-        ).values('pdays_group').annotate(count=Count('id')).order_by('pdays_group')
-        return {'labels': [r['pdays_group'] for r in results], 'data': [r['count'] for r in results]}
\ No newline at end of file
+    return _section_executor
+
+
+def _run_in_thread(function, argument):
+    # Cada hilo usa su propia conexión; se cierra al terminar la tarea
+    try:
+        return function(argument)
+    finally:
+        connections.close_all()
+
+
+def run_sections(function, arguments):
+    """Aplica `function` a cada argumento, en paralelo en el pool si hay más de uno."""
+    if len(arguments) <= 1 or getattr(settings, 'KPI_SECTION_WORKERS', 4) <= 1:
+        return [function(argument) for argument in arguments]
+    futures = [get_section_executor().submit(_run_in_thread, function, argument) for argument in arguments]
+    return [future.result() for future in futures]
+
+
+class KpiCache:
+    """
+    Caché de resultados de `KpiManager.get_all_kpis`.
+
+    La clave combina los filtros en forma canónica (ver `canonical_filters`)
+    con la versión del dataset, que cambia en cada importación: los
+    resultados viejos dejan de consultarse sin borrarlos uno por uno y el
+    backend los va descartando. Se usa el alias de caché `KPI_CACHE_ALIAS`,
+    configurado con un máximo de entradas (LocMemCache descarta las menos
+    usadas recientemente). Los aciertos y fallos se cuentan en la caché
+    por defecto y se consultan con `stats`.
+    """
+    KEY_PREFIX = 'kpi'
+    STATS_KEYS = {'hits': 'kpi-cache:hits', 'misses': 'kpi-cache:misses'}
+
+    def __init__(self, alias=None, timeout=None):
+        self.cache = caches[alias or getattr(settings, 'KPI_CACHE_ALIAS', 'default')]
+        self.timeout = timeout if timeout is not None else getattr(settings, 'KPI_CACHE_TIMEOUT', None)
+
+    @classmethod
+    def canonical_filters(cls, cleaned_data):
+        """
+        Normaliza `CampaignFilterForm.cleaned_data`: descarta los filtros
+        vacíos y los que no cambian el resultado, y ordena las listas, para
+        que combinaciones equivalentes compartan la misma entrada.
+        """
+        canonical = FilterManager.canonical_params(cleaned_data)
+        return {field: value for field, value in canonical.items() if field not in FilterManager.IGNORED_PARAMS}
+
+    def make_key(self, cleaned_data, version, variant=None):
+        payload = self.canonical_filters(cleaned_data)
+        if variant:  # Respuestas parciales (secciones o gráficos elegidos)
+            payload = [payload, variant]
+        payload = json.dumps(payload, sort_keys=True, default=str)
+        return f"{self.KEY_PREFIX}:{version}:{hashlib.md5(payload.encode('utf-8')).hexdigest()}"
+
+    def get_or_compute(self, cleaned_data, compute, variant=None, version=None):
+        """
+        Devuelve `(datos, acierto)`: el resultado guardado para estos filtros
+        (y `variant`) y la versión actual del dataset (o `version`, si ya se
+        consultó), o el de `compute()` si no lo había.
+        """
+        version = get_dataset_version() if version is None else version
+        key = self.make_key(cleaned_data, version, variant)
+        data = self.cache.get(key)
+        if data is not None:
+            self._count('hits')
+            return data, True
+
+        self._count('misses')
+        data = compute()
+        self.cache.set(key, data, self.timeout)
+        return data, False
+
+    async def aget_or_compute(self, cleaned_data, compute, variant=None, version=None):
+        """
+        Versión async de `get_or_compute` para las vistas async: la versión
+        del dataset y la caché se consultan sin bloquear el ciclo de eventos,
+        y `compute` (síncrono) se ejecuta en un hilo solo si hace falta,
+        con turno de `limit_db_concurrency`.
+        """
+        version = await aget_dataset_version() if version is None else version
+        key = self.make_key(cleaned_data, version, variant)
+        data = await self.cache.aget(key)
+        if data is not None:
+            await self._acount('hits')
+            return data, True
+
+        await self._acount('misses')
+        async with limit_db_concurrency():
+            data = await sync_to_async(compute)()
+        await self.cache.aset(key, data, self.timeout)
+        return data, False
+
+    def _count(self, name):
+        key = self.STATS_KEYS[name]
+        if not cache.add(key, 1, None):
+            try:
+                cache.incr(key)
+            except ValueError:  # La entrada expiró entre `add` e `incr`
+                cache.set(key, 1, None)
+
+    async def _acount(self, name):
+        key = self.STATS_KEYS[name]
+        if not await cache.aadd(key, 1, None):
+            try:
+                await cache.aincr(key)
+            except ValueError:
+                await cache.aset(key, 1, None)
+
+    @classmethod
+    def stats(cls):
+        counts = {name: cache.get(key, 0) for name, key in cls.STATS_KEYS.items()}
+        requests = counts['hits'] + counts['misses']
+        counts['hit_rate'] = counts['hits'] / requests if requests else 0
+        return counts
\ No newline at end of file
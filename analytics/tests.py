@@ -1,3 +1,492 @@
-from django.test import TestCase
+import io
+import random
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from consultas.models import SavedFilter
+from consultas.services import FilterManager
+from dashboard.models import CampaignCube, CampaignRecord, ImportJob
+from dashboard.services.async_db import limit_db_concurrency
+from dashboard.services.binning import BinSpec, Bins
+from dashboard.services.cube import last_record_id, rebuild_cube, update_cube
+from dashboard.services.snapshots import write_snapshot
+from .columnar import clear_columnar_dataset, get_columnar_dataset
+from .services import KpiCache, KpiManager
+
+# Gráficos cuyo orden de etiquetas no está definido en el cálculo original (GROUP BY sin ORDER BY)
+UNORDERED_CHARTS = ['exito_por_canal', 'distribucion_estado_civil']
+
+
+def _sample_records(count, seed=7):
+    rng = random.Random(seed)
+    return [
+        CampaignRecord(
+            age=rng.randint(17, 98),
+            job=rng.choice(['admin.', 'blue-collar', 'management', 'student', 'unknown']),
+            marital=rng.choice(['married', 'divorced', 'single']),
+            education=rng.choice(['primary', 'secondary', 'tertiary', 'unknown']),
+            default=rng.random() < 0.1,
+            balance=rng.randint(-3000, 9000),
+            housing=rng.random() < 0.5,
+            loan=rng.random() < 0.2,
+            contact=rng.choice(['cellular', 'telephone', 'unknown']),
+            day=rng.randint(1, 31),
+            month=rng.choice(['jan', 'mar', 'may', 'jun', 'aug', 'nov']),
+            duration=rng.randint(0, 900),
+            campaign=rng.randint(1, 10),
+            pdays=rng.choice([-1, -1, 30, 120, 200, 400]),
+            previous=rng.randint(0, 14),
+            poutcome=rng.choice(['failure', 'other', 'success', 'unknown']),
+            y=rng.random() < 0.3,
+            content_hash=f'{i:032x}',
+        )
+        for i in range(count)
+    ]
+
+
+def _normalize(kpis):
+    """Ordena las etiquetas de los gráficos sin orden definido para poder compararlos."""
+    for name in UNORDERED_CHARTS:
+        chart = kpis['charts'][name]
+        keys = [key for key in ('labels', 'data', 'rates') if key in chart]
+        for key, values in zip(keys, zip(*sorted(zip(*(chart[key] for key in keys))))):
+            chart[key] = list(values)
+    return kpis
+
+
+class KpiManagerSinglePassTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        CampaignRecord.objects.bulk_create(_sample_records(500))
+
+    def test_all_kpis_in_one_query(self):
+        manager = KpiManager(CampaignRecord.objects.all())
+        with self.assertNumQueries(1):
+            manager.get_all_kpis()
+
+    def test_same_output_as_query_per_metric(self):
+        for queryset in [
+            CampaignRecord.objects.all(),
+            CampaignRecord.objects.filter(age__gte=30, marital__in=['married', 'single']),
+            CampaignRecord.objects.filter(y=True, contact__in=['cellular']),
+        ]:
+            single_pass = KpiManager(queryset).get_all_kpis()
+            by_query = KpiManager(queryset, single_pass=False).get_all_kpis()
+            self.assertEqual(_normalize(single_pass), _normalize(by_query))
+
+    def test_empty_queryset(self):
+        for empty in [CampaignRecord.objects.filter(age__gt=200), CampaignRecord.objects.none()]:
+            self.assertEqual(KpiManager(empty).get_all_kpis(), KpiManager(empty, single_pass=False).get_all_kpis())
+
+
+class KpiManagerCubeTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        CampaignRecord.objects.bulk_create(_sample_records(800, seed=11))
+        rebuild_cube()
+
+    def test_cube_matches_raw_records(self):
+        for filters in [
+            {},
+            {'job': ['student', 'admin.'], 'age_min': None, 'sort_by': 'age'},
+            {'marital': ['single'], 'contact': ['cellular', 'unknown'], 'y': 'yes'},
+            {'education': ['tertiary'], 'y': 'no', 'job': []},
+            {'job': ['student', 'admin.'], 'age_min': 30, 'age_max': 49},
+            {'age_min': ['60'], 'y': 'yes'},
+            {'age_min': 17, 'age_max': 19, 'marital': ['married']},
+            {'age_max': 98, 'contact': ['telephone']},
+        ]:
+            queryset = FilterManager.apply_filters(CampaignRecord.objects.all(), filters)
+            manager = KpiManager(queryset, filters=filters)
+            self.assertTrue(manager.can_use_cube())
+            with self.assertNumQueries(1):  # `can_use_cube` ya comprobó que el cubo está construido
+                from_cube = manager.get_all_kpis()
+            self.assertEqual(from_cube, KpiManager(queryset, filters=filters, use_cube=False).get_all_kpis())
+
+    def test_incremental_update_matches_rebuild(self):
+        last_id = last_record_id()
+        appended = _sample_records(150, seed=12)
+        for i, record in enumerate(appended):
+            record.content_hash = f'{800 + i:032x}'
+        CampaignRecord.objects.bulk_create(appended)
+
+        with self.assertNumQueries(1):
+            update_cube(last_id)
+        columns = [field.name for field in CampaignCube._meta.fields if field.name != 'id']
+        updated = sorted(CampaignCube.objects.values_list(*columns), key=repr)
+        rebuild_cube()
+        self.assertEqual(updated, sorted(CampaignCube.objects.values_list(*columns), key=repr))
+
+    def test_falls_back_to_records(self):
+        self.assertFalse(KpiManager(CampaignRecord.objects.all()).can_use_cube())
+        self.assertFalse(KpiManager(CampaignRecord.objects.all(), filters={'poutcome': ['success']}).can_use_cube())
+        # Límites de edad que no coinciden con los de una banda
+        self.assertFalse(KpiManager(CampaignRecord.objects.all(), filters={'job': ['student'], 'age_min': 35}).can_use_cube())
+        self.assertFalse(KpiManager(CampaignRecord.objects.all(), filters={'age_min': 30, 'age_max': 40}).can_use_cube())
+
+    def test_empty_cube_is_not_used(self):
+        # Como queda el cubo tras una migración que cambia su formato
+        CampaignCube.objects.all().delete()
+        manager = KpiManager(CampaignRecord.objects.all(), filters={})
+        self.assertFalse(manager.can_use_cube())
+        self.assertEqual(manager.get_all_kpis(), KpiManager(CampaignRecord.objects.all(), filters={}, use_cube=False).get_all_kpis())
+
+        call_command('rebuild_cube', stdout=io.StringIO())
+        self.assertTrue(KpiManager(CampaignRecord.objects.all(), filters={}).can_use_cube())
+        self.assertEqual(CampaignCube.objects.filter(dimension='').aggregate(total=Sum('record_count'))['total'], 800)
+
+
+    def test_emptied_cube_falls_back_to_records(self):
+        # Sin reemplazar nada: el cubo se usa y luego se vacía en el mismo proceso
+        filters = {'job': ['student']}
+        queryset = FilterManager.apply_filters(CampaignRecord.objects.all(), filters)
+        expected = KpiManager(queryset, filters=filters, use_cube=False).get_all_kpis()
+        url = reverse('analytics:kpi_data_api') + '?job=student'
+        caches['kpi'].clear()
+        from_cube = self.client.get(url).json()
+        self.assertTrue(KpiManager(queryset, filters=filters).can_use_cube())
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {connection.ops.quote_name(CampaignCube._meta.db_table)}')
+        manager = KpiManager(queryset, filters=filters)
+        self.assertFalse(manager.can_use_cube())
+        self.assertEqual(manager.get_all_kpis(), expected)
+        caches['kpi'].clear()
+        self.assertEqual(self.client.get(url).json(), from_cube)
+
+class KpiManagerColumnarTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        CampaignRecord.objects.bulk_create(_sample_records(800, seed=5))
+
+    def setUp(self):
+        clear_columnar_dataset()
+        self.addCleanup(clear_columnar_dataset)
+        snapshot_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, snapshot_dir, ignore_errors=True)
+        settings_override = override_settings(DATASET_SNAPSHOT_DIR=snapshot_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        write_snapshot()
+
+    def test_same_output_as_database(self):
+        for filters in [
+            {},
+            {'job': ['student', 'admin.'], 'age_min': 30, 'age_max': 60, 'sort_by': 'age'},
+            {'marital': ['single'], 'contact': ['cellular', 'unknown'], 'y': 'yes'},
+            {'education': ['tertiary'], 'y': 'no', 'job': [], 'age_min': None},
+            {'job': ['housemaid']},
+        ]:
+            queryset = FilterManager.apply_filters(CampaignRecord.objects.all(), filters)
+            columnar = KpiManager(queryset, filters=filters, engine='columnar').get_all_kpis()
+            self.assertEqual(columnar, KpiManager(queryset, filters=filters, use_cube=False).get_all_kpis())
+
+    def test_built_from_snapshot_once_per_dataset_version(self):
+        manager = KpiManager(CampaignRecord.objects.filter(y=True), filters={'y': 'yes'}, engine='columnar')
+        with self.assertNumQueries(2):  # La versión y el orden de las etiquetas, sin leer los registros
+            manager.get_all_kpis()
+        with self.assertNumQueries(1):  # Solo la versión del dataset
+            manager.get_all_kpis()
+
+        # Sin el snapshot de la nueva versión se calcula en la base de datos
+        dataset = get_columnar_dataset(KpiManager.COLUMNAR_DIMENSIONS)
+        ImportJob.objects.create(original_name='nuevo.csv', status=ImportJob.STATUS_DONE, finished_at=timezone.now())
+        self.assertIsNone(get_columnar_dataset(KpiManager.COLUMNAR_DIMENSIONS))
+        self.assertEqual(manager.get_all_kpis(), KpiManager(manager.queryset, use_cube=False).get_all_kpis())
+        write_snapshot()
+        self.assertIsNot(get_columnar_dataset(KpiManager.COLUMNAR_DIMENSIONS), dataset)
+
+    def test_dataset_per_dimensions(self):
+        dimensions = {alias: KpiManager.COLUMNAR_DIMENSIONS[alias] for alias in list(KpiManager.COLUMNAR_DIMENSIONS)[:2]}
+        self.assertEqual(list(get_columnar_dataset(dimensions).dimensions), list(dimensions))
+        self.assertEqual(list(get_columnar_dataset(KpiManager.COLUMNAR_DIMENSIONS).dimensions), list(KpiManager.COLUMNAR_DIMENSIONS))
+
+    def test_unsupported_filter_falls_back_to_database(self):
+        filters = {'poutcome': ['success']}
+        queryset = FilterManager.apply_filters(CampaignRecord.objects.all(), filters)
+        self.assertIsNone(get_columnar_dataset(KpiManager.COLUMNAR_DIMENSIONS).aggregate(filters))
+        self.assertEqual(
+            KpiManager(queryset, filters=filters, engine='columnar').get_all_kpis(),
+            KpiManager(queryset, filters=filters, use_cube=False).get_all_kpis(),
+        )
+
+
+class KpiManagerSectionsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        CampaignRecord.objects.bulk_create(_sample_records(400, seed=9))
+
+    def test_only_requested_sections(self):
+        filters = {'job': ['student', 'admin.'], 'age_min': 30}
+        queryset = FilterManager.apply_filters(CampaignRecord.objects.all(), filters)
+        full = KpiManager(queryset, filters=filters).get_all_kpis()
+        charts = ['tendencia_mensual', 'distribucion_prestamo', 'distribucion_edades']
+        for kwargs, expected in [
+            ({'sections': ['kpi_cards']}, {'kpi_cards': full['kpi_cards']}),
+            ({'charts': charts}, {'charts': {name: full['charts'][name] for name in charts}}),
+            ({'sections': ['kpi_cards', 'charts']}, full),
+        ]:
+            with override_settings(KPI_SECTION_WORKERS=1):
+                data, timings = KpiManager(queryset, filters=filters).get_kpis(**kwargs)
+            self.assertEqual(data, expected)
+            self.assertIn('total', timings)
+
+    def test_queries_bounded_by_workers(self):
+        manager = KpiManager(CampaignRecord.objects.all(), filters={'marital': ['single']})
+        # Una consulta para todas las secciones, más la comprobación del cubo (aquí vacío)
+        with override_settings(KPI_SECTION_WORKERS=1), self.assertNumQueries(2):
+            data, timings = manager.get_kpis(sections=['kpi_cards'], charts=['distribucion_edades', 'tendencia_mensual', 'distribucion_resultados'])
+        self.assertEqual(set(timings), {'kpi_cards', 'distribucion_edades', 'tendencia_mensual', 'distribucion_resultados', 'total'})
+
+    def test_api_sections(self):
+        url = reverse('analytics:kpi_data_api')
+        response = self.client.get(url + '?sections=kpi_cards&job=student')
+        self.assertEqual(list(response.json()), ['kpi_cards'])
+        self.assertIn('kpi_cards;dur=', response['Server-Timing'])
+        with override_settings(KPI_SECTION_WORKERS=1):
+            response = self.client.get(url + '?charts=tendencia_mensual,exito_por_canal&job=student')
+        self.assertEqual(list(response.json()['charts']), ['tendencia_mensual', 'exito_por_canal'])
+        self.assertEqual(self.client.get(url + '?charts=no_existe').status_code, 400)
+
+
+class KpiManagerConcurrentSectionsTests(TransactionTestCase):
+
+    def test_concurrent_sections_match_single_pass(self):
+        CampaignRecord.objects.bulk_create(_sample_records(300, seed=4))
+        manager = KpiManager(CampaignRecord.objects.all(), filters={}, use_cube=False)
+        with override_settings(KPI_SECTION_WORKERS=3):
+            data, timings = manager.get_kpis(sections=['kpi_cards', 'charts'])
+        self.assertEqual(data, manager.get_all_kpis())
+        self.assertEqual(set(timings), {'kpi_cards', 'total', *KpiManager.CHARTS})
+
+
+class KpiManagerApproximateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        CampaignRecord.objects.bulk_create(_sample_records(3000, seed=13))
+        with connection.cursor() as cursor:  # Actualiza la estimación de filas de `pg_class`
+            cursor.execute('ANALYZE dashboard_campaignrecord')
+
+    @override_settings(KPI_APPROX_SAMPLE_ROWS=1500)
+    def test_sampled_preview(self):
+        filters = {'age_min': 30}
+        queryset = FilterManager.apply_filters(CampaignRecord.objects.all(), filters)
+        data, _ = KpiManager(queryset, filters=filters).get_approximate_kpis()
+        approximate = data['approximate']
+        self.assertTrue(approximate['refine'])
+        self.assertLess(approximate['sample_size'], queryset.count())
+        self.assertEqual(set(data['charts']), set(KpiManager.CHARTS))
+        low, high = approximate['intervals']['tasa_conversion']
+        self.assertLessEqual(low, data['kpi_cards']['tasa_conversion'])
+        self.assertGreaterEqual(high, data['kpi_cards']['tasa_conversion'])
+        months = data['charts']['tendencia_mensual']['labels']
+        self.assertEqual(len(approximate['intervals']['tendencia_mensual']), len(months))
+
+        data, _ = KpiManager(queryset, filters=filters).get_approximate_kpis(charts=['exito_por_canal'])
+        self.assertEqual(list(data['charts']), ['exito_por_canal'])
+        self.assertEqual(set(data['approximate']['intervals']), {'exito_por_canal'})
+
+    def test_exact_when_table_is_small(self):
+        queryset = CampaignRecord.objects.filter(age__gte=30)
+        data, _ = KpiManager(queryset, filters={'age_min': 30}).get_approximate_kpis()
+        self.assertNotIn('approximate', data)
+        self.assertEqual(data, KpiManager(queryset).get_all_kpis())
+
+    def test_api_mode(self):
+        url = reverse('analytics:kpi_data_api')
+        with override_settings(KPI_APPROX_SAMPLE_ROWS=1500):
+            self.assertIn('approximate', self.client.get(url + '?age_min=30&mode=approx').json())
+        self.assertEqual(self.client.get(url + '?mode=rapido').status_code, 400)
+
+
+class KpiManagerBinsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        CampaignRecord.objects.bulk_create(_sample_records(600, seed=17))
+
+    def test_default_bins_in_numeric_order(self):
+        charts = KpiManager(CampaignRecord.objects.all()).get_all_kpis()['charts']
+        self.assertEqual(charts['distribucion_balance']['labels'], ['< 0', '0-1k', '1k-2k', '2k-5k', '> 5k'])
+        self.assertEqual(charts['dias_ultimo_contacto']['labels'][0], 'No contactado')
+
+    def test_custom_bins(self):
+        queryset = CampaignRecord.objects.filter(y=True)
+        bins = {'g_balance': Bins('balance', [-1000, 0, 2500])}
+        for single_pass in [True, False]:
+            chart = KpiManager(queryset, single_pass=single_pass, bins=bins).get_all_kpis()['charts']['distribucion_balance']
+            self.assertEqual(chart['labels'], ['< -1000', '-1000--1', '0-2499', '2500+'])
+            self.assertEqual(chart['data'], [
+                queryset.filter(balance__lt=-1000).count(), queryset.filter(balance__gte=-1000, balance__lt=0).count(),
+                queryset.filter(balance__gte=0, balance__lt=2500).count(), queryset.filter(balance__gte=2500).count(),
+            ])
+            self.assertEqual(chart['rates'], [100, 100, 100, 100])
+
+    def test_bin_specs(self):
+        queryset = CampaignRecord.objects.all()
+        self.assertEqual(BinSpec.parse('width:4').resolve('duration', queryset).edges[0], queryset.order_by('duration')[0].duration)
+        self.assertLessEqual(len(BinSpec.parse('quantile:4').resolve('age', queryset).edges), 4)
+        for invalid in ['3,1', 'width:0', 'quantile:x', '']:
+            with self.assertRaises(ValueError):
+                BinSpec.parse(invalid)
+
+        url = reverse('analytics:kpi_data_api') + '?charts=distribucion_duracion&bins=distribucion_duracion:0,300,600'
+        self.assertEqual(self.client.get(url).json()['charts']['distribucion_duracion']['labels'], ['0-299', '300-599', '600+'])
+        self.assertEqual(self.client.get(reverse('analytics:kpi_data_api') + '?bins=tendencia_mensual:1,2').status_code, 400)
+
+
+class ProfitScenarioTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        CampaignRecord.objects.bulk_create(_sample_records(300, seed=21))
+        rebuild_cube()
+
+    def setUp(self):
+        caches['kpi'].clear()
+
+    def test_surface_matches_kpi_cards(self):
+        url = reverse('analytics:profit_scenarios_api') + '?job=student&job=admin.&gain=5,10,20&cost=0:2:5'
+        data = self.client.get(url).json()
+        self.assertEqual(data['costos'], [0, 0.5, 1, 1.5, 2])
+        queryset = FilterManager.apply_filters(CampaignRecord.objects.all(), {'job': ['student', 'admin.']})
+        cards = KpiManager(queryset).get_all_kpis()['kpi_cards']
+        self.assertEqual(data['rentabilidad'][1][2], cards['rentabilidad_proyectada'])  # G=10, C=1
+        self.assertAlmostEqual(data['ganancia_por_llamada'][1][2], cards['ganancia_por_llamada'], places=4)
+        self.assertEqual(data['mejor_escenario'], {'ganancia': 20, 'costo': 0, 'rentabilidad': 20 * cards['clientes_aceptaron']})
+
+        with self.assertNumQueries(1):  # Otra grilla con los mismos filtros: solo la versión del dataset
+            other = self.client.get(reverse('analytics:profit_scenarios_api') + '?job=admin.&job=student&gain=1:100:200&cost=1')
+        self.assertEqual(len(other.json()['rentabilidad']), 200)
+
+    def test_invalid_grids(self):
+        url = reverse('analytics:profit_scenarios_api')
+        for query in ['?gain=a', '?cost=1:2', '?gain=1,inf']:
+            self.assertEqual(self.client.get(url + query).status_code, 400)
+        with override_settings(KPI_SCENARIO_MAX_CELLS=10):
+            self.assertEqual(self.client.get(url + '?gain=1:2:5&cost=1:2:3').status_code, 400)
+
+
+class KpiManagerSegmentTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        CampaignRecord.objects.bulk_create(_sample_records(600, seed=22))
+        rebuild_cube()
+
+    def setUp(self):
+        caches['kpi'].clear()
+
+    def test_segment_by_matches_filtered_kpis(self):
+        for base, use_cube in [({}, True), ({}, False), ({'marital': ['single'], 'age_min': 30}, False)]:
+            queryset = FilterManager.apply_filters(CampaignRecord.objects.all(), base)
+            with self.assertNumQueries(2 if use_cube else 1):  # Con el cubo, también se comprueba que esté construido
+                segments = KpiManager(queryset, filters=base, use_cube=use_cube).get_segment_kpis(segment_by='job')
+            self.assertEqual(list(segments), ['admin.', 'blue-collar', 'management', 'student', 'unknown'])
+            for job, data in segments.items():
+                expected = KpiManager(queryset.filter(job=job), filters={**base, 'job': [job]}, use_cube=use_cube).get_all_kpis()
+                self.assertEqual(data, expected)
+
+    def test_overlapping_segments_in_one_query(self):
+        segments = {
+            'jovenes': {'age_max': 35}, 'estudiantes': {'job': ['student']},
+            'todos': {}, 'vacio': {'age_min': 200},
+        }
+        queryset = CampaignRecord.objects.filter(y=True)
+        with self.assertNumQueries(1):
+            results = KpiManager(queryset).get_segment_kpis(segments=segments)
+        self.assertEqual(list(results), list(segments))
+        for key, filters in segments.items():
+            expected = KpiManager(FilterManager.apply_filters(queryset, filters)).get_all_kpis()
+            self.assertEqual(results[key], expected)
+
+    def test_age_band_segments_on_cube(self):
+        segments = {'jovenes': {'age_max': 29}, 'mayores': {'age_min': '60', 'y': 'yes'}, 'medios': {'age_min': 30, 'age_max': 59}}
+        manager = KpiManager(CampaignRecord.objects.all(), filters={})
+        self.assertTrue(manager.can_use_cube())
+        results = manager.get_segment_kpis(segments=segments)
+        for key, filters in segments.items():
+            queryset = FilterManager.apply_filters(CampaignRecord.objects.all(), filters)
+            self.assertEqual(results[key], KpiManager(queryset, filters=filters, use_cube=False).get_all_kpis())
+
+    def test_compare_api(self):
+        students = SavedFilter.objects.create(name='Estudiantes', parameters={'job': ['student'], 'age_min': '20'})
+        married = SavedFilter.objects.create(name='Casados', parameters={'marital': ['married']})
+        url = reverse('analytics:kpi_compare_api') + f'?contact=cellular&segments={married.pk},{students.pk}'
+        data = self.client.get(url).json()
+        self.assertEqual(list(data['segments']), [str(married.pk), str(students.pk)])
+        self.assertEqual(data['labels'], {str(married.pk): 'Casados', str(students.pk): 'Estudiantes'})
+        expected = self.client.get(reverse('analytics:kpi_data_api') + '?contact=cellular&job=student&age_min=20').json()
+        self.assertEqual(data['segments'][str(students.pk)], expected)
+
+        data = self.client.get(reverse('analytics:kpi_compare_api') + '?segment_by=y').json()
+        self.assertEqual(list(data['segments']), ['False', 'True'])
+        self.assertEqual(data['segments']['True'], self.client.get(reverse('analytics:kpi_data_api') + '?y=yes').json())
+
+        for query in ['', '?segment_by=age', '?segments=999', '?segments=a', f'?segment_by=job&segments={married.pk}']:
+            self.assertEqual(self.client.get(reverse('analytics:kpi_compare_api') + query).status_code, 400)
+
+
+class KpiCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        CampaignRecord.objects.bulk_create(_sample_records(50))
+
+    def setUp(self):
+        caches['kpi'].clear()
+
+    def test_equivalent_filters_share_key(self):
+        kpi_cache = KpiCache()
+        first = {'job': ['student', 'admin.'], 'marital': [], 'age_min': None, 'sort_by': '-age', 'y': ''}
+        second = {'job': ['admin.', 'student'], 'marital': [], 'age_min': None, 'sort_by': '', 'y': ''}
+        self.assertEqual(kpi_cache.make_key(first, 1), kpi_cache.make_key(second, 1))
+        self.assertNotEqual(kpi_cache.make_key(first, 1), kpi_cache.make_key(first, 2))
+
+    def test_hit_until_next_import(self):
+        url = reverse('analytics:kpi_data_api') + '?job=student&job=admin.'
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        with self.assertNumQueries(1):  # Solo la versión del dataset
+            response = self.client.get(reverse('analytics:kpi_data_api') + '?job=admin.&job=student')
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+        ImportJob.objects.create(original_name='nuevo.csv', status=ImportJob.STATUS_DONE, finished_at=timezone.now())
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+
+    def test_conditional_get(self):
+        url = reverse('analytics:kpi_data_api') + '?job=student&job=admin.'
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('no-cache', response['Cache-Control'])
+        etag = response['ETag']
+
+        with self.assertNumQueries(1):  # Solo la versión del dataset, sin leer la caché ni calcular
+            response = self.client.get(reverse('analytics:kpi_data_api') + '?job=admin.&job=student', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag.removeprefix('W/'))
+
+        ImportJob.objects.create(original_name='nuevo.csv', status=ImportJob.STATUS_DONE, finished_at=timezone.now())
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_only_computation_waits_for_db_slot(self):
+        url = reverse('analytics:kpi_data_api') + '?job=student'
+        with mock.patch('analytics.services.limit_db_concurrency', wraps=limit_db_concurrency) as slot:
+            etag = self.client.get(url)['ETag']
+            self.assertEqual(slot.call_count, 1)
+            self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(slot.call_count, 1)  # Ni el acierto de caché ni el 304 piden turno
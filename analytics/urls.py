@@ -11,4 +11,7 @@ urlpatterns = [
     
     # Endpoint de API que devolverá todos los datos de los KPIs y gráficos
     path('api/kpi-data/', views.kpi_data_api_view, name='kpi_data_api'),
+    path('api/kpi-compare/', views.kpi_compare_api_view, name='kpi_compare_api'),
+    path('api/profit-scenarios/', views.profit_scenarios_api_view, name='profit_scenarios_api'),
+    path('api/kpi-cache-stats/', views.kpi_cache_stats_api_view, name='kpi_cache_stats_api'),
 ]
\ No newline at end of file
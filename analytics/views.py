@@ -1,12 +1,21 @@
 # analytics/views.py
 
+from urllib.parse import urlencode
+
+from django.conf import settings
 from django.shortcuts import render
-from django.http import JsonResponse, HttpResponseBadRequest
+from django.http import JsonResponse, HttpResponseBadRequest, QueryDict
+from django.views.decorators.gzip import gzip_page
 
 from consultas.forms import CampaignFilterForm
+from consultas.models import SavedFilter
 from consultas.services import FilterManager
 from dashboard.models import CampaignRecord
-from .services import KpiManager
+from dashboard.services.binning import BinSpec
+from dashboard.services.conditional import conditional_response, make_etag, set_validators
+from dashboard.services.dataset_version import aget_dataset_version
+from .scenarios import parse_grid, profit_surface
+from .services import KpiCache, KpiManager
 
 def analytics_dashboard_view(request):
     """
@@ -17,23 +26,211 @@ def analytics_dashboard_view(request):
     # Pasamos el formulario al contexto para que se puedan renderizar las píldoras de filtros
     return render(request, 'analytics/analytics_dashboard.html', {'form': form})
 
-def kpi_data_api_view(request):
+def _list_param(request, name):
+    """Lee un parámetro de lista, repetido (`?charts=a&charts=b`) o separado por comas."""
+    values = [item.strip() for value in request.GET.getlist(name) for item in value.split(',') if item.strip()]
+    return values or None
+
+
+def _bin_specs(request):
+    """Lee los parámetros `bins=<gráfico>:<intervalos>`; ValueError si alguno es inválido."""
+    specs = {}
+    for value in request.GET.getlist('bins'):
+        chart, _, text = value.partition(':')
+        if chart not in KpiManager.binned_charts():
+            raise ValueError(f"Gráfico sin intervalos configurables: {chart}")
+        specs[chart] = BinSpec.parse(text)
+    return specs
+
+
+@gzip_page
+async def kpi_data_api_view(request):
     """
     Endpoint de API que calcula y devuelve todos los datos
     de KPIs y gráficos basados en los filtros de la URL.
+    Los resultados se guardan en `KpiCache` hasta la siguiente importación.
+
+    Es una vista async: con ASGI, una petición que se responde desde la
+    caché no ocupa un hilo. El cálculo (consultas SQL propias, sin versión
+    async en el ORM) se ejecuta en un hilo y espera su turno en
+    `limit_db_concurrency`.
+
+    `sections=kpi_cards,charts` y `charts=<nombre>,...` limitan la respuesta
+    a lo pedido. `bins=<gráfico>:<intervalos>` (repetible) cambia los
+    intervalos de un histograma: límites `e1,e2,...`, `width:N` o
+    `quantile:N` (ver `BinSpec`). El tiempo de cada sección calculada se informa en la
+    cabecera `Server-Timing`.
+
+    Con `mode=approx` se responde una vista previa calculada sobre una
+    muestra (ver `KpiManager.get_approximate_kpis`), con intervalos de
+    confianza y `approximate.refine` para pedir luego el resultado exacto.
+
+    La respuesta lleva un ETag (versión del dataset + filtros canónicos):
+    si coincide con `If-None-Match` se responde 304 sin calcular nada. El
+    JSON se comprime con gzip cuando el cliente lo acepta.
     """
     # Usamos los mismos formularios y gestor de filtros que en la app `consultas`
     form = CampaignFilterForm(request.GET)
 
     if not form.is_valid():
         return HttpResponseBadRequest(f"Parámetros de filtro inválidos: {form.errors.as_json()}")
-        
-    # Aplicar filtros
-    base_queryset = CampaignRecord.objects.all()
-    filtered_queryset = FilterManager.apply_filters(base_queryset, form.cleaned_data)
-    
-    # Usar el KpiManager para calcular todo
-    kpi_manager = KpiManager(filtered_queryset)
-    data = kpi_manager.get_all_kpis()
-    
-    return JsonResponse(data)
\ No newline at end of file
+
+    sections, charts = _list_param(request, 'sections'), _list_param(request, 'charts')
+    unknown = set(sections or []) - set(KpiManager.SECTIONS) | set(charts or []) - set(KpiManager.CHARTS)
+    if unknown:
+        return HttpResponseBadRequest(f"Secciones o gráficos desconocidos: {', '.join(sorted(unknown))}")
+    try:
+        bin_specs = _bin_specs(request)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    mode = request.GET.get('mode', 'exact')
+    if mode not in ('exact', 'approx'):
+        return HttpResponseBadRequest(f"Modo desconocido: {mode}")
+    variant = None
+    if sections is not None or charts is not None:
+        variant = {'sections': sorted(set(sections or [])), 'charts': sorted(set(charts)) if charts is not None else None}
+    if mode == 'approx':
+        variant = {**(variant or {}), 'mode': mode}
+    if bin_specs:
+        variant = {**(variant or {}), 'bins': {chart: str(spec) for chart, spec in bin_specs.items()}}
+
+    version = await aget_dataset_version()
+    etag = make_etag(version, [KpiCache.canonical_filters(form.cleaned_data), variant])
+    not_modified = conditional_response(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    timings = {}
+
+    def compute_kpis():
+        # Aplicar filtros
+        base_queryset = CampaignRecord.objects.all()
+        filtered_queryset = FilterManager.apply_filters(base_queryset, form.cleaned_data)
+
+        # Usar el KpiManager para calcular lo pedido
+        bins = KpiManager.resolve_bins(bin_specs, filtered_queryset)
+        kpi_manager = KpiManager(filtered_queryset, filters=form.cleaned_data, bins=bins)
+        compute = kpi_manager.get_approximate_kpis if mode == 'approx' else kpi_manager.get_kpis
+        data, section_timings = compute(sections=sections, charts=charts)
+        timings.update(section_timings)
+        return data
+
+    data, cache_hit = await KpiCache().aget_or_compute(form.cleaned_data, compute_kpis, variant=variant, version=version)
+
+    response = set_validators(JsonResponse(data), etag)
+    response['X-Cache'] = 'HIT' if cache_hit else 'MISS'
+    if timings:
+        response['Server-Timing'] = ', '.join(f'{name};dur={duration}' for name, duration in timings.items())
+    return response
+
+@gzip_page
+async def profit_scenarios_api_view(request):
+    """
+    Endpoint de API de escenarios de rentabilidad: para los filtros de la URL
+    y las grillas `gain` (ganancia por conversión) y `cost` (costo por
+    llamada), como lista `a,b,c` o rango `inicio:fin:cantidad`, devuelve la
+    rentabilidad y la ganancia por llamada de cada combinación.
+
+    Los totales se leen de `KpiCache` (se calculan una vez por filtros y
+    versión del dataset) y los escenarios se evalúan con NumPy, sin más
+    consultas por escenario.
+    """
+    form = CampaignFilterForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(f"Parámetros de filtro inválidos: {form.errors.as_json()}")
+    try:
+        gains = parse_grid(request.GET.get('gain', str(settings.KPI_PROFIT_GAIN)))
+        costs = parse_grid(request.GET.get('cost', str(settings.KPI_PROFIT_COST)))
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    if gains.size * costs.size > settings.KPI_SCENARIO_MAX_CELLS:
+        return HttpResponseBadRequest(f"Demasiados escenarios (máximo {settings.KPI_SCENARIO_MAX_CELLS}).")
+
+    version = await aget_dataset_version()
+    etag = make_etag(version, [KpiCache.canonical_filters(form.cleaned_data), gains.tolist(), costs.tolist()])
+    not_modified = conditional_response(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    def compute_totals():
+        filtered_queryset = FilterManager.apply_filters(CampaignRecord.objects.all(), form.cleaned_data)
+        return KpiManager(filtered_queryset, filters=form.cleaned_data).get_totals()
+
+    totals, cache_hit = await KpiCache().aget_or_compute(form.cleaned_data, compute_totals, variant={'totals': True}, version=version)
+
+    response = set_validators(JsonResponse(profit_surface(totals, gains, costs)), etag)
+    response['X-Cache'] = 'HIT' if cache_hit else 'MISS'
+    return response
+
+@gzip_page
+async def kpi_compare_api_view(request):
+    """
+    Endpoint de API para comparar segmentos: con los filtros de la URL como
+    base, devuelve las tarjetas y gráficos de cada valor de
+    `segment_by=<campo>` (ver `KpiManager.SEGMENT_FIELDS`) o de cada filtro
+    guardado de `segments=<id>,...`, en `segments` por clave de segmento
+    (`labels` tiene el nombre a mostrar de cada una).
+
+    Todos los segmentos se calculan en una sola consulta agrupada por la
+    clave del segmento (`KpiManager.get_segment_kpis`), así que comparar
+    diez cuesta casi lo mismo que calcular uno. Usa la misma caché, ETag y
+    compresión que `kpi_data_api_view`.
+    """
+    form = CampaignFilterForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(f"Parámetros de filtro inválidos: {form.errors.as_json()}")
+
+    segment_by, segment_ids = request.GET.get('segment_by'), _list_param(request, 'segments')
+    if (segment_by is None) == (segment_ids is None):
+        return HttpResponseBadRequest("Se debe indicar `segment_by` o `segments`.")
+    labels, segments = {}, None
+    if segment_by is not None:
+        if segment_by not in KpiManager.SEGMENT_FIELDS:
+            return HttpResponseBadRequest(f"Campo de segmento desconocido: {segment_by}")
+        variant = {'segment_by': segment_by}
+    else:
+        try:
+            segment_ids = list(dict.fromkeys(int(pk) for pk in segment_ids))
+        except ValueError:
+            return HttpResponseBadRequest("Los segmentos deben ser ids de filtros guardados.")
+        if len(segment_ids) > settings.KPI_COMPARE_MAX_SEGMENTS:
+            return HttpResponseBadRequest(f"Demasiados segmentos (máximo {settings.KPI_COMPARE_MAX_SEGMENTS}).")
+        saved = {saved_filter.pk: saved_filter async for saved_filter in SavedFilter.objects.filter(pk__in=segment_ids)}
+        missing = [str(pk) for pk in segment_ids if pk not in saved]
+        if missing:
+            return HttpResponseBadRequest(f"Filtros guardados inexistentes: {', '.join(missing)}")
+        segments = {}
+        for pk in segment_ids:
+            segment_form = CampaignFilterForm(QueryDict(urlencode(saved[pk].parameters, doseq=True)))
+            if not segment_form.is_valid():
+                return HttpResponseBadRequest(f"Filtro guardado inválido ({pk}): {segment_form.errors.as_json()}")
+            segments[str(pk)] = segment_form.cleaned_data
+            labels[str(pk)] = saved[pk].name
+        variant = {'segments': [[key, KpiCache.canonical_filters(filters)] for key, filters in segments.items()]}
+
+    version = await aget_dataset_version()
+    etag = make_etag(version, [KpiCache.canonical_filters(form.cleaned_data), variant])
+    not_modified = conditional_response(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    def compute_segments():
+        filtered_queryset = FilterManager.apply_filters(CampaignRecord.objects.all(), form.cleaned_data)
+        kpi_manager = KpiManager(filtered_queryset, filters=form.cleaned_data)
+        results = kpi_manager.get_segment_kpis(segment_by=segment_by, segments=segments)
+        return {str(key): data for key, data in results.items()}
+
+    data, cache_hit = await KpiCache().aget_or_compute(form.cleaned_data, compute_segments, variant=variant, version=version)
+
+    payload = {
+        'segment_by': segment_by,
+        'labels': {key: labels.get(key, key) for key in data},
+        'segments': data,
+    }
+    response = set_validators(JsonResponse(payload), etag)
+    response['X-Cache'] = 'HIT' if cache_hit else 'MISS'
+    return response
+
+def kpi_cache_stats_api_view(request):
+    """Endpoint de API con los contadores de aciertos y fallos de la caché de KPIs."""
+    return JsonResponse(KpiCache.stats())
\ No newline at end of file
@@ -103,4 +103,72 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 
 # Default primary key field type
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Importación de datasets: número de filas que se leen, validan y escriben por bloque
+IMPORT_CHUNK_SIZE = 50000
+
+# Cantidad de hilos que ejecutan los trabajos de importación en segundo plano
+IMPORT_JOB_WORKERS = 2
+
+# Procesos que validan los bloques de un archivo en paralelo (1 = sin paralelismo)
+IMPORT_VALIDATION_WORKERS = 1
+
+# Reporte PDF de errores: grupos (campo + mensaje) que se incluyen y filas de ejemplo por grupo
+ERROR_REPORT_MAX_GROUPS = 200
+ERROR_REPORT_SAMPLE_ROWS = 5
+
+# Directorio del snapshot columnar del dataset (una versión por importación)
+DATASET_SNAPSHOT_DIR = os.path.join(BASE_DIR, 'snapshots')
+
+# Cachés: la de KPIs es independiente y acotada; LocMemCache descarta las
+# entradas usadas hace más tiempo al llegar a MAX_ENTRIES (LRU)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'kpi': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'kpi-results',
+        'OPTIONS': {'MAX_ENTRIES': 256, 'CULL_FREQUENCY': 8},
+    },
+}
+KPI_CACHE_ALIAS = 'kpi'
+# Segundos que se conserva un resultado (None = hasta que se descarte o cambie la versión del dataset)
+KPI_CACHE_TIMEOUT = None
+
+# Calcular los KPIs sobre el cubo pre-agregado cuando los filtros lo permiten
+KPI_USE_CUBE = True
+# work_mem de PostgreSQL durante la reconstrucción del cubo (None = el del servidor)
+CUBE_REBUILD_WORK_MEM = '64MB'
+
+# Motor de KPIs: 'database' (consultas SQL) o 'columnar' (arreglos de NumPy armados
+# desde el snapshot de cada importación; unos 15 bytes por registro y proceso)
+KPI_ENGINE = 'database'
+# Hilos (y conexiones) para calcular en paralelo las secciones pedidas a la API de KPIs.
+# Con un solo núcleo conviene 1: las consultas en paralelo solo compiten entre sí.
+KPI_SECTION_WORKERS = min(4, os.cpu_count() or 1)
+# Cálculos de las vistas async (API de KPIs y de filtros) que consultan la base de datos
+# a la vez por proceso ASGI; el resto espera en el event loop (los aciertos de caché y los 304 no esperan)
+ASYNC_DB_CONCURRENCY = 20
+
+# `mode=approx` de la API de KPIs: registros a muestrear (con menos, el resultado es exacto)
+# y nivel de confianza de los intervalos de las tasas de conversión
+KPI_APPROX_SAMPLE_ROWS = 200000
+KPI_APPROX_CONFIDENCE = 0.95
+
+# Ganancia por conversión y costo por llamada de la rentabilidad proyectada
+# (la API de escenarios evalúa grillas de otros valores sin cambiar estos)
+KPI_PROFIT_GAIN = 10
+KPI_PROFIT_COST = 1
+# Máximo de escenarios (ganancias x costos) por petición a la API de escenarios
+KPI_SCENARIO_MAX_CELLS = 250000
+# Máximo de filtros guardados que se comparan en una petición a la API de comparación
+KPI_COMPARE_MAX_SEGMENTS = 20
+
+# Totales de registros por filtro (`RecordCounter`): caché de los conteos exactos, filas
+# estimadas a partir de las cuales se responde la estimación del planificador mientras
+# se cuenta en segundo plano, e hilos para esos conteos
+RECORD_COUNT_CACHE_ALIAS = 'kpi'
+RECORD_COUNT_ESTIMATE_MIN_ROWS = 1000000
+RECORD_COUNT_WORKERS = 1
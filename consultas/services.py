@@ -1,5 +1,25 @@
 # consultas/services.py
+import hashlib
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.core.paginator import InvalidPage, Paginator
+from django.db import close_old_connections, connection, transaction
+from django.db.models import BooleanField, F, Func, Q, Value
+from django.utils.functional import cached_property
+
 from dashboard.models import CampaignRecord
+from dashboard.services.async_db import limit_db_concurrency
+from dashboard.services.bitmaps import get_bitmap_index
+from dashboard.services.dataset_version import aget_dataset_version, get_dataset_version
+
+# Valor por defecto de los parámetros `match`: todavía no se evaluó (None significa sin índice)
+_NOT_EVALUATED = object()
 
 class FilterManager:
     """
@@ -7,8 +27,17 @@ class FilterManager:
     """
     @staticmethod
     def apply_filters(queryset, params):
+        return queryset.filter(FilterManager.as_q(params))
+
+    @staticmethod
+    def as_q(params):
+        """
+        Los filtros de `apply_filters` como un único `Q`, para poder
+        combinarlos (p. ej. una condición por segmento en una misma consulta).
+        """
         # Hacemos una copia para no modificar el diccionario original
         filters = params.copy()
+        condition = Q()
 
         # Filtro de Resultado ('y')
         # Buscamos el valor, lo eliminamos del diccionario y lo aplicamos si existe.
@@ -17,7 +46,7 @@ class FilterManager:
             # Como puede llegar como lista (['yes']) o string ('yes'), nos aseguramos de tomar el primer elemento
             y_value_str = y_value[0] if isinstance(y_value, list) else y_value
             bool_value = y_value_str.lower() == 'yes'
-            queryset = queryset.filter(y=bool_value)
+            condition &= Q(y=bool_value)
 
         # Filtro de Edad (numérico)
         age_min = filters.pop('age_min', None)
@@ -25,19 +54,341 @@ class FilterManager:
              # Similar a 'y', puede venir en una lista
              age_min_val = age_min[0] if isinstance(age_min, list) else age_min
              if str(age_min_val).isdigit(): # Validamos que sea un número
-                 queryset = queryset.filter(age__gte=int(age_min_val))
+                 condition &= Q(age__gte=int(age_min_val))
 
         age_max = filters.pop('age_max', None)
         if age_max:
              age_max_val = age_max[0] if isinstance(age_max, list) else age_max
              if str(age_max_val).isdigit():
-                 queryset = queryset.filter(age__lte=int(age_max_val))
+                 condition &= Q(age__lte=int(age_max_val))
 
         # Filtros de Múltiples Valores (Píldoras)
         # Lo que queda en 'filters' ya no contiene 'y', 'age_min', ni 'age_max'
         for field, values in filters.items():
-            if values and field != 'sort_by' and field != 'page':
+            if values and field not in FilterManager.IGNORED_PARAMS:
                 lookup = f"{field}__in"
-                queryset = queryset.filter(**{lookup: values})
-        
-        return queryset
\ No newline at end of file
+                condition &= Q(**{lookup: values})
+
+        return condition
+
+    # Parámetros de la petición que no son filtros: no cambian qué registros cumplen
+    IGNORED_PARAMS = ('sort_by', 'page', 'paging', 'cursor')
+
+    @staticmethod
+    def canonical_params(params):
+        """
+        Forma canónica de los filtros (para claves de caché y ETags): sin
+        los vacíos y con las listas ordenadas, para que combinaciones
+        equivalentes den el mismo resultado.
+        """
+        return {
+            field: sorted(value) if isinstance(value, (list, tuple)) else value
+            for field, value in params.items()
+            if value not in (None, '', [], ())
+        }
+
+    @staticmethod
+    def match(params, version=None):
+        """
+        Evalúa los filtros con el índice de bitmaps del snapshot (de la
+        versión actual del dataset, o `version` si ya se consultó). Devuelve
+        un `BitmapMatch` (con `count` e `ids()`), o None si el índice no está
+        disponible o no cubre algún filtro.
+        """
+        index = get_bitmap_index(version)
+        if index is None:
+            return None
+        return index.match({field: value for field, value in params.items() if field not in FilterManager.IGNORED_PARAMS})
+
+    @staticmethod
+    async def amatch(params, version=None):
+        return await sync_to_async(FilterManager.match)(params, version)
+
+    @staticmethod
+    def count(params, match=_NOT_EVALUATED):
+        """
+        Cantidad de registros que cumplen los filtros (popcount si hay
+        índice). `match` es el resultado de `match(params)`, si ya se evaluó.
+        """
+        if match is _NOT_EVALUATED:
+            match = FilterManager.match(params)
+        if match is not None:
+            return match.count
+        return FilterManager.apply_filters(CampaignRecord.objects.all(), params).count()
+
+
+_count_executor = None
+_count_executor_lock = threading.Lock()
+
+
+def get_count_executor():
+    """Pool de hilos compartido que calcula en segundo plano los conteos exactos de `RecordCounter`."""
+    global _count_executor
+    with _count_executor_lock:
+        if _count_executor is None:
+            _count_executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'RECORD_COUNT_WORKERS', 1),
+                thread_name_prefix='record-count',
+            )
+    return _count_executor
+
+
+class RecordCounter:
+    """
+    Total de registros que cumplen unos filtros, para mostrarlo en el
+    explorador, el contexto global y el historial sin un COUNT(*) por página.
+
+    `count` devuelve `(total, aproximado)`. Los totales exactos se guardan
+    en caché por filtros canónicos y versión del dataset, así que se
+    calculan una vez por importación (con el popcount del índice de bitmaps
+    si está disponible). Sin índice, en PostgreSQL, si el planificador
+    estima al menos `RECORD_COUNT_ESTIMATE_MIN_ROWS` filas (sin filtros o
+    filtros muy amplios sobre tablas grandes) se devuelve esa estimación
+    marcada como aproximada y el conteo exacto se calcula en segundo plano
+    (`get_count_executor`); las consultas siguientes ya reciben el exacto.
+
+    Quien ya evaluó `FilterManager.match` (la API de filtros, que también lo
+    usa para paginar) lo pasa en `match` y no se vuelve a evaluar. Con
+    `exact=True` nunca se devuelve la estimación (p. ej. para el historial,
+    donde el total queda guardado).
+    """
+    KEY_PREFIX = 'record-count'
+    PENDING_TIMEOUT = 300  # Segundos que se espera un conteo en segundo plano antes de reintentarlo
+
+    def __init__(self, alias=None):
+        self.cache = caches[alias or getattr(settings, 'RECORD_COUNT_CACHE_ALIAS', 'default')]
+
+    def make_key(self, params, version):
+        canonical = {
+            field: value for field, value in FilterManager.canonical_params(params).items()
+            if field not in FilterManager.IGNORED_PARAMS
+        }
+        payload = json.dumps(canonical, sort_keys=True, default=str)
+        return f"{self.KEY_PREFIX}:{version}:{hashlib.md5(payload.encode('utf-8')).hexdigest()}"
+
+    def count(self, params, version=None, match=_NOT_EVALUATED, exact=False):
+        version = get_dataset_version() if version is None else version
+        key = self.make_key(params, version)
+        total = self.cache.get(key)
+        if total is not None:
+            return total, False
+        if exact:
+            return self.refresh(params, key, match), False
+        return self._count_uncached(params, key, version, match)
+
+    async def acount(self, params, version=None, match=_NOT_EVALUATED):
+        """
+        Versión async de `count`: la caché se consulta sin bloquear y el
+        conteo se hace en un hilo, con turno de `limit_db_concurrency`.
+        """
+        version = await aget_dataset_version() if version is None else version
+        key = self.make_key(params, version)
+        total = await self.cache.aget(key)
+        if total is not None:
+            return total, False
+        async with limit_db_concurrency():
+            return await sync_to_async(self._count_uncached)(params, key, version, match)
+
+    def _count_uncached(self, params, key, version, match):
+        if match is _NOT_EVALUATED:
+            match = FilterManager.match(params, version)
+        if match is None:
+            estimate = self.estimate(params)
+            if estimate is not None and estimate >= getattr(settings, 'RECORD_COUNT_ESTIMATE_MIN_ROWS', 1000000):
+                self._schedule_refresh(params, key)
+                return estimate, True
+        return self.refresh(params, key, match), False
+
+    def refresh(self, params, key=None, match=_NOT_EVALUATED):
+        """Cuenta exactamente los registros de `params` y guarda el total en la caché."""
+        key = key or self.make_key(params, get_dataset_version())
+        total = FilterManager.count(params, match)
+        self.cache.set(key, total, None)
+        self.cache.delete(f'{key}:pending')
+        return total
+
+    @staticmethod
+    def estimate(params):
+        """Filas que estima el planificador de PostgreSQL para los filtros (None en otras bases de datos)."""
+        if connection.vendor != 'postgresql':
+            return None
+        queryset = FilterManager.apply_filters(CampaignRecord.objects.all(), params).order_by()
+        plan = json.loads(queryset.explain(format='json'))
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def _schedule_refresh(self, params, key):
+        # Un solo conteo en curso por clave; se encola al confirmar la transacción actual
+        if self.cache.add(f'{key}:pending', True, self.PENDING_TIMEOUT):
+            transaction.on_commit(lambda: get_count_executor().submit(self._refresh_in_background, dict(params), key))
+
+    def _refresh_in_background(self, params, key):
+        close_old_connections()
+        try:
+            self.refresh(params, key)
+        finally:
+            close_old_connections()
+
+
+class BitmapPaginator(Paginator):
+    """
+    Paginator que toma el total de `match` (un `BitmapMatch`) en lugar de
+    hacer COUNT(*), y cuando la lista se ordena por id busca los registros
+    de la página por sus ids en lugar de filtrar y saltar filas con OFFSET.
+    """
+
+    def __init__(self, object_list, per_page, match=None, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.match = match
+        if count is not None:  # Total ya conocido (p. ej. de `RecordCounter`)
+            self.__dict__['count'] = count
+
+    @cached_property
+    def count(self):
+        if self.match is not None:
+            return self.match.count
+        return super().count
+
+    def page(self, number):
+        if self.match is None:
+            return super().page(number)
+        number = self.validate_number(number)
+        return self._get_page(self._page_queryset((number - 1) * self.per_page), number, self)
+
+    async def apage(self, number, fields):
+        """
+        Versión async de `page` para las vistas async: el total (si no se
+        conoce ya) y las filas de la página (diccionarios con `fields`) se
+        piden con el ORM async, una consulta después de la otra.
+        """
+        try:
+            bottom = max(int(number) - 1, 0) * self.per_page
+        except (TypeError, ValueError):
+            bottom = 0  # `validate_number` lanza el error correspondiente
+        if self.match is None and 'count' not in self.__dict__:
+            self.__dict__['count'] = await self.object_list.acount()  # Lo que calcularía la propiedad `count`
+        records = [row async for row in self._page_queryset(bottom).values(*fields)]
+        number = self.validate_number(number)
+        return self._get_page(records, number, self)
+
+    def _page_queryset(self, bottom):
+        ordering = tuple(self.object_list.query.order_by)
+        if self.match is None or ordering not in (('id',), ('-id',)):
+            return self.object_list[bottom:bottom + self.per_page]
+        ids = self.match.ids()
+        if ordering == ('-id',):
+            ids = ids[::-1]
+        page_ids = [int(pk) for pk in ids[bottom:bottom + self.per_page]]
+        return self.object_list.model.objects.filter(pk__in=page_ids).order_by(*ordering)
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class RowComparison(Func):
+    """
+    Comparación de filas de SQL, `(a, b) > (x, y)`: un solo predicado que la
+    base de datos resuelve con un rango de un índice sobre `(a, b)`.
+    """
+    output_field = BooleanField()
+
+    def __init__(self, columns, operator, values):
+        self.operator = operator
+        super().__init__(*(F(column) for column in columns), *(Value(value) for value in values))
+
+    def as_sql(self, compiler, connection, **extra_context):
+        compiled = [compiler.compile(expression) for expression in self.source_expressions]
+        half = len(compiled) // 2
+        lhs = ', '.join(sql for sql, _ in compiled[:half])
+        rhs = ', '.join(sql for sql, _ in compiled[half:])
+        return f'({lhs}) {self.operator} ({rhs})', [param for _, params in compiled for param in params]
+
+
+class KeysetPaginator:
+    """
+    Paginación por cursor (keyset) para el explorador de datos: en lugar de
+    saltar filas con OFFSET, cada página se pide con un token opaco que
+    guarda `(valor del orden, id)` de la última (o primera) fila de la
+    página anterior, y se busca con `(campo, id) > (valor, id)` (o `<` en
+    orden descendente). Con un índice sobre `(campo, id)` la consulta lee
+    solo las filas de la página, así que tarda lo mismo en cualquier
+    profundidad, y no hace falta contar el total.
+
+    El id desempata los valores repetidos del campo de orden, en el mismo
+    sentido (`-age` ordena por `-age, -id`). Los tokens van firmados e
+    incluyen el orden: un token de otro orden o alterado es `InvalidCursor`.
+    Solo se ordena por los campos de `SORT_FIELDS`.
+    """
+    SALT = 'consultas.keyset'
+    NEXT = 'next'
+    PREVIOUS = 'previous'
+
+    # Campos con índice `(campo, id)` en `CampaignRecord.Meta.indexes`: con
+    # cualquier otro, cada página recorrería toda la tabla filtrada
+    SORT_FIELDS = ('id',) + tuple(
+        index.fields[0] for index in CampaignRecord._meta.indexes if index.fields[1:] == ['id']
+    )
+
+    def __init__(self, queryset, per_page, sort_by='id'):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.sort_by = sort_by or 'id'
+        self.field = self.sort_by.lstrip('-')
+        self.descending = self.sort_by.startswith('-')
+        if self.field not in self.SORT_FIELDS:
+            raise ValueError(f"No se puede paginar por cursor ordenando por '{self.field}'.")
+
+    def _key(self, row):
+        return [row['id']] if self.field == 'id' else [row[self.field], row['id']]
+
+    def _make_cursor(self, row, direction):
+        return signing.dumps({'sort': self.sort_by, 'key': self._key(row), 'dir': direction}, salt=self.SALT)
+
+    def _read_cursor(self, cursor):
+        try:
+            data = signing.loads(cursor, salt=self.SALT)
+        except signing.BadSignature:
+            raise InvalidCursor("Cursor inválido.") from None
+        if data.get('sort') != self.sort_by or data.get('dir') not in (self.NEXT, self.PREVIOUS):
+            raise InvalidCursor("El cursor corresponde a otro orden.")
+        return data['key'], data['dir']
+
+    def _page_queryset(self, cursor, fields):
+        """Filas de la página (una más para saber si hay otra) en el sentido de lectura, y ese sentido."""
+        columns = ['id'] if self.field == 'id' else [self.field, 'id']
+        key, direction = self._read_cursor(cursor) if cursor else (None, self.NEXT)
+        # Hacia atrás se lee en el orden inverso desde la primera fila de la página
+        descending = self.descending != (direction == self.PREVIOUS)
+        queryset = self.queryset
+        if key is not None:
+            queryset = queryset.filter(RowComparison(columns, '<' if descending else '>', key))
+        ordering = [f'-{column}' if descending else column for column in columns]
+        values = list(dict.fromkeys([*fields, *columns]))
+        return queryset.order_by(*ordering).values(*values)[:self.per_page + 1], direction, cursor is not None
+
+    def _build_page(self, rows, direction, has_cursor, fields):
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == self.PREVIOUS:
+            rows.reverse()
+        has_next, has_previous = (more, has_cursor) if direction == self.NEXT else (has_cursor, more)
+        return {
+            'records': [{field: row[field] for field in fields} for row in rows],
+            'has_next': has_next,
+            'has_previous': has_previous,
+            'next_cursor': self._make_cursor(rows[-1], self.NEXT) if has_next and rows else None,
+            'previous_cursor': self._make_cursor(rows[0], self.PREVIOUS) if has_previous and rows else None,
+        }
+
+    def page(self, cursor, fields):
+        """
+        Página que sigue (o precede) al `cursor` (None = la primera), con
+        los registros como diccionarios de `fields`, `has_next`,
+        `has_previous` y los cursores `next_cursor` y `previous_cursor`.
+        """
+        queryset, direction, has_cursor = self._page_queryset(cursor, fields)
+        return self._build_page(list(queryset), direction, has_cursor, fields)
+
+    async def apage(self, cursor, fields):
+        queryset, direction, has_cursor = self._page_queryset(cursor, fields)
+        return self._build_page([row async for row in queryset], direction, has_cursor, fields)
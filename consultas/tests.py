@@ -1,3 +1,219 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from analytics.tests import _sample_records
+from dashboard.models import CampaignRecord, ImportJob
+from dashboard.services.bitmaps import BitmapIndex, get_bitmap_index, write_bitmap_index
+from dashboard.services.snapshots import write_snapshot
+from history.models import QueryHistory
+from .models import SavedFilter
+from .services import BitmapPaginator, FilterManager, InvalidCursor, KeysetPaginator, RecordCounter
+
+
+class BitmapIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        CampaignRecord.objects.bulk_create(_sample_records(700, seed=3))
+
+    def setUp(self):
+        caches['kpi'].clear()
+        snapshot_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, snapshot_dir, ignore_errors=True)
+        settings_override = override_settings(DATASET_SNAPSHOT_DIR=snapshot_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        write_bitmap_index(write_snapshot())
+
+    def test_counts_match_database(self):
+        for params in [
+            {},
+            {'job': ['student', 'admin.'], 'marital': ['single']},
+            {'y': ['yes'], 'age_min': ['30'], 'age_max': ['60'], 'page': ['2'], 'sort_by': ['-age']},
+            {'contact': ['cellular'], 'month': ['may', 'aug'], 'poutcome': ['success', 'failure']},
+            {'default': ['True'], 'housing': ['False'], 'loan': [], 'y': 'no'},
+            {'marital': ['unknown']},
+        ]:
+            expected = FilterManager.apply_filters(CampaignRecord.objects.all(), params)
+            match = FilterManager.match(params)
+            self.assertEqual(match.count, expected.count())
+            self.assertEqual(list(match.ids()), list(expected.order_by('id').values_list('id', flat=True)))
+
+    def test_unsupported_filter_uses_database(self):
+        self.assertIsNone(get_bitmap_index().match({'balance': ['100']}))
+        self.assertEqual(FilterManager.count({'age': ['40']}), CampaignRecord.objects.filter(age__in=['40']).count())
+
+    def test_index_is_reused_per_version(self):
+        index = get_bitmap_index()
+        with mock.patch('dashboard.services.bitmaps.get_current_snapshot') as get_current_snapshot, \
+                self.assertNumQueries(0):
+            self.assertIs(get_bitmap_index(version=0), index)
+        get_current_snapshot.assert_not_called()
+
+        # Otra versión del dataset: el snapshot vigente ya no le corresponde
+        ImportJob.objects.create(original_name='nuevo.csv', status=ImportJob.STATUS_DONE, finished_at=timezone.now())
+        self.assertIsNone(get_bitmap_index())
+
+    def test_filter_api_matches_once(self):
+        url = reverse('consultas:filter_data_api') + '?job=student&page=2'
+        with mock.patch.object(BitmapIndex, 'match', autospec=True, side_effect=BitmapIndex.match) as match:
+            response = self.client.get(url)
+        self.assertEqual(response.json()['total_records'], CampaignRecord.objects.filter(job='student').count())
+        self.assertEqual(match.call_count, 1)  # El total y la página usan la misma evaluación
+
+    def test_paginator_pages_by_id(self):
+        params = {'job': ['blue-collar'], 'y': 'no'}
+        queryset = FilterManager.apply_filters(CampaignRecord.objects.all(), params)
+        for ordering in ['id', '-id']:
+            paginator = BitmapPaginator(queryset.order_by(ordering), 25, match=FilterManager.match(params))
+            with self.assertNumQueries(1):  # Solo los registros de la página (sin COUNT ni OFFSET)
+                page = paginator.page(3)
+                ids = [record.id for record in page.object_list]
+            self.assertEqual(paginator.count, queryset.count())
+            self.assertEqual(ids, list(queryset.order_by(ordering).values_list('id', flat=True)[50:75]))
+
+    def test_filter_api(self):
+        response = self.client.get(reverse('consultas:filter_data_api') + '?job=student&sort_by=-id&page=2')
+        queryset = CampaignRecord.objects.filter(job='student').order_by('-id')
+        self.assertEqual(response.json()['total_records'], queryset.count())
+        self.assertEqual([r['id'] for r in response.json()['records']], list(queryset.values_list('id', flat=True)[25:50]))
+
+    def test_filter_api_conditional_get(self):
+        url = reverse('consultas:filter_data_api') + '?job=student&sort_by=-id&page=2'
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):  # Solo la versión del dataset
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertNotEqual(self.client.get(url.replace('page=2', 'page=3'))['ETag'], etag)
+
+
+class KeysetPaginatorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        CampaignRecord.objects.bulk_create(_sample_records(230, seed=5))
+
+    def setUp(self):
+        caches['kpi'].clear()
+
+    def test_walks_all_rows_in_both_directions(self):
+        queryset = CampaignRecord.objects.filter(y=False)
+        for sort_by in ['id', '-id', 'age', '-age', 'job', '-balance', 'y']:
+            field = sort_by.lstrip('-')
+            ordering = [sort_by, '-id' if sort_by.startswith('-') else 'id'] if field != 'id' else [sort_by]
+            expected = list(queryset.order_by(*ordering).values_list('id', flat=True))
+            paginator = KeysetPaginator(queryset, 25, sort_by=sort_by)
+            pages, cursor = [], None
+            while True:
+                with self.assertNumQueries(1):  # Sin COUNT
+                    page = paginator.page(cursor, ['id'])
+                pages.append([record['id'] for record in page['records']])
+                if not page['has_next']:
+                    break
+                cursor = page['next_cursor']
+            self.assertEqual([pk for ids in pages for pk in ids], expected)
+
+            # Hacia atrás, desde la última página
+            for ids in reversed(pages[:-1]):
+                page = paginator.page(page['previous_cursor'], ['id'])
+                self.assertEqual([record['id'] for record in page['records']], ids)
+            self.assertFalse(page['has_previous'])
+
+    def test_rejects_foreign_cursor(self):
+        queryset = CampaignRecord.objects.all()
+        cursor = KeysetPaginator(queryset, 25, sort_by='age').page(None, ['id'])['next_cursor']
+        with self.assertRaises(InvalidCursor):
+            KeysetPaginator(queryset, 25, sort_by='-age').page(cursor, ['id'])
+        with self.assertRaises(InvalidCursor):
+            KeysetPaginator(queryset, 25, sort_by='age').page(cursor[:-2], ['id'])
+
+    def test_filter_api(self):
+        url = reverse('consultas:filter_data_api') + '?job=student&sort_by=-age&paging=keyset'
+        first = self.client.get(url).json()
+        self.assertNotIn('total_pages', first)
+        second = self.client.get(url + '&cursor=' + first['next_cursor']).json()
+        expected = CampaignRecord.objects.filter(job='student').order_by('-age', '-id').values_list('id', flat=True)
+        self.assertEqual([r['id'] for r in first['records'] + second['records']], list(expected[:50]))
+
+    def test_only_indexed_sort_fields(self):
+        with self.assertRaises(ValueError):
+            KeysetPaginator(CampaignRecord.objects.all(), 25, sort_by='-duration')
+        # La API ordena por id en lugar de recorrer la tabla por un campo sin índice
+        expected = list(CampaignRecord.objects.order_by('id').values_list('id', flat=True)[:25])
+        for sort_by in ['content_hash', '-duration', 'desconocido']:
+            url = reverse('consultas:filter_data_api') + f'?paging=keyset&sort_by={sort_by}'
+            self.assertEqual([r['id'] for r in self.client.get(url).json()['records']], expected)
+        self.assertEqual(self.client.get(url + '&cursor=invalido').status_code, 400)
+
+
+class RecordCounterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        CampaignRecord.objects.bulk_create(_sample_records(300, seed=9))
+
+    def setUp(self):
+        caches['kpi'].clear()
+        snapshot_dir = tempfile.mkdtemp()  # Vacío: sin índice de bitmaps
+        self.addCleanup(shutil.rmtree, snapshot_dir, ignore_errors=True)
+        settings_override = override_settings(DATASET_SNAPSHOT_DIR=snapshot_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_exact_count_is_cached(self):
+        params = {'job': ['student', 'admin.'], 'page': '3'}
+        expected = CampaignRecord.objects.filter(job__in=['student', 'admin.']).count()
+        self.assertEqual(RecordCounter().count(params), (expected, False))
+        with self.assertNumQueries(1):  # Solo la versión del dataset
+            self.assertEqual(RecordCounter().count({'job': ['admin.', 'student'], 'sort_by': '-age'}), (expected, False))
+
+    def test_request_params_are_not_filters(self):
+        # Los parámetros de paginación de la URL pueden llegar a un filtro guardado
+        params = {'job': ['student'], 'sort_by': ['-age'], 'page': ['2'], 'paging': ['keyset'], 'cursor': ['abc']}
+        expected = CampaignRecord.objects.filter(job='student').count()
+        self.assertEqual(FilterManager.count(params), expected)
+        self.assertEqual(RecordCounter().make_key(params, 1), RecordCounter().make_key({'job': ['student']}, 1))
+
+    @override_settings(RECORD_COUNT_ESTIMATE_MIN_ROWS=1)
+    def test_estimate_then_exact(self):
+        counter = RecordCounter()
+        with self.captureOnCommitCallbacks() as callbacks:
+            total, approximate = counter.count({})
+            counter.count({})  # El conteo en segundo plano se encola una sola vez
+        self.assertTrue(approximate)
+        self.assertEqual(total, RecordCounter.estimate({}))
+        self.assertEqual(len(callbacks), 1)
+
+        counter.refresh({})  # Lo que hace el hilo de fondo
+        self.assertEqual(counter.count({}), (300, False))
+        self.assertFalse(self.client.get(reverse('consultas:filter_data_api')).json()['total_approximate'])
+
+    @override_settings(RECORD_COUNT_ESTIMATE_MIN_ROWS=1)
+    def test_history_stores_exact_count(self):
+        # La estimación solo sirve para el explorador: el historial guarda el total
+        expected = CampaignRecord.objects.filter(job='student').count()
+        self.client.post(reverse('consultas:save_filter'), {'filter_name': 'Estudiantes', 'query_params': 'job=student'})
+        caches['kpi'].clear()
+        self.client.get(reverse('consultas:load_filter', args=[SavedFilter.objects.get().pk]))
+        self.assertEqual(list(QueryHistory.objects.values_list('records_count', flat=True)), [expected, expected])
+
+    def test_filter_api_etag_skips_count(self):
+        url = reverse('consultas:filter_data_api') + '?job=student&page=2'
+        etag = self.client.get(url)['ETag']
+        caches['kpi'].clear()
+        with self.assertNumQueries(1):  # Solo la versión del dataset: el total no se vuelve a contar
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Un total aproximado no lleva ETag: la siguiente petición recibe el exacto
+        caches['kpi'].clear()
+        with override_settings(RECORD_COUNT_ESTIMATE_MIN_ROWS=1):
+            response = self.client.get(url.replace('page=2', 'page=1'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['total_approximate'])
+        self.assertNotIn('ETag', response)
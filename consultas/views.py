@@ -4,22 +4,26 @@ import csv
 from io import BytesIO
 from urllib.parse import urlencode
 from django.shortcuts import render, redirect, get_object_or_404
-from django.core.paginator import Paginator, EmptyPage
+from django.core.paginator import EmptyPage
 from django.http import HttpResponse, JsonResponse, QueryDict
 from django.contrib import messages
 from datetime import datetime
+from django.utils.cache import add_never_cache_headers
+from django.views.decorators.gzip import gzip_page
 from django.views.decorators.http import require_POST
 
 # Importaciones de ReportLab para el PDF
 from reportlab.lib.pagesizes import letter, landscape
 from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, PageBreak
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
 from reportlab.lib.units import inch
 
 from dashboard.models import CampaignRecord
+from dashboard.services.async_db import limit_db_concurrency
+from dashboard.services.conditional import conditional_response, make_etag, set_validators
+from dashboard.services.dataset_version import aget_dataset_version
 from .forms import CampaignFilterForm
-from .services import FilterManager
-from .services import FilterManager
+from .services import BitmapPaginator, FilterManager, InvalidCursor, KeysetPaginator, RecordCounter
 from .models import SavedFilter
 from history.models import QueryHistory
 
@@ -31,29 +35,89 @@ def data_explorer_view(request):
     return render(request, 'consultas/data_explorer.html', context)
 
 
-def filter_data_api_view(request):
+@gzip_page
+async def filter_data_api_view(request):
+    """
+    Vista async: el total y la página de registros se consultan con el ORM
+    async, una consulta después de la otra; las que llegan a la base de
+    datos esperan su turno en `limit_db_concurrency` (un 304 no espera).
+
+    Con `paging=keyset` (o un `cursor`) se pagina por cursor
+    (`KeysetPaginator`): la respuesta trae `next_cursor` y
+    `previous_cursor` en lugar de números de página, cada página tarda lo
+    mismo a cualquier profundidad.
+
+    El total sale de `RecordCounter` (en caché por filtros y versión del
+    dataset); con `total_approximate` es una estimación y el exacto llega
+    en una petición posterior.
+
+    El ETag combina la versión del dataset con los filtros, el orden y la
+    página (o el cursor): si coincide con `If-None-Match` se responde 304
+    sin contar ni consultar los registros.
+    """
     queryset = CampaignRecord.objects.all()
     form = CampaignFilterForm(request.GET)
     if not form.is_valid():
         return JsonResponse({'error': 'Parámetros inválidos', 'details': form.errors}, status=400)
     
     filtered_queryset = FilterManager.apply_filters(queryset, form.cleaned_data)
+    page_number = request.GET.get('page', 1)
+    cursor = request.GET.get('cursor') or None
+    keyset = cursor is not None or request.GET.get('paging') == 'keyset'
+
     sort_by = request.GET.get('sort_by', 'id')
-    valid_sort_fields = [f.name for f in CampaignRecord._meta.get_fields()]
+    valid_sort_fields = KeysetPaginator.SORT_FIELDS if keyset else [f.name for f in CampaignRecord._meta.get_fields()]
     if sort_by.strip('-') in valid_sort_fields:
         filtered_queryset = filtered_queryset.order_by(sort_by)
+    else:
+        # Por cursor, solo los campos con índice (campo, id); si no, se ordena por id
+        sort_by = 'id' if keyset else None
 
-    paginator = Paginator(filtered_queryset, 25)
-    page_number = request.GET.get('page', 1)
+    filters = {field: value for field, value in form.cleaned_data.items() if field != 'sort_by'}
+    position = ['keyset', cursor] if keyset else str(page_number)
+    version = await aget_dataset_version()
+    # El ETag no depende del total: se compara antes de contar los registros
+    etag = make_etag(version, [FilterManager.canonical_params(filters), sort_by, position])
+    not_modified = conditional_response(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    # Los filtros se evalúan una vez con el índice de bitmaps: sirven para el total y para la página
+    match = await FilterManager.amatch(form.cleaned_data, version=version)
+    total, approximate = await RecordCounter().acount(form.cleaned_data, version=version, match=match)
+
+    def respond(data):
+        # Un total aproximado cambia cuando llega el exacto: esa respuesta no
+        # lleva ETag, para que la siguiente petición no reciba un 304
+        if approximate:
+            response = JsonResponse(data)
+            add_never_cache_headers(response)
+            return response
+        return set_validators(JsonResponse(data), etag)
+
+    fields = ['id', 'age', 'job', 'marital', 'education', 'balance', 'contact', 'y']
+    if keyset:
+        try:
+            async with limit_db_concurrency():
+                page = await KeysetPaginator(filtered_queryset, 25, sort_by=sort_by).apage(cursor, fields)
+        except InvalidCursor as error:
+            return JsonResponse({'error': str(error)}, status=400)
+        page.update(total_records=total, total_approximate=approximate)
+        return respond(page)
+
+    # Los ids de la página salen del índice de bitmaps cuando está disponible
+    paginator = BitmapPaginator(filtered_queryset, 25, match=match, count=total)
     try:
-        page_obj = paginator.page(page_number)
+        async with limit_db_concurrency():
+            page_obj = await paginator.apage(page_number, fields)
     except EmptyPage:
-        return JsonResponse({'records': [], 'total_records': 0, 'total_pages': 0, 'current_page': page_number})
+        return respond({'records': [], 'total_records': 0, 'total_pages': 0, 'current_page': page_number})
 
-    records_data = list(page_obj.object_list.values('id', 'age', 'job', 'marital', 'education', 'balance', 'contact', 'y'))
-    return JsonResponse({
-        'records': records_data, 'total_records': paginator.count, 'total_pages': paginator.num_pages,
-        'current_page': page_obj.number, 'has_previous': page_obj.has_previous(), 'has_next': page_obj.has_next()
+    records_data = list(page_obj.object_list)
+    return respond({
+        'records': records_data, 'total_records': paginator.count, 'total_approximate': approximate,
+        'total_pages': paginator.num_pages, 'current_page': page_obj.number,
+        'has_previous': page_obj.has_previous(), 'has_next': page_obj.has_next()
     })
 
 def save_filter_view(request):
@@ -64,9 +128,7 @@ def save_filter_view(request):
         if filter_name and query_params_str:
             params_dict = dict(QueryDict(query_params_str, mutable=True).lists())
 
-            record_count = FilterManager.apply_filters(
-                CampaignRecord.objects.all(), params_dict
-            ).count()
+            record_count, _ = RecordCounter().count(params_dict, exact=True)
             
             # Limpiamos arrays innecesarios para valores únicos
             for key in ['page', 'sort_by', 'age_min', 'age_max']:
@@ -90,9 +152,7 @@ def load_filter_view(request, filter_id):
     saved_filter = get_object_or_404(SavedFilter, pk=filter_id)
     params_dict = saved_filter.parameters
 
-    record_count = FilterManager.apply_filters(
-        CampaignRecord.objects.all(), params_dict
-    ).count()
+    record_count, _ = RecordCounter().count(params_dict, exact=True)
 
     QueryHistory.objects.create(
         description=f"Se cargó el filtro: '{saved_filter.name}'",
@@ -171,8 +231,9 @@ def export_data_view(request):
     if sort_by.strip('-') in valid_sort_fields:
         filtered_queryset = filtered_queryset.order_by(sort_by)
 
-    # Convertimos el QuerySet a una lista de diccionarios
-    data = list(filtered_queryset.values())
+    # Convertimos el QuerySet a una lista de diccionarios (sin el hash interno de contenido)
+    export_fields = [f.name for f in CampaignRecord._meta.fields if f.name != 'content_hash']
+    data = list(filtered_queryset.values(*export_fields))
     
     if not data:
         messages.error(request, "No hay datos para exportar con los filtros seleccionados.")
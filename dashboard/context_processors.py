@@ -1,11 +1,15 @@
 # dashboard/context_processors.py
 
-from .models import CampaignRecord
+from consultas.services import RecordCounter
 
 def global_context(request):
     """
     Agrega datos globales al contexto de todas las plantillas.
+    El total de registros sale de `RecordCounter` (en caché hasta la
+    siguiente importación, o estimado si la tabla es muy grande).
     """
+    total, approximate = RecordCounter().count({})
     return {
-        'total_records_count': CampaignRecord.objects.count(),
-    }
\ No newline at end of file
+        'total_records_count': total,
+        'total_records_approximate': approximate,
+    }
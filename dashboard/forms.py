@@ -1,9 +1,24 @@
 # dashboard/forms.py
 
 from django import forms
+from .models import ImportJob
+from .services.importer_factory import ImporterFactory
 
 class DatasetUploadForm(forms.Form):
     file = forms.FileField(
         label='Selecciona un archivo CSV o Excel',
-        widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.csv, .xlsx, .xls'})
-    )
\ No newline at end of file
+        widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.csv, .xlsx'})
+    )
+    mode = forms.ChoiceField(
+        label='Modo de carga',
+        choices=ImportJob.MODE_CHOICES,
+        initial=ImportJob.MODE_REPLACE,
+        widget=forms.RadioSelect(attrs={'class': 'form-check-input'})
+    )
+
+    def clean_file(self):
+        # Rechaza aquí los formatos que no se pueden importar (p. ej. .xls),
+        # en lugar de crear un trabajo que fallaría al leer el archivo
+        file = self.cleaned_data['file']
+        ImporterFactory.get_importer_class(file, file.name)
+        return file
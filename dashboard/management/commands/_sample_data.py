@@ -0,0 +1,49 @@
+# dashboard/management/commands/_sample_data.py
+
+import numpy as np
+import pandas as pd
+
+from dashboard.services.validators import (
+    REQUIRED_COLUMNS, JOB_CHOICES, MARITAL_CHOICES, EDUCATION_CHOICES,
+    CONTACT_CHOICES, POUTCOME_CHOICES, MONTH_CHOICES
+)
+
+
+def build_sample_frame(rows, seed=0):
+    """
+    Genera un DataFrame sintético y válido con las columnas de `CampaignRecord`,
+    tal como lo entrega `CampaignFrameValidator`. Se usa en los benchmarks.
+    """
+    rng = np.random.default_rng(seed)
+
+    def choice(values):
+        return rng.choice(sorted(values), size=rows)
+
+    frame = pd.DataFrame({
+        'age': rng.integers(17, 99, size=rows),
+        'job': choice(JOB_CHOICES),
+        'marital': choice(MARITAL_CHOICES),
+        'education': choice(EDUCATION_CHOICES),
+        'default': rng.random(rows) < 0.02,
+        'balance': rng.integers(-2000, 20000, size=rows),
+        'housing': rng.random(rows) < 0.55,
+        'loan': rng.random(rows) < 0.15,
+        'contact': choice(CONTACT_CHOICES),
+        'day': rng.integers(1, 32, size=rows),
+        'month': choice(MONTH_CHOICES),
+        'duration': rng.integers(0, 5001, size=rows),
+        'campaign': rng.integers(1, 100, size=rows),
+        'pdays': rng.integers(-1, 1000, size=rows),
+        'previous': rng.integers(0, 301, size=rows),
+        'poutcome': choice(POUTCOME_CHOICES),
+        'y': rng.random(rows) < 0.12,
+    })
+    return frame[REQUIRED_COLUMNS]
+
+
+def frame_to_csv_bytes(frame):
+    """Serializa un DataFrame de muestra con el formato de carga (`;`, yes/no)."""
+    csv_frame = frame.copy()
+    for col in ['default', 'housing', 'loan', 'y']:
+        csv_frame[col] = np.where(csv_frame[col], 'yes', 'no')
+    return csv_frame.to_csv(sep=';', index=False).encode()
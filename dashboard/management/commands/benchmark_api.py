@@ -0,0 +1,131 @@
+# dashboard/management/commands/benchmark_api.py
+
+import asyncio
+import itertools
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from wsgiref.util import setup_testing_defaults
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+
+DEFAULT_URLS = [
+    '/analytics/api/kpi-data/',
+    '/analytics/api/kpi-data/?job=student&job=admin.',
+    '/data/api/filter-data/?page=2',
+    '/data/api/filter-data/?marital=single&sort_by=-id',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga de las APIs de KPIs y filtros en el mismo proceso (sin red): "
+        "compara el handler ASGI con el WSGI atendido por un pool fijo de hilos, "
+        "como un servidor WSGI con --threads. Usa la base de datos configurada."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', nargs='+', type=int, default=[50, 200, 500],
+                            help="Clientes concurrentes (cada uno envía una petición tras otra).")
+        parser.add_argument('--requests', type=int, default=2000, help="Peticiones por prueba.")
+        parser.add_argument('--threads', type=int, default=8, help="Hilos del servidor WSGI simulado.")
+        parser.add_argument('--modes', nargs='+', choices=['asgi', 'wsgi'], default=['asgi', 'wsgi'])
+        parser.add_argument('--urls', nargs='+', default=DEFAULT_URLS, help="URLs a pedir, en rotación.")
+        parser.add_argument('--host', default='localhost', help="Cabecera Host (debe estar en ALLOWED_HOSTS).")
+
+    def handle(self, *args, **options):
+        self.host = options['host']
+        self.asgi_app = get_asgi_application()
+        self.wsgi_app = get_wsgi_application()
+
+        self.stdout.write(
+            f"{'modo':<6} {'clientes':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'hilos':>6} {'errores':>8}"
+        )
+        for clients in options['clients']:
+            for mode in options['modes']:
+                result = asyncio.run(self._run(mode, options['urls'], clients, options['requests'], options['threads']))
+                self.stdout.write(
+                    f"{mode:<6} {clients:>8} {result['throughput']:>8.0f} {result['p50']:>8.1f} {result['p95']:>8.1f} "
+                    f"{result['p99']:>8.1f} {result['threads']:>6} {result['errors']:>8}"
+                )
+
+    async def _run(self, mode, urls, clients, total, threads):
+        """Lanza `clients` clientes que envían `total` peticiones en total y mide latencias."""
+        counter = itertools.count()
+        latencies = []
+        errors = 0
+        peak_threads = threading.active_count()
+        pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi') if mode == 'wsgi' else None
+        loop = asyncio.get_running_loop()
+
+        async def client():
+            nonlocal errors, peak_threads
+            while (number := next(counter)) < total:
+                url = urls[number % len(urls)]
+                start = time.perf_counter()
+                if pool is not None:
+                    status = await loop.run_in_executor(pool, self._wsgi_get, url)
+                else:
+                    status = await self._asgi_get(url)
+                latencies.append((time.perf_counter() - start) * 1000)
+                errors += status != 200
+                peak_threads = max(peak_threads, threading.active_count())
+
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*(client() for _ in range(clients)))
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        elapsed = time.perf_counter() - start
+
+        percentiles = statistics.quantiles(latencies, n=100)
+        return {
+            'throughput': len(latencies) / elapsed,
+            'p50': percentiles[49], 'p95': percentiles[94], 'p99': percentiles[98],
+            'threads': peak_threads, 'errors': errors,
+        }
+
+    async def _asgi_get(self, url):
+        parts = urlsplit(url)
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': parts.path, 'raw_path': parts.path.encode(),
+            'query_string': parts.query.encode(), 'root_path': '',
+            'headers': [(b'host', self.host.encode())], 'client': ('127.0.0.1', 0), 'server': (self.host, 80),
+        }
+        request_sent = False
+        status = None
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await asyncio.Event().wait()  # El cliente nunca se desconecta
+
+        async def send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+
+        await self.asgi_app(scope, receive, send)
+        return status
+
+    def _wsgi_get(self, url):
+        parts = urlsplit(url)
+        environ = {'PATH_INFO': parts.path, 'QUERY_STRING': parts.query, 'HTTP_HOST': self.host, 'SERVER_NAME': self.host}
+        setup_testing_defaults(environ)
+        statuses = []
+        response = self.wsgi_app(environ, lambda status, headers, exc_info=None: statuses.append(status))
+        try:
+            for _ in response:
+                pass
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+        return int(statuses[0].split()[0])
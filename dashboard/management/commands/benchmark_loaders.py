@@ -0,0 +1,46 @@
+# dashboard/management/commands/benchmark_loaders.py
+
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from dashboard.services.loaders import bulk_create_frame, copy_frame, supports_copy
+from ._sample_data import build_sample_frame
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide filas/segundo de los cargadores de CampaignRecord (COPY y bulk_create) "
+        "con datos sintéticos. Cada carga se revierte al terminar."
+    )
+
+    LOADERS = {
+        'copy': copy_frame,
+        'bulk_create': bulk_create_frame,
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[45000, 1000000, 5000000],
+                            help="Cantidades de filas a cargar (por defecto: 45000 1000000 5000000).")
+        parser.add_argument('--loaders', nargs='+', choices=list(self.LOADERS), default=list(self.LOADERS),
+                            help="Cargadores a medir.")
+
+    def handle(self, *args, **options):
+        if 'copy' in options['loaders'] and not supports_copy():
+            raise CommandError("El cargador 'copy' requiere PostgreSQL con psycopg2.")
+
+        self.stdout.write(f"{'filas':>10}  {'cargador':<12} {'segundos':>10} {'filas/s':>12}")
+        for size in options['sizes']:
+            frame = build_sample_frame(size)
+            for name in options['loaders']:
+                elapsed = self._time_load(self.LOADERS[name], frame)
+                self.stdout.write(f"{size:>10}  {name:<12} {elapsed:>10.2f} {size / elapsed:>12,.0f}")
+
+    @staticmethod
+    def _time_load(loader, frame):
+        with transaction.atomic():
+            start = time.perf_counter()
+            loader(frame)
+            elapsed = time.perf_counter() - start
+            transaction.set_rollback(True)
+        return elapsed
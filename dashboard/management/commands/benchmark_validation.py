@@ -0,0 +1,46 @@
+# dashboard/management/commands/benchmark_validation.py
+
+import io
+import os
+import time
+from django.core.management.base import BaseCommand
+
+from dashboard.services.csv_importer import CsvDataImporter
+from ._sample_data import build_sample_frame, frame_to_csv_bytes
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el tiempo de lectura y validación de un CSV sintético con distinta "
+        "cantidad de procesos (IMPORT_VALIDATION_WORKERS). No escribe en la base de datos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000, help="Filas del CSV sintético.")
+        parser.add_argument('--workers', nargs='+', type=int, default=None,
+                            help="Cantidades de procesos a medir (por defecto: 1, 2, 4, ... hasta el número de núcleos).")
+        parser.add_argument('--chunk-size', type=int, default=None, help="Filas por bloque.")
+
+    def handle(self, *args, **options):
+        worker_counts = options['workers'] or self._default_worker_counts()
+        data = frame_to_csv_bytes(build_sample_frame(options['rows']))
+
+        self.stdout.write(f"{'procesos':>8} {'segundos':>10} {'filas/s':>12} {'speedup':>8}")
+        baseline = None
+        for workers in worker_counts:
+            importer = CsvDataImporter(io.BytesIO(data), chunk_size=options['chunk_size'], workers=workers)
+            start = time.perf_counter()
+            for _ in importer.iter_valid_chunks():
+                pass
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            self.stdout.write(f"{workers:>8} {elapsed:>10.2f} {importer.rows_read / elapsed:>12,.0f} {baseline / elapsed:>7.2f}x")
+
+    @staticmethod
+    def _default_worker_counts():
+        cores = os.cpu_count() or 1
+        counts, workers = [], 1
+        while workers < cores:
+            counts.append(workers)
+            workers *= 2
+        return counts + [cores]
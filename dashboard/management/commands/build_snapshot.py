@@ -0,0 +1,23 @@
+# dashboard/management/commands/build_snapshot.py
+
+import time
+from django.core.management.base import BaseCommand
+
+from dashboard.services.bitmaps import write_bitmap_index
+from dashboard.services.snapshots import write_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Escribe una nueva versión del snapshot columnar de CampaignRecord y su índice de bitmaps. "
+        "Las importaciones lo hacen automáticamente; sirve para datos cargados antes."
+    )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        snapshot = write_snapshot()
+        write_bitmap_index(snapshot)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Snapshot {snapshot.version}: {snapshot.rows} filas en {elapsed:.2f} s ({snapshot.path})"
+        ))
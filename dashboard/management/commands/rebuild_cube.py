@@ -0,0 +1,25 @@
+# dashboard/management/commands/rebuild_cube.py
+
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from dashboard.models import CampaignCube
+from dashboard.services.cube import lock_cube, rebuild_cube
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula CampaignCube a partir de todos los registros. Las importaciones lo hacen "
+        "automáticamente; sirve después de una migración que cambia el formato del cubo."
+    )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        with transaction.atomic():
+            lock_cube()
+            rebuild_cube()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Cubo recalculado: {CampaignCube.objects.count()} filas en {elapsed:.2f} s"
+        ))
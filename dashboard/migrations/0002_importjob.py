@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(blank=True, help_text='Archivo subido (se elimina al terminar)', upload_to='imports/')),
+                ('original_name', models.CharField(help_text='Nombre original del archivo', max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('validating', 'Validando'), ('writing', 'Escribiendo'), ('done', 'Completado'), ('failed', 'Fallido')], default='pending', max_length=20)),
+                ('rows_read', models.IntegerField(default=0, help_text='Filas leídas del archivo')),
+                ('rows_valid', models.IntegerField(default=0, help_text='Filas que pasaron la validación')),
+                ('rows_loaded', models.IntegerField(default=0, help_text='Filas guardadas en la base de datos')),
+                ('error_count', models.IntegerField(default=0, help_text='Cantidad de errores encontrados')),
+                ('errors', models.JSONField(blank=True, default=list, help_text='Errores de validación o de base de datos')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Importación',
+                'verbose_name_plural': 'Trabajos de Importación',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Agrega el hash de contenido de CampaignRecord (importaciones incrementales)
+# y el modo de importación de ImportJob.
+
+import hashlib
+
+from django.db import migrations, models
+
+# Copia congelada de las reglas de `dashboard.services.hashing`: la migración
+# no debe depender del código actual de la aplicación.
+HASHED_COLUMNS = [
+    'age', 'job', 'marital', 'education', 'default', 'balance', 'housing', 'loan',
+    'contact', 'day', 'month', 'duration', 'campaign', 'pdays', 'previous', 'poutcome', 'y'
+]
+BOOLEAN_COLUMNS = {'default', 'housing', 'loan', 'y'}
+
+
+def backfill_content_hash(apps, schema_editor):
+    """
+    Calcula el hash de los registros existentes. No se elimina ningún
+    registro: el índice sobre `content_hash` no es único, porque un archivo
+    puede contener filas idénticas legítimas.
+    """
+    CampaignRecord = apps.get_model('dashboard', 'CampaignRecord')
+    connection = schema_editor.connection
+    quote = connection.ops.quote_name
+
+    if connection.vendor == 'postgresql':
+        parts = [
+            f"CASE WHEN {quote(col)} THEN 'yes' ELSE 'no' END" if col in BOOLEAN_COLUMNS else f"{quote(col)}::text"
+            for col in HASHED_COLUMNS
+        ]
+        schema_editor.execute(
+            f"UPDATE {quote(CampaignRecord._meta.db_table)} "
+            f"SET content_hash = md5(concat_ws('|', {', '.join(parts)}))"
+        )
+        return
+
+    batch_size = 10000
+    queryset = CampaignRecord.objects.order_by('id')
+    last_id = 0
+    while True:
+        rows = list(queryset.filter(id__gt=last_id).values_list('id', *HASHED_COLUMNS)[:batch_size])
+        if not rows:
+            break
+        records = []
+        for pk, *values in rows:
+            text = '|'.join(
+                ('yes' if value else 'no') if col in BOOLEAN_COLUMNS else str(value)
+                for col, value in zip(HASHED_COLUMNS, values)
+            )
+            records.append(CampaignRecord(id=pk, content_hash=hashlib.md5(text.encode()).hexdigest()))
+        CampaignRecord.objects.bulk_update(records, ['content_hash'])
+        last_id = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campaignrecord',
+            name='content_hash',
+            field=models.CharField(editable=False, max_length=32, null=True),
+        ),
+        migrations.RunPython(backfill_content_hash, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='campaignrecord',
+            name='content_hash',
+            field=models.CharField(db_index=True, editable=False, help_text='Hash MD5 de las 17 columnas de negocio (ver dashboard/services/hashing.py)', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='mode',
+            field=models.CharField(choices=[('replace', 'Reemplazar los datos actuales'), ('append', 'Agregar solo registros nuevos')], default='replace', max_length=10),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_campaignrecord_content_hash_importjob_mode'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='importjob',
+            name='errors',
+            field=models.JSONField(blank=True, default=list, help_text='Errores generales (lectura del archivo, columnas, base de datos); los de cada fila están en ImportRowError'),
+        ),
+        migrations.CreateModel(
+            name='ImportRowError',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row_number', models.PositiveIntegerField(help_text='Número de fila en el archivo')),
+                ('field', models.CharField(help_text='Columna con el error', max_length=20)),
+                ('code', models.CharField(choices=[('not_integer', 'No es un número entero'), ('out_of_range', 'Fuera de rango'), ('invalid_choice', 'Opción no válida'), ('invalid_boolean', "No es 'yes' ni 'no'")], max_length=20)),
+                ('value', models.CharField(blank=True, help_text='Valor rechazado (recortado)', max_length=255)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='row_errors', to='dashboard.importjob')),
+            ],
+            options={
+                'verbose_name': 'Error de Importación',
+                'verbose_name_plural': 'Errores de Importación',
+                'indexes': [models.Index(fields=['job', 'row_number'], name='dashboard_rowerror_row_idx'), models.Index(fields=['job', 'field', 'code'], name='dashboard_rowerror_code_idx')],
+            },
+        ),
+    ]
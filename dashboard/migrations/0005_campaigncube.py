@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:50
+
+from django.db import migrations, models
+
+
+# El cubo se crea vacío: se calcula en la siguiente importación o con
+# `manage.py rebuild_cube` (mientras tanto los KPIs usan los registros).
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0004_importrowerror'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CampaignCube',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job', models.CharField(max_length=20)),
+                ('marital', models.CharField(max_length=10)),
+                ('education', models.CharField(max_length=10)),
+                ('contact', models.CharField(max_length=10)),
+                ('y', models.BooleanField()),
+                ('dimension', models.CharField(blank=True, max_length=10)),
+                ('label', models.CharField(max_length=20, null=True)),
+                ('record_count', models.IntegerField()),
+                ('default_count', models.IntegerField(help_text='Registros con default=True')),
+                ('housing_count', models.IntegerField(help_text='Registros con housing=True')),
+                ('loan_count', models.IntegerField(help_text='Registros con loan=True')),
+                ('success_count', models.IntegerField(help_text="Registros con poutcome='success'")),
+                ('campaign_sum', models.BigIntegerField()),
+                ('duration_sum', models.BigIntegerField()),
+            ],
+            options={
+                'verbose_name': 'Cubo de Campañas',
+                'verbose_name_plural': 'Cubo de Campañas',
+            },
+        ),
+    ]
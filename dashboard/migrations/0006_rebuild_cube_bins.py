@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:20
+
+from django.db import migrations
+
+
+def clear_cube(apps, schema_editor):
+    # Las dimensiones agrupadas en intervalos pasan a guardar el número de
+    # intervalo: las filas anteriores ya no sirven. El cubo queda vacío hasta
+    # la siguiente importación o `manage.py rebuild_cube` (los KPIs usan los
+    # registros mientras tanto).
+    CampaignCube = apps.get_model('dashboard', 'CampaignCube')
+    CampaignCube.objects.using(schema_editor.connection.alias).all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0005_campaigncube'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_cube, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0006_rebuild_cube_bins'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='campaigncube',
+            constraint=models.UniqueConstraint(fields=('job', 'marital', 'education', 'contact', 'y', 'dimension', 'label'), name='campaigncube_cell_unique', nulls_distinct=False),
+        ),
+    ]
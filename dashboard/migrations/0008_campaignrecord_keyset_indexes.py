@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0007_campaigncube_cell_unique'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='campaignrecord',
+            index=models.Index(fields=['age', 'id'], name='record_age_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='campaignrecord',
+            index=models.Index(fields=['job', 'id'], name='record_job_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='campaignrecord',
+            index=models.Index(fields=['marital', 'id'], name='record_marital_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='campaignrecord',
+            index=models.Index(fields=['education', 'id'], name='record_education_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='campaignrecord',
+            index=models.Index(fields=['balance', 'id'], name='record_balance_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='campaignrecord',
+            index=models.Index(fields=['contact', 'id'], name='record_contact_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='campaignrecord',
+            index=models.Index(fields=['y', 'id'], name='record_y_id_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+
+def clear_cube(apps, schema_editor):
+    # El cubo pasa a agruparse también por banda de edad: las filas anteriores
+    # no tienen banda. Queda vacío hasta la siguiente importación o
+    # `manage.py rebuild_cube` (los KPIs usan los registros mientras tanto).
+    CampaignCube = apps.get_model('dashboard', 'CampaignCube')
+    CampaignCube.objects.using(schema_editor.connection.alias).all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0008_campaignrecord_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_cube, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='campaigncube',
+            name='campaigncube_cell_unique',
+        ),
+        migrations.AddField(
+            model_name='campaigncube',
+            name='age_band',
+            field=models.SmallIntegerField(default=0, help_text='Banda de edad: número de intervalo de AGE_BANDS (ver services.cube)'),
+            preserve_default=False,
+        ),
+        migrations.AddConstraint(
+            model_name='campaigncube',
+            constraint=models.UniqueConstraint(fields=('job', 'marital', 'education', 'contact', 'y', 'age_band', 'dimension', 'label'), name='campaigncube_cell_unique', nulls_distinct=False),
+        ),
+    ]
@@ -2,6 +2,7 @@
 
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
+from dashboard.services.validators import CampaignFrameValidator
 
 class CampaignRecord(models.Model):
     # Campos del cliente
@@ -42,9 +43,163 @@ class CampaignRecord(models.Model):
     poutcome = models.CharField(max_length=20, help_text="Resultado de la campaña previa")
     y = models.BooleanField(help_text="¿El cliente suscribió un depósito a plazo?")
 
+    # Identificador de contenido para importaciones incrementales. No es
+    # único: un archivo puede traer filas idénticas y todas se guardan; solo
+    # la importación en modo "agregar" omite las que ya estaban cargadas.
+    content_hash = models.CharField(
+        max_length=32, db_index=True, editable=False,
+        help_text="Hash MD5 de las 17 columnas de negocio (ver dashboard/services/hashing.py)"
+    )
+
     class Meta:
         verbose_name = "Registro de Campaña"
         verbose_name_plural = "Registros de Campañas"
+        # Columnas que se pueden ordenar en el explorador de datos: un índice
+        # `(columna, id)` por cada una para la paginación por cursor (`KeysetPaginator`)
+        indexes = [
+            models.Index(fields=[field, 'id'], name=f'record_{field}_id_idx')
+            for field in ('age', 'job', 'marital', 'education', 'balance', 'contact', 'y')
+        ]
+
+    def __str__(self):
+        return f"Cliente ID {self.id} - Edad: {self.age}, Ocupación: {self.job}"
+
+
+class ImportJob(models.Model):
+    """
+    Trabajo de importación ejecutado en segundo plano.
+    Guarda el archivo subido, la fase actual y el resultado final.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_VALIDATING = 'validating'
+    STATUS_WRITING = 'writing'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pendiente'),
+        (STATUS_VALIDATING, 'Validando'),
+        (STATUS_WRITING, 'Escribiendo'),
+        (STATUS_DONE, 'Completado'),
+        (STATUS_FAILED, 'Fallido'),
+    ]
+    FINISHED_STATUSES = (STATUS_DONE, STATUS_FAILED)
+
+    MODE_REPLACE = 'replace'
+    MODE_APPEND = 'append'
+    MODE_CHOICES = [
+        (MODE_REPLACE, 'Reemplazar los datos actuales'),
+        (MODE_APPEND, 'Agregar solo registros nuevos'),
+    ]
+
+    file = models.FileField(upload_to='imports/', blank=True, help_text="Archivo subido (se elimina al terminar)")
+    mode = models.CharField(max_length=10, choices=MODE_CHOICES, default=MODE_REPLACE)
+    original_name = models.CharField(max_length=255, help_text="Nombre original del archivo")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    rows_read = models.IntegerField(default=0, help_text="Filas leídas del archivo")
+    rows_valid = models.IntegerField(default=0, help_text="Filas que pasaron la validación")
+    rows_loaded = models.IntegerField(default=0, help_text="Filas guardadas en la base de datos")
+    error_count = models.IntegerField(default=0, help_text="Cantidad de errores encontrados")
+    errors = models.JSONField(
+        default=list, blank=True,
+        help_text="Errores generales (lectura del archivo, columnas, base de datos); los de cada fila están en ImportRowError"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Trabajo de Importación"
+        verbose_name_plural = "Trabajos de Importación"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Importación {self.id} - {self.original_name} ({self.get_status_display()})"
+
+    @property
+    def is_finished(self):
+        return self.status in self.FINISHED_STATUSES
+
+
+class ImportRowError(models.Model):
+    """
+    Error de validación de una fila importada: un registro por cada campo
+    inválido. Se guarda solo el código y el valor; el mensaje se reconstruye
+    con `CampaignFrameValidator.error_message` al mostrarlo.
+    """
+    job = models.ForeignKey(ImportJob, on_delete=models.CASCADE, related_name='row_errors')
+    row_number = models.PositiveIntegerField(help_text="Número de fila en el archivo")
+    field = models.CharField(max_length=20, help_text="Columna con el error")
+    code = models.CharField(max_length=20, choices=CampaignFrameValidator.CODE_CHOICES)
+    value = models.CharField(max_length=255, blank=True, help_text="Valor rechazado (recortado)")
+
+    class Meta:
+        verbose_name = "Error de Importación"
+        verbose_name_plural = "Errores de Importación"
+        indexes = [
+            models.Index(fields=['job', 'row_number'], name='dashboard_rowerror_row_idx'),
+            models.Index(fields=['job', 'field', 'code'], name='dashboard_rowerror_code_idx'),
+        ]
+
+    def __str__(self):
+        return f"Fila {self.row_number}: {self.field} ({self.code})"
+
+    @property
+    def message(self):
+        return CampaignFrameValidator.error_message(self.field, self.code, self.value)
+
+
+class CampaignCube(models.Model):
+    """
+    Cubo pre-agregado de `CampaignRecord`, agrupado por los campos de
+    filtro categóricos (job, marital, education, contact, y) y por banda de
+    edad (`age_band`, para los filtros de edad que coinciden con las bandas).
+
+    Las filas con `dimension=''` guardan los conteos y sumas de cada
+    combinación de filtros. Las demás desglosan esa combinación por una
+    dimensión de gráfico (`age`, `conv_age`, `month`, `day`, `balance`,
+    `duration`, `pdays`, `previous`) con su valor o agrupación en `label`.
+    Así el tamaño del cubo depende de la cardinalidad de las dimensiones
+    (unos cientos de miles de filas como máximo) y no de la cantidad de
+    registros. Se actualiza en la misma transacción de cada importación
+    (se reconstruye al reemplazar los datos y se le suman solo las filas
+    nuevas al agregar, ver `services.cube`), así que siempre corresponde a
+    los datos cargados.
+
+    Los campos de filtro tienen los mismos nombres que en `CampaignRecord`
+    para poder aplicarles `FilterManager` sin cambios; los filtros de edad
+    se traducen a un rango de `age_band` (ver `services.cube.age_band_range`).
+    """
+    # Dimensiones de filtro
+    job = models.CharField(max_length=20)
+    marital = models.CharField(max_length=10)
+    education = models.CharField(max_length=10)
+    contact = models.CharField(max_length=10)
+    y = models.BooleanField()
+    age_band = models.SmallIntegerField(help_text="Banda de edad: número de intervalo de AGE_BANDS (ver services.cube)")
+
+    # Dimensión de gráfico ('' en las filas de totales) y su valor
+    dimension = models.CharField(max_length=10, blank=True)
+    label = models.CharField(max_length=20, null=True)
+
+    # Medidas
+    record_count = models.IntegerField()
+    default_count = models.IntegerField(help_text="Registros con default=True")
+    housing_count = models.IntegerField(help_text="Registros con housing=True")
+    loan_count = models.IntegerField(help_text="Registros con loan=True")
+    success_count = models.IntegerField(help_text="Registros con poutcome='success'")
+    campaign_sum = models.BigIntegerField()
+    duration_sum = models.BigIntegerField()
+
+    class Meta:
+        verbose_name = "Cubo de Campañas"
+        verbose_name_plural = "Cubo de Campañas"
+        constraints = [
+            # Una fila por celda (el `label` NULL de los totales también cuenta):
+            # `update_cube` combina los agregados nuevos con ON CONFLICT
+            models.UniqueConstraint(
+                fields=['job', 'marital', 'education', 'contact', 'y', 'age_band', 'dimension', 'label'],
+                name='campaigncube_cell_unique', nulls_distinct=False,
+            ),
+        ]
 
     def __str__(self):
-        return f"Cliente ID {self.id} - Edad: {self.age}, Ocupación: {self.job}"
\ No newline at end of file
+        return f"{self.job}/{self.marital}/{self.education}/{self.contact}/{self.y}/{self.age_band} {self.dimension}={self.label} ({self.record_count})"
@@ -0,0 +1,37 @@
+# dashboard/services/async_db.py
+
+import asyncio
+import contextlib
+import weakref
+
+from django.conf import settings
+
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def _db_semaphore():
+    """Semáforo del event loop actual (asyncio no permite compartirlo entre loops)."""
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(settings.ASYNC_DB_CONCURRENCY)
+    return semaphore
+
+
+@contextlib.asynccontextmanager
+async def limit_db_concurrency():
+    """
+    Limita a `ASYNC_DB_CONCURRENCY` los cálculos de las vistas async que
+    consultan la base de datos a la vez:
+
+        async with limit_db_concurrency():
+            data = await sync_to_async(compute)()
+
+    Con ASGI, el ORM de cada petición se ejecuta en un hilo con su propia
+    conexión (psycopg2 no tiene driver async), así que cientos de clientes
+    lanzarían cientos de consultas pesadas a la vez. Solo se envuelve el
+    cálculo: los aciertos de caché y los 304 no esperan turno, y los
+    cálculos que exceden el límite esperan en el event loop.
+    """
+    async with _db_semaphore():
+        yield
@@ -1,19 +1,58 @@
 # dashboard/services/base_importer.py
 
+import multiprocessing
 from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+import pandas as pd
+from django.conf import settings
+from .hashing import add_content_hash
+from .validators import REQUIRED_COLUMNS, CampaignFrameValidator
+
+
+def _validate_chunk(importer_class, raw_chunk):
+    """
+    Valida un bloque y devuelve `(columnas_faltantes, filas, valid_frame, errores)`;
+    `valid_frame` ya incluye la columna `content_hash`.
+    Es una función de módulo para poder ejecutarse en otro proceso; los
+    errores se devuelven sin numerar (ver `CampaignFrameValidator.validate_rows`).
+    """
+    chunk = importer_class.parse_raw_chunk(raw_chunk) if importer_class else raw_chunk
+    missing_cols = [col for col in REQUIRED_COLUMNS if col not in chunk.columns]
+    if missing_cols:
+        return missing_cols, 0, None, []
+    valid_frame, row_errors = CampaignFrameValidator().validate_rows(chunk)
+    return [], len(chunk), add_content_hash(valid_frame), row_errors
+
 
 class BaseDataImporter(ABC):
     """
     Clase base abstracta (interfaz) para los importadores de datos.
     Este es el "Product" en el patrón Factory Method.
+
+    Además de `process_file`, ofrece un modo de lectura por bloques
+    (`iter_valid_chunks`) para importar archivos grandes con memoria acotada:
+    cada subclase solo tiene que implementar `read_chunks`.
     """
+    REQUIRED_COLUMNS = REQUIRED_COLUMNS
+    EXTENSIONS = ()   # Extensiones de archivo que maneja el importador (p. ej. '.csv')
+    SIGNATURES = ()   # Bytes iniciales ("magic numbers") que identifican el formato
+    READ_ERROR_MESSAGE = "Error de formato de archivo. No se pudo leer el archivo: {error}"
 
-    def __init__(self, file):
+    def __init__(self, file, chunk_size=None, workers=None, error_store=None):
         if not hasattr(file, 'read'):
             raise TypeError("El objeto proporcionado debe ser un archivo.")
         self.file = file
+        self.chunk_size = chunk_size or getattr(settings, 'IMPORT_CHUNK_SIZE', 50000)
+        self.workers = workers or getattr(settings, 'IMPORT_VALIDATION_WORKERS', 1)
+        self.error_store = error_store
         self.errors = []
+        self.error_count = 0
         self.valid_records = []
+        self.rows_read = 0
+        self.rows_valid = 0
 
     @abstractmethod
     def process_file(self):
@@ -22,7 +61,115 @@ class BaseDataImporter(ABC):
         procesamiento del archivo. Debe ser implementado por subclases.
         """
         pass
-    
+
+    @property
+    def has_errors(self):
+        return self.error_count > 0
+
+    def add_error(self, message):
+        """Registra un error general (o de una fila, ya formateado)."""
+        self.error_count += 1
+        if self.error_store is not None:
+            self.error_store.add_error(message)
+        else:
+            self.errors.append(message)
+
+    def add_row_errors(self, row_errors, first_row_number):
+        """
+        Registra los errores de `CampaignFrameValidator.validate_rows`. Con un
+        `error_store` se guardan sin formatear; si no, como mensajes en `errors`.
+        """
+        self.error_count += len(row_errors)
+        if self.error_store is not None:
+            self.error_store.add_row_errors(row_errors, first_row_number)
+        else:
+            self.errors.extend(CampaignFrameValidator.format_errors(row_errors, first_row_number))
+
+    def read_chunks(self):
+        """
+        Genera el contenido del archivo como DataFrames de como máximo
+        `chunk_size` filas. Las subclases que soportan lectura por bloques
+        deben implementarlo.
+        """
+        raise NotImplementedError("Este importador no soporta lectura por bloques.")
+
+    def read_raw_chunks(self):
+        """
+        Genera los bloques que se envían a los procesos de validación en el
+        modo paralelo. Deben ser serializables (pickle) y se convierten en
+        DataFrame con `parse_raw_chunk` dentro de cada proceso. Por defecto
+        son los mismos DataFrames de `read_chunks`; las subclases pueden
+        enviar el texto crudo para que el parseo también ocurra en paralelo.
+        """
+        yield from self.read_chunks()
+
+    @staticmethod
+    def parse_raw_chunk(raw_chunk):
+        """Convierte un bloque de `read_raw_chunks` en DataFrame."""
+        return raw_chunk
+
+    def iter_valid_chunks(self):
+        """
+        Lee y valida el archivo bloque a bloque, generando un DataFrame con
+        las filas válidas de cada bloque. Los errores se registran con
+        `add_row_errors`/`add_error`; si el archivo no se puede leer o le faltan columnas
+        se registra el error y la lectura se detiene.
+
+        Con `workers > 1` los bloques se validan en un `ProcessPoolExecutor`
+        y los resultados se consumen en el orden del archivo, así que los
+        números de fila de los errores y el orden de escritura no cambian.
+        """
+        if self.workers > 1:
+            results = self._validate_in_processes()
+        else:
+            results = (_validate_chunk(None, chunk) for chunk in self.read_chunks())
+
+        while True:
+            try:
+                missing_cols, row_count, valid_frame, row_errors = next(results)
+            except StopIteration:
+                return
+            except Exception as e:
+                self.add_error(self.READ_ERROR_MESSAGE.format(error=str(e)))
+                return
+
+            if missing_cols:
+                self.add_error(f"Faltan las siguientes columnas obligatorias: {', '.join(missing_cols)}")
+                results.close()
+                return
+
+            self.add_row_errors(row_errors, first_row_number=self.rows_read + 2)
+            self.rows_read += row_count
+            self.rows_valid += len(valid_frame)
+            yield valid_frame
+
+    def _validate_in_processes(self):
+        """
+        Reparte los bloques entre `workers` procesos, manteniendo como máximo
+        dos bloques en curso por proceso para que la memoria siga acotada.
+        """
+        context = multiprocessing.get_context('spawn')
+        executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=django.setup)
+        pending = deque()
+        try:
+            for raw_chunk in self.read_raw_chunks():
+                pending.append(executor.submit(_validate_chunk, type(self), raw_chunk))
+                if len(pending) >= self.workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def process_file_in_chunks(self):
+        """
+        Implementación de `process_file` basada en `iter_valid_chunks`: deja
+        en `valid_records` un único DataFrame con todas las filas válidas.
+        """
+        frames = list(self.iter_valid_chunks())
+        if frames:
+            self.valid_records = pd.concat(frames, ignore_index=True)
+
     def get_results(self):
         """Devuelve los registros válidos y los errores encontrados."""
-        return self.valid_records, self.errors
\ No newline at end of file
+        return self.valid_records, self.errors
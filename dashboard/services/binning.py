@@ -0,0 +1,158 @@
+# dashboard/services/binning.py
+
+import math
+
+import numpy as np
+from django.contrib.postgres.fields import ArrayField
+from django.db.models import Aggregate, Case, F, Func, IntegerField, Max, Min, Value, When
+from django.db.models.lookups import GreaterThanOrEqual, IsNull
+
+
+class WidthBucket(Func):
+    """
+    Número de intervalo de `expression` según los límites `edges`, como
+    `width_bucket(valor, límites)` de PostgreSQL: 0 por debajo del primer
+    límite, i si `edges[i-1] <= valor < edges[i]` y `len(edges)` desde el
+    último. En otras bases de datos se traduce a una cadena CASE equivalente.
+    """
+    function = 'width_bucket'
+    output_field = IntegerField()
+
+    def __init__(self, expression, edges):
+        self.edges = list(edges)
+        super().__init__(expression)
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.source_expressions[0])
+        return f'width_bucket({sql}, %s)', (*params, self.edges)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        value = self.source_expressions[0]
+        whens = [When(IsNull(value, True), then=Value(None))] + [
+            When(GreaterThanOrEqual(value, edge), then=Value(len(self.edges) - position))
+            for position, edge in enumerate(reversed(self.edges))
+        ]
+        case = Case(*whens, default=Value(0), output_field=IntegerField())
+        return compiler.compile(case.resolve_expression(compiler.query))
+
+
+class PercentileDisc(Aggregate):
+    """`percentile_disc(fracciones) WITHIN GROUP (ORDER BY campo)` de PostgreSQL."""
+    function = 'percentile_disc'
+    template = '%(function)s(ARRAY[%(fractions)s]) WITHIN GROUP (ORDER BY %(expressions)s)'
+
+    def __init__(self, expression, fractions):
+        super().__init__(
+            expression, fractions=', '.join(f'{float(fraction)!r}' for fraction in fractions),
+            output_field=ArrayField(IntegerField()),
+        )
+
+
+class Bins:
+    """
+    Intervalos de un histograma sobre un campo entero: `edges` son los
+    límites inferiores (crecientes) y `labels` la etiqueta de cada número de
+    intervalo de `WidthBucket`, de 0 (por debajo del primer límite) a
+    `len(edges)` (desde el último); una etiqueta None excluye ese intervalo.
+    Como los grupos se identifican por número, salen en orden numérico.
+    """
+
+    def __init__(self, field, edges, labels=None):
+        edges = [int(edge) for edge in edges]
+        if not edges or any(high <= low for low, high in zip(edges, edges[1:])):
+            raise ValueError("Los límites de los intervalos deben ser enteros crecientes.")
+        self.field = field
+        self.edges = edges
+        self.labels = list(labels) if labels is not None else self.default_labels(edges)
+        if len(self.labels) != len(edges) + 1:
+            raise ValueError("Se necesita una etiqueta por intervalo (límites + 1).")
+
+    @staticmethod
+    def default_labels(edges):
+        labels = [f'< {edges[0]}']
+        for low, high in zip(edges, edges[1:]):
+            labels.append(str(low) if high - low == 1 else f'{low}-{high - 1}')
+        labels.append(f'{edges[-1]}+')
+        return labels
+
+    @classmethod
+    def equal_width(cls, field, low, high, count):
+        """`count` intervalos de igual ancho entre `low` y `high` (inclusive)."""
+        width = max(math.ceil((high - low + 1) / count), 1)
+        return cls(field, range(low, high + 1, width))
+
+    def expression(self):
+        return WidthBucket(F(self.field), self.edges)
+
+    def buckets(self, values):
+        """Número de intervalo de cada valor de `values`, como `WidthBucket` (para el motor columnar)."""
+        return np.searchsorted(self.edges, values, side='right').tolist()
+
+    def label(self, bucket):
+        return None if bucket is None else self.labels[bucket]
+
+    def bin_labels(self):
+        """Etiquetas de los intervalos incluidos, en orden."""
+        return [label for label in self.labels if label is not None]
+
+
+class BinSpec:
+    """
+    Pedido de intervalos de la API, en texto:
+    - `e1,e2,...`: límites explícitos;
+    - `width:N`: N intervalos de igual ancho entre el mínimo y el máximo;
+    - `quantile:N`: N intervalos con la misma cantidad de registros (aprox.).
+    Los dos últimos se resuelven sobre los registros filtrados (`resolve`).
+    """
+    KINDS = ('width', 'quantile')
+    MAX_BINS = 100
+
+    def __init__(self, kind, value):
+        self.kind = kind
+        self.value = value
+
+    @classmethod
+    def parse(cls, text):
+        kind, _, count = text.partition(':')
+        try:
+            if kind in cls.KINDS:
+                count = int(count)
+                if not 1 <= count <= cls.MAX_BINS:
+                    raise ValueError
+                return cls(kind, count)
+            edges = [int(edge) for edge in text.split(',')]
+            if len(edges) > cls.MAX_BINS:
+                raise ValueError
+            return cls('edges', Bins('', edges).edges)  # Valida el orden
+        except ValueError:
+            raise ValueError(f"Intervalos inválidos: {text!r}") from None
+
+    def __str__(self):
+        """Forma canónica, para las claves de caché y los ETags."""
+        if self.kind == 'edges':
+            return ','.join(str(edge) for edge in self.value)
+        return f'{self.kind}:{self.value}'
+
+    def resolve(self, field, queryset):
+        """Los `Bins` de `field` para `queryset` (una consulta para `width` y `quantile`)."""
+        if self.kind == 'edges':
+            return Bins(field, self.value)
+        if self.kind == 'width':
+            limits = queryset.aggregate(low=Min(field), high=Max(field))
+            if limits['low'] is None:
+                return Bins(field, [0])
+            return Bins.equal_width(field, limits['low'], limits['high'], self.value)
+        fractions = [position / self.value for position in range(self.value)]
+        edges = queryset.aggregate(edges=PercentileDisc(field, fractions))['edges'] or [0]
+        return Bins(field, sorted(set(edges)))
+
+
+# Intervalos por defecto de los gráficos de KPIs (los mismos rangos que las
+# cadenas CASE originales; el cubo guarda el número de intervalo)
+DEFAULT_BINS = {
+    'conv_age': Bins('age', [17, 26, 36, 46, 56, 101], [None, '17-25', '26-35', '36-45', '46-55', '56+', None]),
+    'age': Bins('age', [17, 26, 35, 44, 53, 62], ['Otro', '17-25', '26-34', '35-43', '44-52', '53-61', '62+']),
+    'balance': Bins('balance', [0, 1001, 2001, 5001], ['< 0', '0-1k', '1k-2k', '2k-5k', '> 5k']),
+    'duration': Bins('duration', [0, 101, 201, 301, 401, 501], [None, '0-100s', '101-200s', '201-300s', '301-400s', '401-500s', '500s+']),
+    'pdays': Bins('pdays', [-1, 0, 91, 181, 271], [None, 'No contactado', '0-90 días', '91-180 días', '181-270 días', '270+ días']),
+}
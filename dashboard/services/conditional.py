@@ -0,0 +1,39 @@
+# dashboard/services/conditional.py
+
+import hashlib
+import json
+
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+
+def make_etag(version, payload):
+    """
+    ETag fuerte de una respuesta de la API: la versión del dataset más un
+    hash de los parámetros canónicos que determinan el contenido. Cambia en
+    cada importación, así que no hace falta calcular la respuesta para
+    compararlo.
+    """
+    digest = hashlib.md5(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    return quote_etag(f'{version}-{digest}')
+
+
+def set_validators(response, etag):
+    """
+    Agrega el ETag y `Cache-Control: no-cache`: el navegador guarda la
+    respuesta pero la revalida con `If-None-Match` en cada uso.
+    """
+    response['ETag'] = etag
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def conditional_response(request, etag):
+    """
+    Respuesta 304 (o 412) si las cabeceras condicionales de la petición
+    coinciden con `etag`, o None si hay que generar la respuesta completa.
+    """
+    candidate = set_validators(HttpResponse(), etag)
+    response = get_conditional_response(request, etag=etag, response=candidate)
+    return None if response is candidate else response
@@ -1,30 +1,76 @@
 # dashboard/services/csv_importer.py
 
+import io
 import pandas as pd
 from django.core.exceptions import ValidationError
 from .base_importer import BaseDataImporter
+from .validators import (
+    READ_DTYPES, JOB_CHOICES, MARITAL_CHOICES, EDUCATION_CHOICES, CONTACT_CHOICES, POUTCOME_CHOICES, MONTH_CHOICES
+)
 from dashboard.models import CampaignRecord
 
 class CsvDataImporter(BaseDataImporter):
     """
     Fábrica concreta para procesar archivos CSV.
     Ahora configurada para usar punto y coma (;) como separador.
+
+    Por defecto valida el archivo en modo vectorizado (columna por columna),
+    leyéndolo por bloques de `chunk_size` filas, y deja en `valid_records` un
+    DataFrame con las filas válidas ya normalizadas. Con `vectorized=False` se
+    usa la validación fila a fila original, que produce instancias de
+    `CampaignRecord`.
     """
-    REQUIRED_COLUMNS = [
-        'age', 'job', 'marital', 'education', 'default', 'balance', 'housing', 'loan', 
-        'contact', 'day', 'month', 'duration', 'campaign', 'pdays', 'previous', 'poutcome', 'y'
-    ]
+    EXTENSIONS = ('.csv', '.txt')
+    READ_ERROR_MESSAGE = "Error de formato de archivo. No se pudo leer el CSV: {error}"
+
+    def __init__(self, file, vectorized=True, chunk_size=None, workers=None, error_store=None):
+        super().__init__(file, chunk_size=chunk_size, workers=workers, error_store=error_store)
+        self.vectorized = vectorized
+
+    def read_chunks(self):
+        yield from pd.read_csv(self.file, sep=';', dtype=READ_DTYPES, chunksize=self.chunk_size)
+
+    def read_raw_chunks(self):
+        """
+        Divide el archivo en bloques de texto de `chunk_size` filas, cada uno
+        con la línea de encabezado, para que el parseo (`read_csv`) también
+        se haga en los procesos de validación. Un salto de línea dentro de
+        un campo entre comillas nunca se usa como punto de corte.
+        """
+        header = self.file.readline()
+        block, rows, in_quotes, emitted = [header], 0, False, False
+        for line in iter(self.file.readline, b''):
+            block.append(line)
+            if line.count(b'"') % 2:
+                in_quotes = not in_quotes
+            if in_quotes:
+                continue
+            if line.strip():  # read_csv ignora las líneas vacías
+                rows += 1
+            if rows >= self.chunk_size:
+                yield b''.join(block)
+                block, rows, emitted = [header], 0, True
+        if rows or not emitted:
+            yield b''.join(block)
+
+    @staticmethod
+    def parse_raw_chunk(raw_chunk):
+        return pd.read_csv(io.BytesIO(raw_chunk), sep=';', dtype=READ_DTYPES)
 
     def process_file(self):
+        if self.vectorized:
+            self.process_file_in_chunks()
+            return
+
         try:
-            df = pd.read_csv(self.file, sep=';') 
+            df = pd.read_csv(self.file, sep=';', dtype=READ_DTYPES)
         except Exception as e:
-            self.errors.append(f"Error de formato de archivo. No se pudo leer el CSV: {str(e)}")
+            self.add_error(self.READ_ERROR_MESSAGE.format(error=str(e)))
             return
         
         missing_cols = [col for col in self.REQUIRED_COLUMNS if col not in df.columns]
         if missing_cols:
-            self.errors.append(f"Faltan las siguientes columnas obligatorias: {', '.join(missing_cols)}")
+            self.add_error(f"Faltan las siguientes columnas obligatorias: {', '.join(missing_cols)}")
             return
 
         for index, row in df.iterrows():
@@ -32,7 +78,7 @@ class CsvDataImporter(BaseDataImporter):
                 record = self._create_record_from_row(row)
                 self.valid_records.append(record)
             except ValidationError as e:
-                self.errors.append(f"Fila {index + 2}: {', '.join(e.messages)}")
+                self.add_error(f"Fila {index + 2}: {', '.join(e.messages)}")
     
     def _create_record_from_row(self, row):
         """
@@ -48,13 +94,13 @@ class CsvDataImporter(BaseDataImporter):
             errors[field_name] = f"El valor '{value}' es inválido, debe ser 'yes' o 'no'."
             return None
 
-        # Listas de validación actualizadas para coincidir con tu diccionario de datos
-        job_choices = ["admin.","blue-collar","entrepreneur","housemaid","management","retired","self-employed","services","student","technician","unemployed","unknown"]
-        marital_choices = ["married","divorced","single", "unknown"]
-        education_choices = ["primary","secondary","tertiary", "unknown"]
-        contact_choices = ["unknown","telephone","cellular"]
-        poutcome_choices = ["failure","other","success","unknown"]
-        month_choices = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+        # Listas de validación compartidas con el validador vectorizado
+        job_choices = JOB_CHOICES
+        marital_choices = MARITAL_CHOICES
+        education_choices = EDUCATION_CHOICES
+        contact_choices = CONTACT_CHOICES
+        poutcome_choices = POUTCOME_CHOICES
+        month_choices = MONTH_CHOICES
 
         # Validaciones campo por campo
         try:
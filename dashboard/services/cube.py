@@ -0,0 +1,203 @@
+# dashboard/services/cube.py
+
+from django.conf import settings
+from django.db import connection, models
+from django.db.models import Case, When
+from django.db.models.functions import Cast
+
+from dashboard.models import CampaignCube, CampaignRecord
+from .binning import DEFAULT_BINS, Bins
+from .validators import CampaignFrameValidator
+
+# Bandas de edad del cubo (`age_band` es el número de intervalo): desde la edad
+# mínima del formulario de filtros y de la validación (17) y luego por décadas
+# hasta la máxima (98). La edad exacta (~80 valores) multiplicaría el tamaño
+# del cubo; las bandas lo multiplican por 9 como mucho.
+AGE_RANGE = CampaignFrameValidator.INTEGER_FIELDS['age'][0]
+AGE_BANDS = Bins('age', [AGE_RANGE[0], 20, 30, 40, 50, 60, 70, 80, 90])
+
+# Filtros de `CampaignFilterForm` que se pueden aplicar sobre el cubo. Los de
+# edad solo si sus límites coinciden con los de una banda (ver `age_band_range`);
+# si no, se calculan sobre los registros.
+CUBE_FILTER_FIELDS = {'job', 'marital', 'education', 'contact', 'y', 'age_min', 'age_max'}
+CUBE_FILTER_COLUMNS = ['job', 'marital', 'education', 'contact', 'y', 'age_band']
+
+# Dimensiones de gráfico desglosadas en el cubo: nombre -> columna de origen.
+# Las agrupadas en intervalos (`DEFAULT_BINS`) guardan el número de intervalo
+# como etiqueta; los contactos previos solo se grafican hasta 10.
+CHART_DIMENSIONS = {
+    'age': 'age_group',
+    'conv_age': 'conv_age_group',
+    'month': 'month',
+    'day': 'day_label',
+    'balance': 'balance_group',
+    'duration': 'duration_group',
+    'pdays': 'pdays_group',
+    'previous': 'previous_label',
+}
+MEASURE_COLUMNS = ['default', 'housing', 'loan', 'poutcome', 'campaign', 'duration']
+
+
+def _bucket_label(name):
+    return Cast(DEFAULT_BINS[name].expression(), models.CharField())
+
+
+def age_band_range(filters):
+    """
+    Rango `(primera, última)` de bandas de `AGE_BANDS` equivalente a los
+    filtros `age_min` y `age_max` (None del lado que no tiene límite), o
+    None si algún límite no coincide con el borde de una banda. Los valores
+    se leen como en `FilterManager.as_q`, que ignora los que no son números.
+    """
+    low, high = AGE_RANGE
+    first = last = None
+    for field in ('age_min', 'age_max'):
+        value = filters.get(field)
+        value = value[0] if isinstance(value, list) and value else value
+        if not value or not str(value).isdigit():
+            continue
+        value = int(value)
+        if field == 'age_min' and value > low:
+            if value not in AGE_BANDS.edges:
+                return None
+            first = AGE_BANDS.edges.index(value) + 1
+        elif field == 'age_max' and value < high:
+            if value + 1 not in AGE_BANDS.edges:
+                return None
+            last = AGE_BANDS.edges.index(value + 1)
+    return first, last
+
+
+# Columnas que identifican cada fila del cubo (su "celda"); únicas, con NULL como un valor más
+CUBE_KEY_COLUMNS = [*CUBE_FILTER_COLUMNS, 'dimension', 'label']
+CUBE_MEASURE_COLUMNS = [
+    'record_count', 'default_count', 'housing_count', 'loan_count', 'success_count', 'campaign_sum', 'duration_sum',
+]
+
+
+def _aggregate_sql(records):
+    """
+    SELECT que agrega `records` (un QuerySet de `CampaignRecord`) en filas
+    del cubo: se agrupa por los campos de filtro y la banda de edad y, con
+    GROUPING SETS, se agrega una fila de totales y un desglose por cada
+    dimensión de gráfico.
+    Devuelve `(sql, params)` con las columnas `CUBE_KEY_COLUMNS` y
+    `CUBE_MEASURE_COLUMNS`, en ese orden.
+    """
+    source = (
+        records.order_by()
+        .annotate(
+            age_band=AGE_BANDS.expression(),
+            age_group=_bucket_label('age'),
+            conv_age_group=_bucket_label('conv_age'),
+            day_label=Cast('day', models.CharField()),
+            balance_group=_bucket_label('balance'),
+            duration_group=_bucket_label('duration'),
+            pdays_group=_bucket_label('pdays'),
+            previous_label=Case(When(previous__lte=10, then=Cast('previous', models.CharField()))),
+        )
+        .values(*CUBE_FILTER_COLUMNS, *CHART_DIMENSIONS.values(), *MEASURE_COLUMNS)
+    )
+    source_sql, params = source.query.sql_with_params()
+
+    qn = connection.ops.quote_name
+    filters_sql = ', '.join(qn(column) for column in CUBE_FILTER_COLUMNS)
+    charts_sql = ', '.join(qn(column) for column in CHART_DIMENSIONS.values())
+
+    # GROUPING() pone un bit en 1 por cada columna que no agrupa la fila
+    all_bits = (1 << len(CHART_DIMENSIONS)) - 1
+    dimension_cases = ' '.join(
+        f"WHEN {all_bits ^ (1 << (len(CHART_DIMENSIONS) - 1 - i))} THEN '{name}'"
+        for i, name in enumerate(CHART_DIMENSIONS)
+    )
+    grouping_sets = ', '.join(['()'] + [f'({qn(column)})' for column in CHART_DIMENSIONS.values()])
+    sql = f"""
+        SELECT {filters_sql},
+               CASE GROUPING({charts_sql}) {dimension_cases} ELSE '' END,
+               COALESCE({charts_sql}),
+               COUNT(*),
+               COUNT(*) FILTER (WHERE {qn('default')}),
+               COUNT(*) FILTER (WHERE {qn('housing')}),
+               COUNT(*) FILTER (WHERE {qn('loan')}),
+               COUNT(*) FILTER (WHERE {qn('poutcome')} = 'success'),
+               SUM({qn('campaign')}),
+               SUM({qn('duration')})
+        FROM ({source_sql}) AS cube_source
+        GROUP BY {filters_sql}, GROUPING SETS ({grouping_sets})
+    """
+    return sql, params
+
+
+def _insert_sql():
+    qn = connection.ops.quote_name
+    columns = ', '.join(qn(column) for column in CUBE_KEY_COLUMNS + CUBE_MEASURE_COLUMNS)
+    return f"INSERT INTO {qn(CampaignCube._meta.db_table)} ({columns})"
+
+
+def lock_cube():
+    """
+    Bloquea el cubo contra otras escrituras hasta el final de la transacción
+    (las lecturas siguen viendo el cubo confirmado). Las importaciones lo
+    toman al empezar, así que se ejecutan de a una y `update_cube` puede
+    identificar las filas nuevas por su id.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {connection.ops.quote_name(CampaignCube._meta.db_table)} IN EXCLUSIVE MODE")
+
+
+def last_record_id():
+    """Id del último `CampaignRecord` (0 si no hay): las filas que se inserten después tendrán ids mayores."""
+    return CampaignRecord.objects.aggregate(last=models.Max('id'))['last'] or 0
+
+
+def cube_is_built():
+    """
+    True si `CampaignCube` ya tiene las filas de los datos cargados. Las
+    migraciones que crean o cambian el formato del cubo lo dejan vacío: se
+    completa en la siguiente importación o con `manage.py rebuild_cube`, y
+    mientras tanto los KPIs se calculan sobre los registros. No se recuerda
+    en el proceso: el cubo puede volver a quedar vacío (una migración, un
+    TRUNCATE) y la consulta (un `EXISTS` con LIMIT 1) solo se hace al
+    calcular un KPI que no está en caché.
+    """
+    return CampaignCube.objects.exists()
+
+
+def rebuild_cube():
+    """
+    Vuelve a calcular `CampaignCube` a partir de todos los `CampaignRecord`
+    con un único INSERT ... SELECT (ver `_aggregate_sql`). Debe llamarse
+    dentro de la misma transacción que modifica los registros, para que
+    los lectores vean siempre el cubo y los datos de la misma importación.
+    """
+    sql, params = _aggregate_sql(CampaignRecord.objects.all())
+    table = connection.ops.quote_name(CampaignCube._meta.db_table)
+    work_mem = getattr(settings, 'CUBE_REBUILD_WORK_MEM', None)
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table}')
+        if work_mem:
+            # Más memoria para que el agrupamiento no ordene en disco (solo en esta transacción)
+            cursor.execute("SELECT current_setting('work_mem'), set_config('work_mem', %s, true)", [work_mem])
+            previous_work_mem = cursor.fetchone()[0]
+        cursor.execute(f'{_insert_sql()} {sql}', params)
+        if work_mem:  # Si el INSERT falla, el rollback ya deshace el cambio
+            cursor.execute("SELECT set_config('work_mem', %s, true)", [previous_work_mem])
+
+
+def update_cube(after_id):
+    """
+    Suma al cubo los registros con id mayor que `after_id` (los agregados
+    por una importación en modo agregar), sin recorrer el resto de la
+    tabla: se agregan solo esas filas y cada celda se combina con la
+    existente (`ON CONFLICT ... DO UPDATE` sobre `CUBE_KEY_COLUMNS`),
+    sumando conteos y sumas; los promedios se derivan de ellos al leer.
+    El costo es proporcional a las filas nuevas. Como `rebuild_cube`, debe
+    llamarse en la transacción de la importación (con `lock_cube` tomado).
+    """
+    sql, params = _aggregate_sql(CampaignRecord.objects.filter(id__gt=after_id))
+    qn = connection.ops.quote_name
+    table = qn(CampaignCube._meta.db_table)
+    keys_sql = ', '.join(qn(column) for column in CUBE_KEY_COLUMNS)
+    updates_sql = ', '.join(f'{qn(column)} = {table}.{qn(column)} + EXCLUDED.{qn(column)}' for column in CUBE_MEASURE_COLUMNS)
+    with connection.cursor() as cursor:
+        cursor.execute(f'{_insert_sql()} {sql} ON CONFLICT ({keys_sql}) DO UPDATE SET {updates_sql}', params)
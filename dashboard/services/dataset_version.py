@@ -0,0 +1,29 @@
+# dashboard/services/dataset_version.py
+
+from dashboard.models import ImportJob
+
+
+def get_dataset_version():
+    """
+    Devuelve la versión actual del dataset: el id del último trabajo de
+    importación que terminó con éxito (0 si los datos no vienen de uno).
+
+    Cada importación exitosa, de reemplazo o de agregado, cambia la versión,
+    así que las cachés que la incluyen en sus claves se invalidan solas.
+    Se lee de la base de datos para que todos los procesos vean el mismo
+    valor apenas se confirma la importación.
+    """
+    return _latest_done_job().first() or 0
+
+
+async def aget_dataset_version():
+    """Versión async de `get_dataset_version`, para las vistas async."""
+    return await _latest_done_job().afirst() or 0
+
+
+def _latest_done_job():
+    return (
+        ImportJob.objects.filter(status=ImportJob.STATUS_DONE)
+        .order_by('-finished_at', '-pk')
+        .values_list('pk', flat=True)
+    )
@@ -0,0 +1,112 @@
+# dashboard/services/error_report_pdf.py
+
+import os
+import tempfile
+from datetime import datetime
+
+from django.conf import settings
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas
+
+from .error_reports import count_error_groups, get_error_groups
+
+REPORTS_DIR = 'reports'
+
+
+def get_error_report_path(job):
+    return os.path.join(settings.MEDIA_ROOT, REPORTS_DIR, f'errores_importacion_{job.pk}.pdf')
+
+
+def get_error_report_pdf(job):
+    """
+    Devuelve la ruta del PDF de errores de `job`, generándolo si no existe.
+
+    Los errores de un trabajo terminado ya no cambian, así que el archivo se
+    genera una sola vez y se reutiliza. Se escribe en un archivo temporal y
+    se renombra al final, para que nunca se sirva un PDF a medio escribir.
+    """
+    path = get_error_report_path(job)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix='.pdf', dir=os.path.dirname(path))
+        os.close(fd)
+        try:
+            ErrorReportPdf(job).render(tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return path
+
+
+class ErrorReportPdf:
+    """
+    Dibuja el reporte de errores de una importación.
+
+    En lugar de una línea por error, los errores se agrupan por campo y
+    mensaje con su cantidad y algunas filas de ejemplo; como máximo se
+    incluyen `max_groups` grupos (el detalle completo está en el CSV).
+    """
+    MARGIN = 0.75 * inch
+    LINE_HEIGHT = 12
+
+    def __init__(self, job, max_groups=None, sample_size=None):
+        self.job = job
+        self.max_groups = max_groups or getattr(settings, 'ERROR_REPORT_MAX_GROUPS', 200)
+        self.sample_size = sample_size or getattr(settings, 'ERROR_REPORT_SAMPLE_ROWS', 5)
+
+    def render(self, path):
+        self.pdf = canvas.Canvas(path, pagesize=letter)
+        self.width, self.height = letter
+        groups = get_error_groups(self.job, limit=self.max_groups, sample_size=self.sample_size)
+        total_groups = count_error_groups(self.job)
+
+        # --- Encabezado y resumen ---
+        p = self.pdf
+        p.setFont("Helvetica-Bold", 16)
+        p.drawCentredString(self.width / 2.0, self.height - 1 * inch, "Reporte de Errores de Validación")
+
+        p.setFont("Helvetica", 11)
+        p.drawString(self.MARGIN, self.height - 1.5 * inch, f"Archivo: {self.job.original_name or 'archivo_desconocido'}")
+        p.drawString(self.MARGIN, self.height - 1.7 * inch, f"Fecha de Generación: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
+
+        p.setFont("Helvetica-Bold", 12)
+        p.drawString(self.MARGIN, self.height - 2.2 * inch, "Resumen:")
+        p.setFont("Helvetica", 11)
+        p.drawString(1 * inch, self.height - 2.4 * inch, f"Total de filas con errores encontradas: {self.job.error_count}")
+        p.drawString(1 * inch, self.height - 2.6 * inch, f"Tipos de error distintos: {total_groups}")
+
+        self.y = self.height - 3 * inch
+        for error in self.job.errors:
+            self._line(f"- {error}", font=("Courier", 9))
+
+        if groups:
+            self._line("--- Errores agrupados por campo y mensaje ---", font=("Courier-Bold", 9))
+            self._line("")
+        for group in groups:
+            rows = ', '.join(str(row) for row in group['sample_rows'])
+            if group['count'] > len(group['sample_rows']):
+                rows += ', ...'
+            self._line(f"{group['field']}: {group['message']}", font=("Courier-Bold", 9))
+            self._line(f"    {group['count']} filas. Ejemplos: {rows}", font=("Courier", 9))
+
+        if total_groups > len(groups):
+            self._line("")
+            self._line(
+                f"Se muestran los {len(groups)} grupos más frecuentes de {total_groups}. "
+                "Descargue el CSV para ver el detalle completo.",
+                font=("Helvetica-Oblique", 9),
+            )
+
+        p.showPage()
+        p.save()
+
+    def _line(self, text, font=("Courier", 9)):
+        """Escribe una línea y pasa a una página nueva cuando no hay espacio."""
+        if self.y < 1 * inch:
+            self.pdf.showPage()
+            self.y = self.height - 1 * inch
+        self.pdf.setFont(*font)
+        self.pdf.drawString(self.MARGIN, self.y, text[:110])
+        self.y -= self.LINE_HEIGHT
@@ -0,0 +1,183 @@
+# dashboard/services/error_reports.py
+
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+
+from django.db import connection
+from django.db.models import Case, Count, F, Min, Q, Value, When, Window
+from django.db.models.functions import RowNumber
+
+from dashboard.models import ImportJob, ImportRowError
+from .validators import CampaignFrameValidator
+
+VALUE_MAX_LENGTH = ImportRowError._meta.get_field('value').max_length
+CODE_LABELS = dict(CampaignFrameValidator.CODE_CHOICES)
+
+# Errores cuyo mensaje no incluye el valor rechazado: al agruparlos por
+# mensaje se ignora el valor (p. ej. todos los "El día debe estar entre 1 y 31.")
+VALUELESS_ERRORS = Q(code=CampaignFrameValidator.CODE_NOT_INTEGER) | Q(
+    code=CampaignFrameValidator.CODE_OUT_OF_RANGE,
+    field__in=[
+        field for field, (_, _, range_msg) in CampaignFrameValidator.INTEGER_FIELDS.items()
+        if range_msg and '{value}' not in range_msg
+    ],
+)
+
+
+class ImportErrorStore:
+    """
+    Guarda los errores de una importación en la base de datos en lugar de
+    acumularlos como texto en memoria (y luego en la sesión).
+
+    Los errores de cada fila se agregan con `add_row_errors` y quedan en un
+    búfer hasta que se llama a `flush`, que los inserta con `bulk_create`.
+    Así el pipeline decide cuándo escribirlos: siempre fuera del punto de
+    guardado de los datos, para que no se pierdan al revertir la carga.
+    Los errores generales (archivo ilegible, columnas faltantes...) son
+    pocos y se guardan en `ImportJob.errors`.
+
+    Con `own_connection=True`, si `flush` se llama dentro de una transacción
+    los errores se escriben desde otro hilo, con su propia conexión y en
+    modo autocommit: quedan guardados aunque la transacción de la
+    importación termine revirtiéndose por una excepción. El trabajo debe
+    estar ya confirmado en la base de datos (como en `run_import_job`).
+    """
+
+    def __init__(self, job, batch_size=5000, own_connection=False):
+        self.job = job
+        self.batch_size = batch_size
+        self.own_connection = own_connection
+        self._pending = []
+        self._general = []
+
+    def add_row_errors(self, row_errors, first_row_number):
+        """Agrega la salida de `CampaignFrameValidator.validate_rows` al búfer."""
+        for position, detail in row_errors:
+            row_number = position + first_row_number
+            for field, code, value in detail:
+                self._pending.append(ImportRowError(
+                    job=self.job, row_number=row_number, field=field, code=code,
+                    value='' if value is None else str(value)[:VALUE_MAX_LENGTH],
+                ))
+
+    def add_error(self, message):
+        self._general.append(message)
+
+    def flush(self):
+        """Escribe en la base de datos los errores pendientes."""
+        if self.own_connection and connection.in_atomic_block:
+            with ThreadPoolExecutor(max_workers=1, thread_name_prefix='import-errors') as executor:
+                executor.submit(self._flush_in_thread).result()
+        else:
+            self._write()
+
+    def _flush_in_thread(self):
+        try:
+            self._write()
+        finally:
+            connection.close()  # La conexión de este hilo no se vuelve a usar
+
+    def _write(self):
+        if self._pending:
+            ImportRowError.objects.bulk_create(self._pending, batch_size=self.batch_size)
+            self._pending = []
+        if self._general:
+            self.job.errors = self.job.errors + self._general
+            ImportJob.objects.filter(pk=self.job.pk).update(errors=self.job.errors)
+            self._general = []
+
+
+def get_error_summary(job):
+    """Cuenta los errores de fila de un trabajo agrupados por campo y código."""
+    summary = (
+        job.row_errors.values('field', 'code')
+        .annotate(count=Count('id'))
+        .order_by('-count', 'field', 'code')
+    )
+    return [{**item, 'code_display': CODE_LABELS.get(item['code'], item['code'])} for item in summary]
+
+
+def _format_rows(entries):
+    """Agrupa errores ordenados por fila y los formatea como "Fila N: ..."."""
+    for row_number, row_entries in groupby(entries, key=lambda entry: entry[0]):
+        detail = [(field, code, value) for _, field, code, value in row_entries]
+        yield CampaignFrameValidator.format_row(row_number, detail)
+
+
+def get_error_page(job, page=1, page_size=100):
+    """
+    Devuelve los mensajes de las filas con error de la página `page`
+    (numerada desde 1), `page_size` filas por página.
+    """
+    rows = job.row_errors.order_by('row_number').values_list('row_number', flat=True).distinct()
+    offset = (page - 1) * page_size
+    row_numbers = list(rows[offset:offset + page_size])
+    if not row_numbers:
+        return []
+    entries = (
+        job.row_errors.filter(row_number__gte=row_numbers[0], row_number__lte=row_numbers[-1])
+        .order_by('row_number', 'id')
+        .values_list('row_number', 'field', 'code', 'value')
+    )
+    return list(_format_rows(entries))
+
+
+def get_error_groups(job, limit=None, sample_size=5):
+    """
+    Agrupa los errores de fila por campo y mensaje, con la cantidad de
+    ocurrencias y hasta `sample_size` números de fila de ejemplo.
+
+    La agrupación y la selección de ejemplos se hacen en la base de datos,
+    así que la memoria depende de `limit` (grupos devueltos, de mayor a
+    menor cantidad) y no de la cantidad de errores.
+    """
+    entries = job.row_errors.annotate(
+        group_value=Case(When(VALUELESS_ERRORS, then=Value('')), default=F('value'))
+    )
+    groups = list(
+        entries.values('field', 'code', 'group_value')
+        .annotate(count=Count('id'), first_row=Min('row_number'))
+        .order_by('-count', 'first_row')[:limit]
+    )
+    index = {}
+    for group in groups:
+        group['message'] = CampaignFrameValidator.error_message(group['field'], group['code'], group['group_value'])
+        group['sample_rows'] = []
+        index[(group['field'], group['code'], group['group_value'])] = group
+
+    samples = (
+        entries.annotate(rank=Window(
+            RowNumber(), partition_by=[F('field'), F('code'), F('group_value')], order_by=F('row_number').asc(),
+        ))
+        .filter(rank__lte=sample_size)
+        .values_list('field', 'code', 'group_value', 'row_number')
+    )
+    for field, code, group_value, row_number in samples.iterator():
+        group = index.get((field, code, group_value))
+        if group is not None:
+            group['sample_rows'].append(row_number)
+    for group in groups:
+        group['sample_rows'].sort()
+    return groups
+
+
+def count_error_groups(job):
+    return (
+        job.row_errors.annotate(group_value=Case(When(VALUELESS_ERRORS, then=Value('')), default=F('value')))
+        .values('field', 'code', 'group_value').distinct().count()
+    )
+
+
+def iter_error_rows(job, chunk_size=5000):
+    """Genera `(fila, campo, código, valor, mensaje)` de cada error, en orden de fila."""
+    entries = (
+        job.row_errors.order_by('row_number', 'id')
+        .values_list('row_number', 'field', 'code', 'value')
+        .iterator(chunk_size=chunk_size)
+    )
+    for row_number, field, code, value in entries:
+        yield row_number, field, code, value, CampaignFrameValidator.error_message(field, code, value)
+
+
+def count_error_rows(job):
+    return job.row_errors.values('row_number').distinct().count()
@@ -0,0 +1,66 @@
+# dashboard/services/excel_importer.py
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from .base_importer import BaseDataImporter
+from .validators import READ_DTYPES
+
+class ExcelDataImporter(BaseDataImporter):
+    """
+    Fábrica concreta para procesar libros de Excel (.xlsx).
+
+    Lee la primera hoja en modo de solo lectura de openpyxl, que recorre
+    las filas en streaming sin cargar el libro completo en memoria, y las
+    agrupa en bloques de `chunk_size` filas que pasan por la misma
+    validación vectorizada que el importador CSV.
+    """
+    EXTENSIONS = ('.xlsx', '.xlsm')
+    SIGNATURES = (b'PK\x03\x04',)  # ZIP (xlsx)
+    READ_ERROR_MESSAGE = "Error de formato de archivo. No se pudo leer el Excel: {error}"
+
+    def process_file(self):
+        self.process_file_in_chunks()
+
+    def read_chunks(self):
+        workbook = load_workbook(self.file, read_only=True, data_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                raise ValueError("La hoja está vacía.")
+            columns = [str(col).strip() if col is not None else '' for col in header]
+
+            buffer = []
+            for row in rows:
+                # Igual que read_csv, se ignoran las filas completamente vacías
+                if all(value is None for value in row):
+                    continue
+                buffer.append(row)
+                if len(buffer) == self.chunk_size:
+                    yield self._build_frame(buffer, columns)
+                    buffer = []
+            if buffer:
+                yield self._build_frame(buffer, columns)
+        finally:
+            workbook.close()
+
+    @classmethod
+    def _build_frame(cls, rows, columns):
+        # Igual que el importador CSV, las columnas obligatorias se validan como
+        # texto (ver `READ_DTYPES`), sin depender de las demás celdas del bloque.
+        # Con `dtype=object` los enteros no pasan a float por una celda vacía.
+        frame = pd.DataFrame(rows, columns=columns, dtype=object)
+        for column in READ_DTYPES:
+            if column in frame.columns:
+                frame[column] = frame[column].map(cls._cell_text)
+        return frame
+
+    @staticmethod
+    def _cell_text(value):
+        """Texto de una celda tal como aparecería al exportar la hoja a CSV."""
+        if value is None:
+            return np.nan  # como una celda vacía en read_csv
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return str(value)
@@ -0,0 +1,51 @@
+# dashboard/services/hashing.py
+
+import hashlib
+import numpy as np
+from .validators import REQUIRED_COLUMNS, CampaignFrameValidator
+
+# Separador entre columnas al construir el texto que se resume con MD5
+HASH_SEPARATOR = '|'
+BOOLEAN_FIELDS = CampaignFrameValidator.BOOLEAN_FIELDS
+
+
+def content_hashes(frame):
+    """
+    Calcula el hash de contenido (MD5 hexadecimal) de cada fila de un
+    DataFrame validado. El texto resumido son las 17 columnas de negocio,
+    en el orden de `REQUIRED_COLUMNS`, separadas por `|`, con los booleanos
+    escritos como 'yes'/'no'. `content_hash_sql` produce el mismo valor en SQL.
+    """
+    if not len(frame):
+        return np.array([], dtype=object)
+
+    columns = []
+    for field in REQUIRED_COLUMNS:
+        if field in BOOLEAN_FIELDS:
+            columns.append(frame[field].map({True: 'yes', False: 'no'}).astype(str))
+        else:
+            columns.append(frame[field].astype(str))
+    joined = columns[0].str.cat(columns[1:], sep=HASH_SEPARATOR)
+    return np.array([hashlib.md5(text.encode()).hexdigest() for text in joined], dtype=object)
+
+
+def add_content_hash(frame):
+    """Devuelve `frame` con la columna `content_hash` calculada (si aún no la tiene)."""
+    if 'content_hash' not in frame.columns:
+        frame = frame.assign(content_hash=content_hashes(frame))
+    return frame
+
+
+def content_hash_sql(quote_name):
+    """
+    Expresión SQL (PostgreSQL) equivalente a `content_hashes`, usada para
+    calcular el hash de los registros que ya están en la base de datos.
+    """
+    parts = []
+    for field in REQUIRED_COLUMNS:
+        column = quote_name(field)
+        if field in BOOLEAN_FIELDS:
+            parts.append(f"CASE WHEN {column} THEN 'yes' ELSE 'no' END")
+        else:
+            parts.append(f"{column}::text")
+    return f"md5(concat_ws('{HASH_SEPARATOR}', {', '.join(parts)}))"
@@ -0,0 +1,136 @@
+# dashboard/services/import_jobs.py
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+
+from dashboard.models import ImportJob
+from .error_reports import ImportErrorStore
+from .importer_factory import ImporterFactory
+from .import_pipeline import StreamingImportPipeline
+from .bitmaps import write_bitmap_index
+from .snapshots import write_snapshot
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Devuelve el pool de hilos compartido que ejecuta las importaciones."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMPORT_JOB_WORKERS', 2),
+                thread_name_prefix='import-job',
+            )
+    return _executor
+
+
+def start_import_job(uploaded_file, mode=ImportJob.MODE_REPLACE):
+    """
+    Guarda el archivo subido, crea el `ImportJob` y lo encola en el pool.
+    El trabajo se encola al confirmar la transacción actual, para que el
+    hilo siempre encuentre el registro en la base de datos.
+    """
+    job = ImportJob.objects.create(file=uploaded_file, original_name=uploaded_file.name, mode=mode)
+    transaction.on_commit(lambda: get_executor().submit(run_import_job, job.pk))
+    return job
+
+
+def _progress_key(job_id):
+    return f'import-job-progress:{job_id}'
+
+
+def get_job_progress(job):
+    """
+    Devuelve el estado de un trabajo como diccionario serializable.
+
+    Mientras el trabajo corre, la importación ocurre dentro de una única
+    transacción, así que el avance en vivo se publica en la caché; el
+    registro en la base de datos guarda el estado inicial y el final.
+    """
+    progress = {
+        'id': job.pk,
+        'file': job.original_name,
+        'phase': job.status,
+        'phase_display': job.get_status_display(),
+        'rows_read': job.rows_read,
+        'rows_valid': job.rows_valid,
+        'rows_loaded': job.rows_loaded,
+        'errors': job.error_count,
+        'finished': job.is_finished,
+        'success': job.status == ImportJob.STATUS_DONE,
+    }
+    if not job.is_finished:
+        live = cache.get(_progress_key(job.pk))
+        if live:
+            progress.update(live)
+            progress['phase_display'] = dict(ImportJob.STATUS_CHOICES).get(live['phase'], live['phase'])
+    return progress
+
+
+def run_import_job(job_id):
+    """Ejecuta el pipeline de importación de un trabajo (en un hilo del pool)."""
+    close_old_connections()
+    try:
+        job = ImportJob.objects.get(pk=job_id)
+        job.status = ImportJob.STATUS_VALIDATING
+        job.save(update_fields=['status'])
+
+        with job.file.open('rb') as file:
+            error_store = ImportErrorStore(job, own_connection=True)
+            importer = ImporterFactory.create(file, filename=job.original_name, error_store=error_store)
+
+            def publish(phase):
+                cache.set(_progress_key(job.pk), {
+                    'phase': phase,
+                    'rows_read': importer.rows_read,
+                    'rows_valid': importer.rows_valid,
+                    'rows_loaded': pipeline.rows_loaded,
+                    'errors': importer.error_count,
+                }, timeout=60 * 60)
+
+            pipeline = StreamingImportPipeline(importer, progress_callback=publish, mode=job.mode)
+            try:
+                pipeline.run()
+            except Exception as e:
+                importer.add_error(f"Error crítico al interactuar con la base de datos: {str(e)}")
+                error_store.flush()
+
+        success = pipeline.success and not importer.has_errors
+        job.status = ImportJob.STATUS_DONE if success else ImportJob.STATUS_FAILED
+        job.rows_read = importer.rows_read
+        job.rows_valid = importer.rows_valid
+        job.rows_loaded = pipeline.rows_loaded if success else 0
+        job.error_count = importer.error_count
+        job.finished_at = timezone.now()
+        job.save()
+        job.file.delete(save=True)
+
+        if success:
+            # El snapshot y sus bitmaps son copias de lectura: si fallan, los lectores siguen usando la base de datos
+            try:
+                write_bitmap_index(write_snapshot())
+            except Exception:
+                logger.exception("No se pudo escribir el snapshot del dataset (importación %s)", job_id)
+    except ValidationError as e:  # Formato de archivo no soportado
+        ImportJob.objects.filter(pk=job_id).update(
+            status=ImportJob.STATUS_FAILED, errors=e.messages, error_count=1, finished_at=timezone.now(),
+        )
+    except Exception as e:
+        ImportJob.objects.filter(pk=job_id).update(
+            status=ImportJob.STATUS_FAILED, errors=[f"Error inesperado en la importación: {str(e)}"],
+            error_count=1, finished_at=timezone.now(),
+        )
+    finally:
+        cache.delete(_progress_key(job_id))
+        connections.close_all()
@@ -0,0 +1,118 @@
+# dashboard/services/import_pipeline.py
+
+from django.db import connection, transaction
+from dashboard.models import CampaignRecord
+from history.models import QueryHistory
+from .cube import cube_is_built, last_record_id, lock_cube, rebuild_cube, update_cube
+from .loaders import load_frame
+
+
+class StreamingImportPipeline:
+    """
+    Importa un archivo bloque a bloque dentro de una única transacción.
+
+    Cada bloque se valida con el importador y sus filas válidas se escriben
+    de inmediato, de modo que la memoria usada no depende del tamaño del
+    archivo. Se mantiene la regla de "todo o nada": los datos se escriben
+    dentro de un punto de guardado que se revierte en cuanto aparece el
+    primer error; desde ahí se sigue validando sin escribir datos.
+
+    Si el importador tiene un `error_store`, sus errores se escriben al
+    terminar cada bloque, siempre después de revertir el punto de guardado,
+    así que quedan guardados aunque la carga de datos se descarte (y, si el
+    `error_store` usa su propia conexión, aunque una excepción revierta la
+    transacción completa).
+
+    Con `mode=MODE_REPLACE` se vacían antes las tablas de registros e
+    historial y se cargan todas las filas válidas, incluidas las repetidas.
+    Con `mode=MODE_APPEND` se agregan solo las filas cuyo `content_hash` no
+    estaba en los registros previos a la importación (el cargador recibe
+    `existing_max_id`), así que reimportar un archivo solapado inserta solo
+    la diferencia; las filas repetidas dentro del mismo archivo se conservan.
+
+    Al terminar con éxito se actualiza `CampaignCube` antes de confirmar: se
+    recalcula completo al reemplazar y, al agregar, se le suman solo las
+    filas nuevas (las de id mayor al último antes de cargar), así que una
+    carga incremental no vuelve a agregar toda la tabla (salvo que el cubo
+    aún no esté construido, ver `cube_is_built`). El cubo queda
+    bloqueado para escritura durante la importación, así que las
+    importaciones se aplican de a una.
+
+    Si se indica `progress_callback`, se llama con la fase actual
+    (`PHASE_VALIDATING` o `PHASE_WRITING`) cada vez que avanza un bloque.
+    """
+    PHASE_VALIDATING = 'validating'
+    PHASE_WRITING = 'writing'
+
+    MODE_REPLACE = 'replace'
+    MODE_APPEND = 'append'
+
+    def __init__(self, importer, loader=load_frame, progress_callback=None, mode=MODE_REPLACE):
+        self.importer = importer
+        self.loader = loader
+        self.progress_callback = progress_callback
+        self.mode = mode
+        self.rows_loaded = 0
+        self.success = False
+        self._savepoint = None
+
+    def run(self):
+        """Ejecuta la importación y devuelve True si los datos quedaron guardados."""
+        with transaction.atomic():
+            lock_cube()
+            last_id = last_record_id() if self.mode == self.MODE_APPEND else None
+            self._savepoint = transaction.savepoint()
+            if self.mode == self.MODE_REPLACE:
+                self._truncate_tables()
+            self._report(self.PHASE_VALIDATING)
+
+            for valid_frame in self.importer.iter_valid_chunks():
+                # Tras el primer error se sigue validando (para reportar todos
+                # los errores), pero ya no se escribe nada.
+                if self.importer.has_errors:
+                    self._discard_data()
+                    self._flush_errors()
+                else:
+                    self._report(self.PHASE_WRITING)
+                    if last_id is None:
+                        self.rows_loaded += self.loader(valid_frame)
+                    else:
+                        self.rows_loaded += self.loader(valid_frame, existing_max_id=last_id)
+                self._report(self.PHASE_VALIDATING)
+
+            self.success = not self.importer.has_errors and self.importer.rows_valid > 0
+            if self.success:
+                # El cubo se actualiza en la misma transacción que los datos; si
+                # todavía no se construyó (tras una migración) se calcula completo
+                if last_id is None or not cube_is_built():
+                    rebuild_cube()
+                else:
+                    update_cube(last_id)
+                transaction.savepoint_commit(self._savepoint)
+            else:
+                self._discard_data()
+                self._flush_errors()
+
+        return self.success
+
+    def _discard_data(self):
+        """Revierte (una sola vez) todo lo escrito en el punto de guardado de los datos."""
+        if self._savepoint is not None:
+            transaction.savepoint_rollback(self._savepoint)
+            self._savepoint = None
+            self.rows_loaded = 0
+
+    def _flush_errors(self):
+        if self.importer.error_store is not None:
+            self.importer.error_store.flush()
+
+    def _report(self, phase):
+        if self.progress_callback is not None:
+            self.progress_callback(phase)
+
+    def _truncate_tables(self):
+        with connection.cursor() as cursor:
+            table_name_campaign = CampaignRecord._meta.db_table
+            table_name_history = QueryHistory._meta.db_table
+            cursor.execute(f'TRUNCATE TABLE "{table_name_campaign}" RESTART IDENTITY CASCADE;')
+            cursor.execute(f'TRUNCATE TABLE "{table_name_history}" RESTART IDENTITY CASCADE;')
@@ -0,0 +1,67 @@
+# dashboard/services/importer_factory.py
+
+import os
+from django.core.exceptions import ValidationError
+from .csv_importer import CsvDataImporter
+from .excel_importer import ExcelDataImporter
+
+class ImporterFactory:
+    """
+    "Creator" del patrón Factory Method: elige el importador concreto
+    según el contenido del archivo (bytes iniciales) o su extensión.
+    Si no se reconoce el formato, se trata como CSV.
+
+    Los formatos que se reconocen pero no se pueden leer (el Excel binario
+    .xls, que openpyxl no soporta) se rechazan con un `ValidationError`
+    en lugar de pasarlos al importador CSV.
+    """
+    DEFAULT_IMPORTER = CsvDataImporter
+    _importers = []
+
+    # extensión -> firma de los formatos no soportados
+    UNSUPPORTED_FORMATS = {'.xls': b'\xd0\xcf\x11\xe0'}  # OLE2 (Excel 97-2003)
+    UNSUPPORTED_MESSAGE = (
+        "Formato no soportado: los archivos Excel 97-2003 (.xls) no se pueden leer. "
+        "Guarda el libro como .xlsx o CSV y vuelve a subirlo."
+    )
+
+    @classmethod
+    def register(cls, importer_class):
+        """Registra una subclase de `BaseDataImporter` en la fábrica."""
+        if importer_class not in cls._importers:
+            cls._importers.append(importer_class)
+        return importer_class
+
+    @classmethod
+    def get_importer_class(cls, file, filename=None):
+        header = cls._read_header(file)
+        for importer_class in cls._importers:
+            if any(header.startswith(signature) for signature in importer_class.SIGNATURES):
+                return importer_class
+        if any(header.startswith(signature) for signature in cls.UNSUPPORTED_FORMATS.values()):
+            raise ValidationError(cls.UNSUPPORTED_MESSAGE, code='unsupported_format')
+
+        extension = os.path.splitext(filename or getattr(file, 'name', '') or '')[1].lower()
+        for importer_class in cls._importers:
+            if extension in importer_class.EXTENSIONS:
+                return importer_class
+        if extension in cls.UNSUPPORTED_FORMATS:
+            raise ValidationError(cls.UNSUPPORTED_MESSAGE, code='unsupported_format')
+
+        return cls.DEFAULT_IMPORTER
+
+    @classmethod
+    def create(cls, file, filename=None, **kwargs):
+        """Crea el importador adecuado para `file`."""
+        return cls.get_importer_class(file, filename)(file, **kwargs)
+
+    @staticmethod
+    def _read_header(file, size=8):
+        position = file.tell()
+        header = file.read(size)
+        file.seek(position)
+        return header if isinstance(header, bytes) else b''
+
+
+ImporterFactory.register(CsvDataImporter)
+ImporterFactory.register(ExcelDataImporter)
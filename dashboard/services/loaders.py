@@ -0,0 +1,95 @@
+# dashboard/services/loaders.py
+
+import io
+from django.db import connection
+from dashboard.models import CampaignRecord
+from .hashing import add_content_hash
+
+# Tabla temporal (se elimina al confirmar la transacción) donde COPY deja cada bloque
+STAGING_TABLE = 'dashboard_campaignrecord_staging'
+
+
+def bulk_create_frame(frame, batch_size=1000, existing_max_id=None):
+    """
+    Inserta en la base de datos un DataFrame ya validado por
+    `CampaignFrameValidator`, usando `bulk_create` por lotes.
+    Las instancias de `CampaignRecord` se construyen solo lote a lote.
+    Si se indica `existing_max_id`, se omiten las filas cuyo `content_hash`
+    ya está en algún registro con id menor o igual (los que existían antes
+    de la importación). Devuelve la cantidad de filas insertadas.
+    """
+    frame = add_content_hash(frame)
+    columns = list(frame.columns)
+    inserted = 0
+    for start in range(0, len(frame), batch_size):
+        batch = frame.iloc[start:start + batch_size]
+        if existing_max_id is not None:
+            existing = set(CampaignRecord.objects.filter(
+                id__lte=existing_max_id, content_hash__in=list(batch['content_hash'].unique())
+            ).values_list('content_hash', flat=True))
+            if existing:
+                batch = batch[~batch['content_hash'].isin(existing)]
+        records = [CampaignRecord(**dict(zip(columns, row))) for row in batch.itertuples(index=False, name=None)]
+        CampaignRecord.objects.bulk_create(records)
+        inserted += len(records)
+    return inserted
+
+
+def copy_frame(frame, batch_size=100000, existing_max_id=None):
+    """
+    Inserta un DataFrame validado con `COPY ... FROM STDIN` (solo PostgreSQL).
+    Las filas se serializan a CSV en un buffer en memoria (de a `batch_size`
+    filas) y se copian a una tabla temporal, desde donde pasan a la tabla
+    final con un INSERT ... SELECT. Con `existing_max_id` se omiten las filas
+    cuyo `content_hash` ya está en un registro con id menor o igual (usando
+    el índice de `content_hash`). Devuelve las filas insertadas.
+    """
+    frame = add_content_hash(frame)
+    quote = connection.ops.quote_name
+    table = quote(CampaignRecord._meta.db_table)
+    staging = quote(STAGING_TABLE)
+    columns = ', '.join(quote(col) for col in frame.columns)
+
+    insert_sql = f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} AS new"
+    params = []
+    if existing_max_id is not None:
+        insert_sql += (
+            f" WHERE NOT EXISTS (SELECT 1 FROM {table} AS old"
+            f" WHERE old.content_hash = new.content_hash AND old.id <= %s)"
+        )
+        params = [existing_max_id]
+
+    inserted = 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TEMPORARY TABLE IF NOT EXISTS {staging} ON COMMIT DROP AS "
+            f"SELECT {columns} FROM {table} WITH NO DATA"
+        )
+        for start in range(0, len(frame), batch_size):
+            buffer = io.StringIO()
+            frame.iloc[start:start + batch_size].to_csv(buffer, header=False, index=False)
+            buffer.seek(0)
+            cursor.execute(f"TRUNCATE {staging}")
+            cursor.copy_expert(f"COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+            cursor.execute(insert_sql, params)
+            inserted += cursor.rowcount
+    return inserted
+
+
+def load_frame(frame, existing_max_id=None):
+    """
+    Cargador por defecto: usa COPY en PostgreSQL y, en otros motores,
+    recurre a `bulk_create_frame`.
+    """
+    if supports_copy():
+        return copy_frame(frame, existing_max_id=existing_max_id)
+    return bulk_create_frame(frame, existing_max_id=existing_max_id)
+
+
+def supports_copy():
+    """Indica si la conexión actual permite cargar datos con COPY FROM STDIN."""
+    if connection.vendor != 'postgresql':
+        return False
+    # `copy_expert` es la API de COPY de psycopg2 (la versión fijada en requirements.txt)
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+    return not is_psycopg3
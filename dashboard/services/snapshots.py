@@ -0,0 +1,200 @@
+# dashboard/services/snapshots.py
+
+import json
+import os
+import shutil
+import tempfile
+import uuid
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.utils import timezone
+
+from dashboard.models import CampaignRecord
+from .dataset_version import get_dataset_version
+from .validators import (
+    CONTACT_CHOICES, EDUCATION_CHOICES, JOB_CHOICES, MARITAL_CHOICES, MONTH_CHOICES,
+    POUTCOME_CHOICES, REQUIRED_COLUMNS, CampaignFrameValidator,
+)
+
+CURRENT_FILE = 'CURRENT'
+META_FILE = 'meta.json'
+
+# Columnas categóricas: se guardan como códigos int8 más la lista de categorías
+SNAPSHOT_CATEGORIES = {
+    'job': sorted(JOB_CHOICES),
+    'marital': sorted(MARITAL_CHOICES),
+    'education': sorted(EDUCATION_CHOICES),
+    'contact': sorted(CONTACT_CHOICES),
+    'month': sorted(MONTH_CHOICES),
+    'poutcome': sorted(POUTCOME_CHOICES),
+}
+BOOLEAN_COLUMNS = CampaignFrameValidator.BOOLEAN_FIELDS
+
+
+def _integer_dtype(field):
+    """Tipo entero más angosto que cubre el rango válido del campo (int32 si no tiene rango)."""
+    valid_range = CampaignFrameValidator.INTEGER_FIELDS[field][0]
+    if valid_range is None:
+        return np.dtype(np.int32)  # IntegerField
+    low, high = valid_range
+    return next(np.dtype(t) for t in (np.int8, np.int16, np.int32) if np.iinfo(t).min <= low and high <= np.iinfo(t).max)
+
+
+SNAPSHOT_DTYPES = {
+    'id': np.dtype(np.int64),
+    **{field: _integer_dtype(field) for field in CampaignFrameValidator.INTEGER_FIELDS},
+    **{field: np.dtype(np.int8) for field in SNAPSHOT_CATEGORIES},
+    **{field: np.dtype(np.bool_) for field in BOOLEAN_COLUMNS},
+}
+SNAPSHOT_COLUMNS = ['id'] + REQUIRED_COLUMNS
+
+
+def get_snapshot_dir():
+    return str(getattr(settings, 'DATASET_SNAPSHOT_DIR', os.path.join(settings.BASE_DIR, 'snapshots')))
+
+
+class DatasetSnapshot:
+    """
+    Copia columnar e inmutable de `CampaignRecord`, una versión por importación.
+
+    Cada versión es un directorio con un archivo `.npy` por columna (enteros
+    con el tipo más angosto posible, booleanos y categóricas codificadas como
+    diccionario: códigos int8 + categorías en `meta.json`). Las columnas se
+    abren con `np.load(mmap_mode='r')`, así que leer el snapshot no copia los
+    datos en memoria ni consulta la base de datos.
+
+    El archivo `CURRENT` apunta a la versión vigente. Una versión se escribe
+    completa en un directorio temporal y solo después se renombra y se
+    actualiza `CURRENT` (ambas operaciones atómicas), así que un lector nunca
+    ve una versión a medio escribir.
+    """
+
+    def __init__(self, path, meta):
+        self.path = path
+        self.meta = meta
+        self.version = meta['version']
+        self.rows = meta['rows']
+        self._columns = {}
+
+    @classmethod
+    def open(cls, version, base_dir=None):
+        path = os.path.join(base_dir or get_snapshot_dir(), version)
+        with open(os.path.join(path, META_FILE), encoding='utf-8') as meta_file:
+            return cls(path, json.load(meta_file))
+
+    def column(self, name):
+        """Devuelve la columna `name` como arreglo de NumPy mapeado en memoria (sin copiar)."""
+        if name not in self._columns:
+            self._columns[name] = np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+        return self._columns[name]
+
+    def categories(self, name):
+        return self.meta['categories'][name]
+
+    def values(self, name):
+        """Devuelve la columna decodificada (categóricas como `pd.Categorical`)."""
+        data = self.column(name)
+        if name in self.meta['categories']:
+            return pd.Categorical.from_codes(data, categories=self.categories(name))
+        return data
+
+    def to_frame(self, columns=None):
+        """Construye un DataFrame con las columnas pedidas (todas por defecto)."""
+        return pd.DataFrame({name: self.values(name) for name in (columns or self.meta['columns'])})
+
+
+def get_current_snapshot(base_dir=None):
+    """Abre la versión vigente del snapshot, o devuelve None si todavía no hay ninguna."""
+    base_dir = base_dir or get_snapshot_dir()
+    try:
+        with open(os.path.join(base_dir, CURRENT_FILE), encoding='utf-8') as current:
+            version = current.read().strip()
+        return DatasetSnapshot.open(version, base_dir)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+
+def _encode_chunk(rows):
+    """Convierte un bloque de tuplas de `values_list` en un arreglo por columna."""
+    columns = list(zip(*rows))
+    encoded = {}
+    for name, values in zip(SNAPSHOT_COLUMNS, columns):
+        if name in SNAPSHOT_CATEGORIES:
+            encoded[name] = pd.Categorical(values, categories=SNAPSHOT_CATEGORIES[name]).codes.astype(np.int8)
+        else:
+            encoded[name] = np.array(values, dtype=SNAPSHOT_DTYPES[name])
+    return encoded
+
+
+def write_snapshot(base_dir=None, chunk_size=50000, keep=2):
+    """
+    Escribe una nueva versión del snapshot con el contenido actual de
+    `CampaignRecord` y la marca como vigente. Devuelve el `DatasetSnapshot`.
+    Se conservan las `keep` versiones más recientes.
+    """
+    base_dir = base_dir or get_snapshot_dir()
+    os.makedirs(base_dir, exist_ok=True)
+    version = f"{timezone.now():%Y%m%d%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+    dataset_version = get_dataset_version()
+
+    parts = {name: [] for name in SNAPSHOT_COLUMNS}
+    rows = CampaignRecord.objects.order_by('id').values_list(*SNAPSHOT_COLUMNS)
+    batch = []
+    for row in rows.iterator(chunk_size=chunk_size):
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            for name, values in _encode_chunk(batch).items():
+                parts[name].append(values)
+            batch = []
+    if batch:
+        for name, values in _encode_chunk(batch).items():
+            parts[name].append(values)
+
+    tmp_dir = tempfile.mkdtemp(prefix='.tmp-', dir=base_dir)
+    try:
+        total = 0
+        for name in SNAPSHOT_COLUMNS:
+            data = np.concatenate(parts[name]) if parts[name] else np.empty(0, dtype=SNAPSHOT_DTYPES[name])
+            parts[name] = None
+            total = len(data)
+            np.save(os.path.join(tmp_dir, f'{name}.npy'), data)
+
+        meta = {
+            'version': version,
+            'dataset_version': dataset_version,
+            'rows': total,
+            'created_at': timezone.now().isoformat(),
+            'columns': REQUIRED_COLUMNS,
+            'categories': SNAPSHOT_CATEGORIES,
+        }
+        with open(os.path.join(tmp_dir, META_FILE), 'w', encoding='utf-8') as meta_file:
+            json.dump(meta, meta_file)
+
+        os.replace(tmp_dir, os.path.join(base_dir, version))
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    _set_current(base_dir, version)
+    _remove_old_versions(base_dir, keep, current=version)
+    return DatasetSnapshot.open(version, base_dir)
+
+
+def _set_current(base_dir, version):
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', dir=base_dir)
+    with os.fdopen(fd, 'w', encoding='utf-8') as current:
+        current.write(version)
+    os.replace(tmp_path, os.path.join(base_dir, CURRENT_FILE))
+
+
+def _remove_old_versions(base_dir, keep, current):
+    """Borra las versiones antiguas; los lectores que ya las abrieron siguen usando su mapeo."""
+    versions = sorted(
+        name for name in os.listdir(base_dir)
+        if not name.startswith('.') and name != current and os.path.isdir(os.path.join(base_dir, name))
+    )
+    # La versión recién escrita siempre se conserva, junto con las `keep - 1` más recientes
+    for name in versions[:max(len(versions) - (keep - 1), 0)]:
+        shutil.rmtree(os.path.join(base_dir, name), ignore_errors=True)
@@ -0,0 +1,254 @@
+# dashboard/services/validators.py
+
+import numpy as np
+import pandas as pd
+
+# Columnas obligatorias del dataset, en el orden del diccionario de datos
+REQUIRED_COLUMNS = [
+    'age', 'job', 'marital', 'education', 'default', 'balance', 'housing', 'loan',
+    'contact', 'day', 'month', 'duration', 'campaign', 'pdays', 'previous', 'poutcome', 'y'
+]
+
+# Listas de validación (congeladas una sola vez, no por fila)
+JOB_CHOICES = frozenset(["admin.", "blue-collar", "entrepreneur", "housemaid", "management", "retired", "self-employed", "services", "student", "technician", "unemployed", "unknown"])
+MARITAL_CHOICES = frozenset(["married", "divorced", "single", "unknown"])
+EDUCATION_CHOICES = frozenset(["primary", "secondary", "tertiary", "unknown"])
+CONTACT_CHOICES = frozenset(["unknown", "telephone", "cellular"])
+POUTCOME_CHOICES = frozenset(["failure", "other", "success", "unknown"])
+MONTH_CHOICES = frozenset(["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"])
+
+BOOLEAN_VALUES = {'yes': True, 'no': False}
+
+# Tipos de lectura: todas las columnas obligatorias se leen como texto. Si
+# pandas infiriera el tipo, dependería de los valores que caen en cada bloque
+# (un "30.5" se leería como 30.5 y se truncaría a 30 en un bloque numérico,
+# pero sería texto inválido en uno con "abc"), y el resultado de la validación
+# cambiaría según dónde se corte el archivo. Leído como texto, `int(valor)` se
+# aplica siempre sobre el valor tal como está escrito.
+READ_DTYPES = dict.fromkeys(REQUIRED_COLUMNS, str)
+
+class CampaignFrameValidator:
+    """
+    Valida un DataFrame completo columna por columna usando máscaras de
+    pandas/NumPy en lugar de recorrer las filas una a una.
+
+    Aplica exactamente las mismas reglas que `CsvDataImporter._create_record_from_row`
+    y produce los mismos mensajes "Fila N: campo: mensaje" para las filas inválidas.
+    """
+
+    # campo -> (opciones válidas, mensaje de error)
+    CHOICE_FIELDS = {
+        'job': (JOB_CHOICES, "'{value}' no es una ocupación válida."),
+        'marital': (MARITAL_CHOICES, "'{value}' no es un estado civil válido."),
+        'education': (EDUCATION_CHOICES, "'{value}' no es un nivel de educación válido."),
+        'contact': (CONTACT_CHOICES, "'{value}' no es un tipo de contacto válido."),
+        'month': (MONTH_CHOICES, "'{value}' no es un mes válido."),
+        'poutcome': (POUTCOME_CHOICES, "'{value}' no es un resultado válido."),
+    }
+
+    # campo -> (rango permitido o None, mensaje de tipo, mensaje de rango)
+    INTEGER_FIELDS = {
+        'age': ((17, 98), "La edad debe ser un número entero.", "La edad ({value}) debe estar entre 17 y 98."),
+        'balance': (None, "El balance debe ser un número entero.", None),
+        'day': ((1, 31), "El día debe ser un número entero.", "El día debe estar entre 1 y 31."),
+        'duration': ((0, 5000), "La duración debe ser un número entero.", "La duración debe estar entre 0 y 5000."),
+        'campaign': ((1, 99), "Campaña debe ser un número entero.", "El número de campaña debe ser entre 1 y 99."),
+        'pdays': ((-1, 999), "Pdays debe ser un número entero.", "Pdays debe ser un número entero entre -1 y 999."),
+        'previous': ((0, 300), "Previous debe ser un número entero.", "Previous debe ser un número entero entre 0 y 300."),
+    }
+
+    BOOLEAN_FIELDS = ['default', 'housing', 'loan', 'y']
+
+    # Orden en el que el validador fila a fila reporta los errores
+    ERROR_ORDER = [
+        'age', 'job', 'marital', 'education', 'balance', 'contact', 'day', 'month',
+        'duration', 'campaign', 'pdays', 'previous', 'poutcome', 'default', 'housing', 'loan', 'y'
+    ]
+
+    BOOLEAN_MESSAGE = "El valor '{value}' es inválido, debe ser 'yes' o 'no'."
+
+    # Códigos de error: permiten guardar los errores de forma compacta
+    # (campo, código, valor) y reconstruir el mensaje al mostrarlos.
+    CODE_NOT_INTEGER = 'not_integer'
+    CODE_OUT_OF_RANGE = 'out_of_range'
+    CODE_INVALID_CHOICE = 'invalid_choice'
+    CODE_INVALID_BOOLEAN = 'invalid_boolean'
+    CODE_CHOICES = [
+        (CODE_NOT_INTEGER, 'No es un número entero'),
+        (CODE_OUT_OF_RANGE, 'Fuera de rango'),
+        (CODE_INVALID_CHOICE, 'Opción no válida'),
+        (CODE_INVALID_BOOLEAN, "No es 'yes' ni 'no'"),
+    ]
+
+    INT64_MIN, INT64_MAX = np.iinfo(np.int64).min, np.iinfo(np.int64).max
+
+    def validate(self, df, first_row_number=2):
+        """
+        Valida `df` y devuelve `(valid_frame, errors)`.
+
+        `valid_frame` contiene solo las filas válidas, ya normalizadas y con
+        las columnas en el orden de `REQUIRED_COLUMNS`, lista para insertarse.
+        `first_row_number` es el número de fila (en el archivo) de la primera
+        fila de `df`, para que los mensajes coincidan al procesar por bloques.
+        """
+        valid_frame, row_errors = self.validate_rows(df)
+        return valid_frame, self.format_errors(row_errors, first_row_number)
+
+    def validate_rows(self, df):
+        """
+        Igual que `validate`, pero devuelve los errores sin formatear, como
+        una lista de `(posición_en_df, [(campo, código, valor), ...])`. Permite
+        numerar las filas después, cuando los bloques se validan en paralelo,
+        y guardar los errores sin construir cada mensaje (ver `error_message`).
+        """
+        n = len(df)
+        clean = {}
+        failures = {}  # campo -> (máscara de filas inválidas, función que construye (código, valor))
+
+        for field, (valid_range, _, _) in self.INTEGER_FIELDS.items():
+            values, is_int, oversized = self._to_int(df[field])
+            bad = ~is_int
+            out_of_range = np.zeros(n, dtype=bool)
+            if valid_range is not None:
+                low, high = valid_range
+                out_of_range = is_int & ((values < low) | (values > high))
+                # Los enteros que no caben en int64 son válidos para `int()`,
+                # pero siempre quedan fuera del rango
+                positions = list(oversized)
+                bad[positions] = False
+                out_of_range[positions] = True
+            clean[field] = values
+            failures[field] = (bad | out_of_range, self._integer_errors(bad, values, oversized))
+
+        for field, (choices, _) in self.CHOICE_FIELDS.items():
+            codes, raw, normalized = self._factorize(df[field])
+            valid_codes = np.array([value in choices for value in normalized], dtype=bool)
+            bad = ~valid_codes[codes]
+            clean[field] = np.array(normalized, dtype=object)[codes]
+            failures[field] = (bad, self._value_errors(codes, raw, self.CODE_INVALID_CHOICE))
+
+        for field in self.BOOLEAN_FIELDS:
+            codes, raw, normalized = self._factorize(df[field], strip=True)
+            mapped = [BOOLEAN_VALUES.get(value) for value in normalized]
+            valid_codes = np.array([value is not None for value in mapped], dtype=bool)
+            bool_codes = np.array([bool(value) for value in mapped], dtype=bool)
+            bad = ~valid_codes[codes]
+            clean[field] = bool_codes[codes]
+            failures[field] = (bad, self._value_errors(codes, raw, self.CODE_INVALID_BOOLEAN))
+
+        invalid = np.zeros(n, dtype=bool)
+        for mask, _ in failures.values():
+            invalid |= mask
+
+        row_errors = self._build_errors(invalid, failures)
+
+        valid = ~invalid
+        valid_frame = pd.DataFrame({field: clean[field][valid] for field in REQUIRED_COLUMNS})
+        return valid_frame, row_errors
+
+    # --- Conversión de columnas ---
+    def _to_int(self, series):
+        """
+        Convierte una columna a int64 aceptando exactamente lo que acepta
+        `int(valor)` (al leer como texto: enteros con signo, espacios o `_`,
+        pero no "30.5" ni "1e3"). Devuelve los valores, una máscara con las filas convertibles y un
+        diccionario {posición: entero} con los enteros que no caben en int64
+        (esas filas quedan fuera de la máscara).
+        """
+        if pd.api.types.is_bool_dtype(series) or pd.api.types.is_signed_integer_dtype(series):
+            return series.to_numpy(dtype=np.int64), np.ones(len(series), dtype=bool), {}
+
+        if pd.api.types.is_unsigned_integer_dtype(series):
+            raw = series.to_numpy()
+            ok = raw <= self.INT64_MAX
+            oversized = {int(i): int(raw[i]) for i in np.flatnonzero(~ok)}
+            return np.where(ok, raw, 0).astype(np.int64), ok, oversized
+
+        if pd.api.types.is_float_dtype(series):
+            raw = series.to_numpy(dtype=np.float64)
+            finite = np.isfinite(raw)
+            ok = finite & (raw > self.INT64_MIN) & (raw < self.INT64_MAX)
+            values = np.zeros(len(raw), dtype=np.int64)
+            values[ok] = np.trunc(raw[ok])  # int() trunca hacia cero
+            oversized = {int(i): int(raw[i]) for i in np.flatnonzero(finite & ~ok)}
+            return values, ok, oversized
+
+        # Columna de texto: se convierte cada valor único una sola vez
+        codes, uniques = pd.factorize(series, use_na_sentinel=False)
+        unique_values = np.zeros(len(uniques), dtype=np.int64)
+        unique_ok = np.zeros(len(uniques), dtype=bool)
+        oversized = {}
+        for i, value in enumerate(uniques):
+            try:
+                converted = int(value)
+            except (ValueError, TypeError, OverflowError):
+                continue
+            if self.INT64_MIN <= converted <= self.INT64_MAX:
+                unique_values[i] = converted
+                unique_ok[i] = True
+            else:
+                oversized.update((int(position), converted) for position in np.flatnonzero(codes == i))
+        return unique_values[codes], unique_ok[codes], oversized
+
+    @staticmethod
+    def _factorize(series, strip=False):
+        """
+        Factoriza una columna y normaliza cada valor único como lo haría
+        `str(valor).lower()`. Devuelve los códigos por fila, los valores
+        originales (como texto) y los valores normalizados.
+        """
+        codes, uniques = pd.factorize(series, use_na_sentinel=False)
+        raw = [str(value) for value in uniques]
+        normalized = [value.strip().lower() if strip else value.lower() for value in raw]
+        return codes, raw, normalized
+
+    # --- Construcción de errores ---
+    @classmethod
+    def _integer_errors(cls, bad_type, values, oversized):
+        def build(position):
+            if bad_type[position]:
+                return cls.CODE_NOT_INTEGER, None
+            return cls.CODE_OUT_OF_RANGE, oversized.get(position, int(values[position]))
+        return build
+
+    @staticmethod
+    def _value_errors(codes, raw, code):
+        def build(position):
+            return code, raw[codes[position]]
+        return build
+
+    def _build_errors(self, invalid, failures):
+        """Construye las tuplas (campo, código, valor) solo para las filas inválidas."""
+        positions = np.flatnonzero(invalid)
+        if not len(positions):
+            return []
+
+        details = [[] for _ in range(len(positions))]
+        for field in self.ERROR_ORDER:
+            mask, build = failures[field]
+            for i in np.flatnonzero(mask[positions]):
+                details[i].append((field, *build(positions[i])))
+
+        return [(int(position), detail) for position, detail in zip(positions, details)]
+
+    @classmethod
+    def error_message(cls, field, code, value=None):
+        """Reconstruye el mensaje de un error a partir de su campo, código y valor."""
+        if code == cls.CODE_NOT_INTEGER:
+            return cls.INTEGER_FIELDS[field][1]
+        if code == cls.CODE_OUT_OF_RANGE:
+            return cls.INTEGER_FIELDS[field][2].format(value=value)
+        if code == cls.CODE_INVALID_CHOICE:
+            return cls.CHOICE_FIELDS[field][1].format(value=value)
+        return cls.BOOLEAN_MESSAGE.format(value=value)
+
+    @classmethod
+    def format_row(cls, row_number, detail):
+        """Formatea los errores de una fila como "Fila N: campo: mensaje, ..."."""
+        messages = ', '.join(f'{field}: {cls.error_message(field, code, value)}' for field, code, value in detail)
+        return f"Fila {row_number}: {messages}"
+
+    @classmethod
+    def format_errors(cls, row_errors, first_row_number=2):
+        """Convierte los errores de `validate_rows` en mensajes "Fila N: campo: mensaje"."""
+        return [cls.format_row(position + first_row_number, detail) for position, detail in row_errors]
@@ -1,3 +1,561 @@
-from django.test import TestCase
+import importlib
+import io
+import os
+import random
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.apps import apps as django_apps
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from openpyxl import Workbook
+
+from analytics.tests import _sample_records
+from .models import CampaignCube, CampaignRecord, ImportJob, ImportRowError
+from .services.csv_importer import CsvDataImporter
+from .services.error_reports import (
+    ImportErrorStore, count_error_rows, get_error_groups, get_error_page, get_error_summary, iter_error_rows,
+)
+from .services.excel_importer import ExcelDataImporter
+from .services.hashing import content_hash_sql, content_hashes
+from .services.import_jobs import get_job_progress, run_import_job
+from .services.import_pipeline import StreamingImportPipeline
+from .services.importer_factory import ImporterFactory
+from .services.loaders import bulk_create_frame, copy_frame, load_frame, supports_copy
+from .services.snapshots import get_current_snapshot, write_snapshot
+from .services.validators import READ_DTYPES, REQUIRED_COLUMNS, CampaignFrameValidator
+
+VALID_ROW = {
+    'age': '40', 'job': 'admin.', 'marital': 'married', 'education': 'primary', 'default': 'no',
+    'balance': '100', 'housing': 'yes', 'loan': 'no', 'contact': 'cellular', 'day': '5', 'month': 'may',
+    'duration': '100', 'campaign': '1', 'pdays': '-1', 'previous': '0', 'poutcome': 'unknown', 'y': 'no',
+}
+
+# Valores inválidos o dudosos para mezclar con filas válidas
+INTEGER_SAMPLES = ['17', '98', '16', '99', '-1', '0', '5001', '17.0', '1.0', '1.5', '40.9', 'abc', '', ' 5',
+                   '1e3', 'NaN', 'True', '301', '99999999999999999999', '+7', '0x1']
+TEXT_SAMPLES = ['Married', 'single', 'MAY', 'success', 'foo', '', '1', 'yes', 'Yes', ' no ', 'NO', '01', 'True']
+
+
+def _csv(rows):
+    """Construye el contenido de un CSV con separador ';' a partir de diccionarios parciales."""
+    lines = [';'.join(REQUIRED_COLUMNS)]
+    lines += [';'.join({**VALID_ROW, **row}[col] for col in REQUIRED_COLUMNS) for row in rows]
+    return ('\n'.join(lines) + '\n').encode()
+
+
+def _random_rows(seed, count):
+    rng = random.Random(seed)
+    error_rate = rng.choice([0.02, 0.1, 0.3])
+    rows = []
+    for _ in range(count):
+        row = {}
+        for col in REQUIRED_COLUMNS:
+            if rng.random() < error_rate:
+                integer = col in CampaignFrameValidator.INTEGER_FIELDS
+                value = rng.choice(INTEGER_SAMPLES if integer else TEXT_SAMPLES)
+                # `balance` no tiene rango: un entero que no cabe en int64 no se compara
+                row[col] = '7' if col == 'balance' and len(value) > 18 else value
+        rows.append(row)
+    return rows
+
+
+def _records_csv(records, extra_lines=()):
+    """Escribe registros (p. ej. de `_sample_records`) como un CSV válido, más líneas crudas al final."""
+    lines = [';'.join(REQUIRED_COLUMNS)]
+    for record in records:
+        values = [getattr(record, col) for col in REQUIRED_COLUMNS]
+        lines.append(';'.join(('yes' if value else 'no') if isinstance(value, bool) else str(value) for value in values))
+    lines += list(extra_lines)
+    return ('\n'.join(lines) + '\n').encode()
+
+
+def _xlsx(content):
+    """Convierte el contenido de un CSV en un libro de Excel, con los números como celdas numéricas."""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    for i, line in enumerate(content.decode().splitlines()):
+        sheet.append([int(value) if i and value.lstrip('-').isdigit() else value for value in line.split(';')])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def _record_values(records):
+    if isinstance(records, pd.DataFrame):
+        return [tuple(value.item() if hasattr(value, 'item') else value for value in row)
+                for row in records[REQUIRED_COLUMNS].itertuples(index=False)]
+    return [tuple(getattr(record, col) for col in REQUIRED_COLUMNS) for record in records]
+
+
+class CampaignFrameValidatorTests(SimpleTestCase):
+
+    def test_matches_row_validator_on_mixed_frames(self):
+        importer = CsvDataImporter(io.BytesIO(b''))
+        for seed in range(40):
+            frame = pd.read_csv(io.BytesIO(_csv(_random_rows(seed, 50))), sep=';', dtype=READ_DTYPES)
+            expected_records, expected_errors = [], []
+            for index, row in frame.iterrows():
+                try:
+                    expected_records.append(importer._create_record_from_row(row))
+                except ValidationError as e:
+                    expected_errors.append(f"Fila {index + 2}: {', '.join(e.messages)}")
+
+            valid_frame, errors = CampaignFrameValidator().validate(frame)
+            self.assertEqual(errors, expected_errors, seed)
+            self.assertEqual(_record_values(valid_frame), _record_values(expected_records), seed)
+
+    def test_vectorized_import_matches_row_import(self):
+        for seed in range(40, 60):
+            content = _csv(_random_rows(seed, 50))
+            row_importer = CsvDataImporter(io.BytesIO(content), vectorized=False)
+            row_importer.process_file()
+            importer = CsvDataImporter(io.BytesIO(content))
+            importer.process_file()
+            self.assertEqual(importer.errors, row_importer.errors, seed)
+            self.assertEqual(_record_values(importer.valid_records), _record_values(row_importer.valid_records), seed)
+
+    def test_integer_columns_are_read_as_text(self):
+        # `int()` se aplica al texto: "17.0" nunca es un entero válido, aunque la
+        # columna sea numérica; los espacios y el signo sí se aceptan
+        importer = CsvDataImporter(io.BytesIO(_csv([{'age': '17.0'}, {'age': '40.9'}, {'age': ' 30'}, {'age': '+31'}])))
+        importer.process_file()
+        self.assertEqual(importer.errors, [
+            "Fila 2: age: La edad debe ser un número entero.",
+            "Fila 3: age: La edad debe ser un número entero.",
+        ])
+        self.assertEqual(list(importer.valid_records['age']), [30, 31])
+
+    def test_result_does_not_depend_on_chunk_size(self):
+        rows = [{}] * 8
+        rows[0] = {'age': '30.5'}
+        rows[4] = {'age': 'abc'}
+        rows[6] = {'balance': '1e3', 'day': '7.0'}
+        content = _csv(rows)
+        row_importer = CsvDataImporter(io.BytesIO(content), vectorized=False)
+        row_importer.process_file()
+        self.assertEqual(row_importer.errors, [
+            "Fila 2: age: La edad debe ser un número entero.",
+            "Fila 6: age: La edad debe ser un número entero.",
+            "Fila 8: balance: El balance debe ser un número entero., day: El día debe ser un número entero.",
+        ])
+        for chunk_size in (1, 2, 3, 5, 100):
+            importer = CsvDataImporter(io.BytesIO(content), chunk_size=chunk_size)
+            importer.process_file()
+            self.assertEqual(importer.errors, row_importer.errors, chunk_size)
+            self.assertEqual(_record_values(importer.valid_records), _record_values(row_importer.valid_records))
+
+    def test_oversized_integer_is_out_of_range(self):
+        _, errors = CampaignFrameValidator().validate(
+            pd.read_csv(io.BytesIO(_csv([{'age': '99999999999999999999'}, {'age': 'x'}])), sep=';'))
+        self.assertEqual(errors[0], "Fila 2: age: La edad (99999999999999999999) debe estar entre 17 y 98.")
+
+    def test_chunked_import_numbers_rows_across_chunks(self):
+        rows = [{}] * 30
+        rows[3] = {'job': 'chef'}
+        rows[11] = {'age': '16', 'y': 'maybe'}
+        rows[29] = {'day': 'abc'}
+        content = _csv(rows)
+        row_importer = CsvDataImporter(io.BytesIO(content), vectorized=False)
+        row_importer.process_file()
+        for chunk_size in (1, 7, 12, 100):
+            importer = CsvDataImporter(io.BytesIO(content), chunk_size=chunk_size)
+            importer.process_file()
+            self.assertEqual(importer.errors, row_importer.errors)
+            self.assertEqual(importer.rows_read, 30)
+            self.assertEqual(importer.rows_valid, 27)
+        self.assertEqual(row_importer.errors, [
+            "Fila 5: job: 'chef' no es una ocupación válida.",
+            "Fila 13: age: La edad (16) debe estar entre 17 y 98., y: El valor 'maybe' es inválido, debe ser 'yes' o 'no'.",
+            "Fila 31: day: El día debe ser un número entero.",
+        ])
+
+    def test_missing_columns(self):
+        importer = CsvDataImporter(io.BytesIO(b'age;job\n40;admin.\n'))
+        importer.process_file()
+        self.assertEqual(importer.errors, ["Faltan las siguientes columnas obligatorias: " + ', '.join(REQUIRED_COLUMNS[2:])])
+        self.assertEqual(importer.rows_read, 0)
+
+
+class ParallelValidationTests(SimpleTestCase):
+
+    def test_processes_match_sequential_validation(self):
+        # Un campo entre comillas con un salto de línea no debe usarse como punto de corte
+        content = _records_csv(_sample_records(120, seed=5), extra_lines=[
+            '30;"che\nf";married;primary;no;1;yes;no;cellular;1;may;1;1;1;1;success;no',
+            '30;admin.;married;primary;no;1;yes;no;cellular;40;may;1;1;1;1;success;no',
+        ])
+        sequential = CsvDataImporter(io.BytesIO(content), chunk_size=25)
+        sequential.process_file()
+        parallel = CsvDataImporter(io.BytesIO(content), chunk_size=25, workers=2)
+        parallel.process_file()
+        self.assertEqual(parallel.errors, sequential.errors)
+        self.assertEqual(len(parallel.errors), 2)
+        self.assertEqual((parallel.rows_read, parallel.rows_valid), (122, 120))
+        pd.testing.assert_frame_equal(parallel.valid_records, sequential.valid_records)
+
+    def test_processes_match_sequential_validation_with_ambiguous_types(self):
+        # Los bloques de texto se cortan distinto que `chunksize`: con tipos
+        # inferidos, "30.5" se aceptaba o no según el bloque en el que cayera
+        rows = [{}] * 40
+        for i in range(0, 40, 6):
+            rows[i] = {'age': '30.5'}
+        rows[9] = {'age': 'abc', 'balance': '1e3'}
+        rows[25] = {'day': '7.0', 'pdays': ' -1'}
+        content = _csv(rows)
+        sequential = CsvDataImporter(io.BytesIO(content), chunk_size=7)
+        sequential.process_file()
+        parallel = CsvDataImporter(io.BytesIO(content), chunk_size=4, workers=2)
+        parallel.process_file()
+        row_importer = CsvDataImporter(io.BytesIO(content), vectorized=False)
+        row_importer.process_file()
+        self.assertEqual(parallel.errors, sequential.errors)
+        self.assertEqual(parallel.errors, row_importer.errors)
+        self.assertEqual(len(parallel.errors), 9)
+        pd.testing.assert_frame_equal(parallel.valid_records, sequential.valid_records)
+
+class ExcelImporterTests(SimpleTestCase):
+
+    def test_matches_csv_import(self):
+        content = _records_csv(_sample_records(60, seed=6), extra_lines=[
+            '30;chef;married;primary;no;1;yes;no;cellular;1;may;1;1;1;1;success;no',
+        ])
+        csv_importer = CsvDataImporter(io.BytesIO(content))
+        csv_importer.process_file()
+        excel_importer = ExcelDataImporter(_xlsx(content), chunk_size=16)
+        excel_importer.process_file()
+        self.assertEqual(excel_importer.errors, ["Fila 62: job: 'chef' no es una ocupación válida."])
+        self.assertEqual(excel_importer.errors, csv_importer.errors)
+        self.assertEqual(_record_values(excel_importer.valid_records), _record_values(csv_importer.valid_records))
+
+    def test_unreadable_file(self):
+        importer = ExcelDataImporter(io.BytesIO(b'PK\x03\x04basura'))
+        importer.process_file()
+        self.assertTrue(importer.errors[0].startswith("Error de formato de archivo. No se pudo leer el Excel"))
+
+    def test_factory_detects_format(self):
+        self.assertIs(ImporterFactory.get_importer_class(_xlsx(_csv([])), 'datos.csv'), ExcelDataImporter)
+        self.assertIs(ImporterFactory.get_importer_class(io.BytesIO(b'age;job'), 'datos.xlsx'), ExcelDataImporter)
+        self.assertIs(ImporterFactory.get_importer_class(io.BytesIO(b'age;job'), 'datos.txt'), CsvDataImporter)
+        self.assertIs(ImporterFactory.get_importer_class(io.BytesIO(b'age;job')), CsvDataImporter)
+        self.assertIs(ImporterFactory.get_importer_class(_xlsx(_csv([])), 'datos.xls'), ExcelDataImporter)
+
+    def test_factory_rejects_xls(self):
+        for file, name in [(io.BytesIO(b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'), 'datos.csv'), (io.BytesIO(b'age;job'), 'datos.xls')]:
+            with self.assertRaisesMessage(ValidationError, "Formato no soportado"):
+                ImporterFactory.get_importer_class(file, name)
+
+
+class LoaderTests(TestCase):
+
+    def _frames(self, content):
+        importer = CsvDataImporter(io.BytesIO(content))
+        importer.process_file()
+        return importer.valid_records
+
+    def _check_loader(self, loader):
+        records = _sample_records(50, seed=8)
+        # Sin `existing_max_id` se cargan todas las filas, también las repetidas
+        self.assertEqual(loader(self._frames(_records_csv(records + records[:5]))), 55)
+        existing_max_id = CampaignRecord.objects.order_by('-id').values_list('id', flat=True)[0]
+        new_records = _sample_records(60, seed=9)[50:]
+        frame = self._frames(_records_csv(records[40:] + new_records + new_records[:2]))
+        # Se omiten las filas que ya existían, pero no las repetidas dentro del mismo bloque
+        self.assertEqual(loader(frame, existing_max_id=existing_max_id), 12)
+        self.assertEqual(CampaignRecord.objects.count(), 67)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT COUNT(*) FROM {CampaignRecord._meta.db_table} "
+                f"WHERE content_hash <> {content_hash_sql(connection.ops.quote_name)}"
+            )
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_bulk_create_frame(self):
+        self._check_loader(bulk_create_frame)
+
+    def test_copy_frame(self):
+        if not supports_copy():
+            self.skipTest("COPY FROM STDIN solo está disponible en PostgreSQL con psycopg2.")
+        self._check_loader(copy_frame)
+
+
+class ContentHashMigrationTests(TestCase):
+
+    def test_backfill_matches_content_hashes(self):
+        backfill = importlib.import_module(
+            'dashboard.migrations.0003_campaignrecord_content_hash_importjob_mode'
+        ).backfill_content_hash
+        CampaignRecord.objects.bulk_create(_sample_records(30, seed=22) * 2)
+        CampaignRecord.objects.update(content_hash='')
+        with connection.schema_editor() as schema_editor:
+            backfill(django_apps, schema_editor)
+
+        frame = pd.DataFrame.from_records(
+            CampaignRecord.objects.order_by('id').values_list(*REQUIRED_COLUMNS), columns=REQUIRED_COLUMNS,
+        )
+        hashes = list(CampaignRecord.objects.order_by('id').values_list('content_hash', flat=True))
+        self.assertEqual(hashes, list(content_hashes(frame)))
+        self.assertEqual(CampaignRecord.objects.count(), 60)  # Los registros repetidos se conservan
+
+
+class StreamingImportPipelineTests(TestCase):
+    BAD_JOB = '30;chef;married;primary;no;1;yes;no;cellular;1;may;1;1;1;1;success;no'
+    BAD_DAY = '30;admin.;married;primary;no;1;yes;no;cellular;40;may;1;1;1;1;success;no'
+
+    def setUp(self):
+        CampaignRecord.objects.bulk_create(_sample_records(15, seed=16))
+        self.loaded_frames = []
+
+    def _loader(self, frame, **kwargs):
+        self.loaded_frames.append(len(frame))
+        return load_frame(frame, **kwargs)
+
+    def _run(self, content, mode=StreamingImportPipeline.MODE_REPLACE, error_store=None):
+        importer = CsvDataImporter(io.BytesIO(content), chunk_size=10, error_store=error_store)
+        pipeline = StreamingImportPipeline(importer, loader=self._loader, mode=mode)
+        return pipeline, importer, pipeline.run()
+
+    def _content(self, records, bad_lines):
+        """CSV con los registros y las líneas inválidas insertadas en las filas indicadas del archivo."""
+        lines = _records_csv(records).decode().splitlines()
+        for row_number, bad_line in sorted(bad_lines.items()):
+            lines.insert(row_number - 1, bad_line)
+        return ('\n'.join(lines) + '\n').encode()
+
+    def test_bad_row_in_later_chunk_rolls_back_everything(self):
+        # Fila 34 del archivo: cuarto bloque, después de escribir los tres primeros
+        content = self._content(_sample_records(45, seed=17), {34: self.BAD_JOB})
+        before = list(CampaignRecord.objects.order_by('id').values_list('id', 'content_hash'))
+        for mode in (StreamingImportPipeline.MODE_REPLACE, StreamingImportPipeline.MODE_APPEND):
+            self.loaded_frames = []
+            pipeline, importer, success = self._run(content, mode=mode)
+            self.assertFalse(success)
+            self.assertEqual(self.loaded_frames, [10, 10, 10])
+            self.assertEqual(pipeline.rows_loaded, 0)
+            self.assertEqual(importer.errors, ["Fila 34: job: 'chef' no es una ocupación válida."])
+            self.assertEqual((importer.rows_read, importer.rows_valid), (46, 45))
+            self.assertEqual(list(CampaignRecord.objects.order_by('id').values_list('id', 'content_hash')), before)
+
+    def test_error_rows_are_numbered_across_chunks(self):
+        # Errores en los bloques 2.º (fila 12), 3.º (filas 25 y 26) y 5.º (fila 43)
+        content = self._content(_sample_records(40, seed=18), {
+            12: self.BAD_DAY, 25: self.BAD_JOB, 26: self.BAD_DAY, 43: self.BAD_JOB,
+        })
+        pipeline, importer, success = self._run(content)
+        self.assertFalse(success)
+        self.assertEqual(self.loaded_frames, [10])
+        self.assertEqual(CampaignRecord.objects.count(), 15)
+        self.assertEqual(importer.errors, [
+            "Fila 12: day: El día debe estar entre 1 y 31.",
+            "Fila 25: job: 'chef' no es una ocupación válida.",
+            "Fila 26: day: El día debe estar entre 1 y 31.",
+            "Fila 43: job: 'chef' no es una ocupación válida.",
+        ])
+
+        # Con un `error_store`, los errores se guardan aunque la carga se revierta
+        job = ImportJob.objects.create(original_name='datos.csv')
+        _, importer, success = self._run(content, error_store=ImportErrorStore(job))
+        self.assertFalse(success)
+        self.assertEqual(importer.errors, [])
+        self.assertEqual(list(job.row_errors.order_by('row_number').values_list('row_number', flat=True)), [12, 25, 26, 43])
+
+    def test_successful_import(self):
+        records = _sample_records(35, seed=19)
+        _, importer, success = self._run(_records_csv(records))
+        self.assertTrue(success)
+        self.assertEqual(self.loaded_frames, [10, 10, 10, 5])
+        self.assertEqual(CampaignRecord.objects.count(), 35)
+
+    def test_append_builds_missing_cube(self):
+        # Sin cubo (p. ej. tras una migración), agregar registros lo calcula completo
+        CampaignCube.objects.all().delete()
+        _, _, success = self._run(_records_csv(_sample_records(20, seed=23)), mode=StreamingImportPipeline.MODE_APPEND)
+        self.assertTrue(success)
+        self.assertEqual(CampaignCube.objects.filter(dimension='').aggregate(total=Sum('record_count'))['total'], 35)
+
+
+class ImportErrorStoreTests(TestCase):
+
+    def setUp(self):
+        self.job = ImportJob.objects.create(original_name='datos.csv', status=ImportJob.STATUS_FAILED)
+        rows = [{} for _ in range(300)]
+        for i in range(0, 300, 2):
+            rows[i] = {'day': '40'}
+        for i in range(0, 300, 3):
+            rows[i] = {**rows[i], 'job': f'chef{i % 2}'}
+        _, row_errors = CampaignFrameValidator().validate_rows(pd.read_csv(io.BytesIO(_csv(rows)), sep=';'))
+        self.store = ImportErrorStore(self.job, batch_size=50)
+        self.store.add_row_errors(row_errors[:100], first_row_number=2)
+        self.store.add_row_errors(row_errors[100:], first_row_number=2)
+        self.store.add_error("Error general")
+        self.store.flush()
+        self.expected = CampaignFrameValidator.format_errors(row_errors, 2)
+
+    def test_pages_and_rows(self):
+        self.assertEqual(count_error_rows(self.job), 200)
+        self.assertEqual(get_error_page(self.job, page=1, page_size=150) + get_error_page(self.job, page=2, page_size=150), self.expected)
+        self.assertEqual(get_error_page(self.job, page=3, page_size=150), [])
+        self.assertEqual(self.job.errors, ["Error general"])
+        rows = list(iter_error_rows(self.job, chunk_size=40))
+        self.assertEqual(len(rows), ImportRowError.objects.filter(job=self.job).count())
+        self.assertEqual(rows[0], (2, 'job', 'invalid_choice', 'chef0', "'chef0' no es una ocupación válida."))
+
+    def test_groups_and_summary(self):
+        groups = get_error_groups(self.job, sample_size=3)
+        self.assertEqual(
+            [(group['field'], group['count'], group['message'], group['sample_rows']) for group in groups],
+            [
+                ('day', 150, "El día debe estar entre 1 y 31.", [2, 4, 6]),
+                ('job', 50, "'chef0' no es una ocupación válida.", [2, 8, 14]),
+                ('job', 50, "'chef1' no es una ocupación válida.", [5, 11, 17]),
+            ],
+        )
+        self.assertEqual(get_error_summary(self.job)[0], {'field': 'day', 'code': 'out_of_range', 'count': 150, 'code_display': 'Fuera de rango'})
+
+
+class ImportJobTests(TransactionTestCase):
+
+    def setUp(self):
+        for setting in ('MEDIA_ROOT', 'DATASET_SNAPSHOT_DIR'):
+            path = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, path, ignore_errors=True)
+            settings_override = override_settings(**{setting: path})
+            settings_override.enable()
+            self.addCleanup(settings_override.disable)
+
+    def _run(self, content, name='datos.csv', mode=ImportJob.MODE_REPLACE):
+        job = ImportJob.objects.create(original_name=name, mode=mode)
+        job.file.save(name, ContentFile(content))
+        run_import_job(job.pk)
+        job.refresh_from_db()
+        return job
+
+    def test_successful_import_writes_snapshot(self):
+        job = self._run(_records_csv(_sample_records(120, seed=10)))
+        self.assertEqual((job.status, job.rows_read, job.rows_valid, job.rows_loaded, job.error_count), (ImportJob.STATUS_DONE, 120, 120, 120, 0))
+        self.assertFalse(job.file)
+        progress = get_job_progress(job)
+        self.assertTrue(progress['finished'] and progress['success'])
+
+        snapshot = get_current_snapshot()
+        self.assertEqual((snapshot.rows, snapshot.meta['dataset_version']), (120, job.pk))
+        self.assertEqual(list(snapshot.column('id')), list(CampaignRecord.objects.order_by('id').values_list('id', flat=True)))
+
+    def test_failed_import_keeps_data(self):
+        self._run(_records_csv(_sample_records(30, seed=11)))
+        job = self._run(_records_csv(_sample_records(30, seed=12), extra_lines=[
+            '30;chef;married;primary;no;1;yes;no;cellular;1;may;1;1;1;1;success;no',
+        ]))
+        self.assertEqual((job.status, job.rows_loaded, job.error_count), (ImportJob.STATUS_FAILED, 0, 1))
+        self.assertEqual(get_error_page(job), ["Fila 32: job: 'chef' no es una ocupación válida."])
+        self.assertEqual(CampaignRecord.objects.count(), 30)
+        self.assertEqual(get_current_snapshot().rows, 30)
+
+    @override_settings(IMPORT_CHUNK_SIZE=10)
+    def test_row_errors_survive_a_failed_import(self):
+        # Los errores del primer bloque ya se escribieron cuando una excepción
+        # revierte la transacción de la importación
+        records = _sample_records(40, seed=15)
+        records[4].job = 'chef'
+        calls = []
+
+        def publish(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 4:  # En el tercer bloque
+                raise RuntimeError('caché no disponible')
+
+        with mock.patch('dashboard.services.import_jobs.cache.set', side_effect=publish):
+            job = self._run(_records_csv(records))
+        self.assertEqual(job.status, ImportJob.STATUS_FAILED)
+        self.assertEqual(get_error_page(job), ["Fila 6: job: 'chef' no es una ocupación válida."])
+        self.assertEqual(job.errors, ["Error crítico al interactuar con la base de datos: caché no disponible"])
+
+    def test_xls_is_rejected(self):
+        content = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1basura'
+        response = self.client.post(reverse('dashboard:upload_dataset'), {
+            'file': SimpleUploadedFile('datos.xls', content), 'mode': ImportJob.MODE_REPLACE,
+        })
+        self.assertContains(response, "Formato no soportado")
+        self.assertFalse(ImportJob.objects.exists())
+
+        job = self._run(content, name='datos.xls')
+        self.assertEqual(job.status, ImportJob.STATUS_FAILED)
+        self.assertEqual(job.errors, [ImporterFactory.UNSUPPORTED_MESSAGE])
+
+    def test_append_skips_existing_rows(self):
+        records = _sample_records(80, seed=13)
+        self._run(_records_csv(records[:60]))
+        job = self._run(_records_csv(records[40:]), mode=ImportJob.MODE_APPEND)
+        self.assertEqual((job.status, job.rows_valid, job.rows_loaded), (ImportJob.STATUS_DONE, 40, 20))
+        self.assertEqual(CampaignRecord.objects.count(), 80)
+
+    def test_duplicate_rows(self):
+        records = _sample_records(30, seed=20)
+        # Al reemplazar se guardan todas las filas, aunque estén repetidas
+        job = self._run(_records_csv(records + records[:10]))
+        self.assertEqual((job.status, job.rows_loaded), (ImportJob.STATUS_DONE, 40))
+        # Al agregar se omiten las que ya estaban, pero no las repetidas dentro del
+        # archivo (aunque caigan en bloques distintos)
+        new_records = _sample_records(40, seed=21)[30:]
+        with override_settings(IMPORT_CHUNK_SIZE=7):
+            job = self._run(_records_csv(records[:5] + new_records + new_records), mode=ImportJob.MODE_APPEND)
+        self.assertEqual((job.status, job.rows_valid, job.rows_loaded), (ImportJob.STATUS_DONE, 25, 20))
+        self.assertEqual(CampaignRecord.objects.count(), 60)
+
+    def test_excel_job(self):
+        job = self._run(_xlsx(_records_csv(_sample_records(40, seed=14))).getvalue(), name='datos.xlsx')
+        self.assertEqual((job.status, job.rows_loaded), (ImportJob.STATUS_DONE, 40))
+
+    def test_error_reports(self):
+        rows = [{'day': '40'} if i % 2 else {} for i in range(40)]
+        job = self._run(_csv(rows))
+        response = self.client.get(reverse('dashboard:import_job_result', args=[job.pk]))
+        self.assertEqual(len(response.context['errors']), 20)
+        self.assertEqual(self.client.session['error_report_id'], job.pk)
+
+        response = self.client.get(reverse('dashboard:generate_error_report'))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+        response = self.client.get(reverse('dashboard:export_error_report_csv'))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 21)
+        self.assertEqual(lines[1], '3,day,out_of_range,40,El día debe estar entre 1 y 31.')
+
+
+class SnapshotTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        CampaignRecord.objects.bulk_create(_sample_records(200, seed=15))
+
+    def setUp(self):
+        self.snapshot_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.snapshot_dir, ignore_errors=True)
+
+    def test_columns_match_database(self):
+        snapshot = write_snapshot(self.snapshot_dir, chunk_size=64)
+        self.assertEqual(snapshot.rows, 200)
+        self.assertIsInstance(snapshot.column('age'), np.memmap)
+        self.assertEqual(snapshot.column('age').dtype, np.int8)
+        frame = snapshot.to_frame()
+        expected = pd.DataFrame.from_records(
+            CampaignRecord.objects.order_by('id').values_list(*REQUIRED_COLUMNS), columns=REQUIRED_COLUMNS,
+        )
+        for col in REQUIRED_COLUMNS:
+            self.assertEqual(list(frame[col].astype(object)), list(expected[col]), col)
+
+    def test_current_version_and_cleanup(self):
+        self.assertIsNone(get_current_snapshot(self.snapshot_dir))
+        versions = [write_snapshot(self.snapshot_dir, keep=2).version for _ in range(3)]
+        self.assertEqual(get_current_snapshot(self.snapshot_dir).version, versions[-1])
+        self.assertEqual(sorted(name for name in os.listdir(self.snapshot_dir) if not name.startswith('.') and name != 'CURRENT'), versions[1:])
@@ -7,5 +7,8 @@ app_name = 'dashboard'
 
 urlpatterns = [
     path('', views.upload_dataset_view, name='upload_dataset'),
+    path('import-jobs/<int:job_id>/', views.import_job_result_view, name='import_job_result'),
+    path('api/import-jobs/<int:job_id>/', views.import_job_status_api_view, name='import_job_status'),
     path('generate-error-report/', views.generate_error_report_pdf_view, name='generate_error_report'),
+    path('generate-error-report/csv/', views.export_error_report_csv_view, name='export_error_report_csv'),
 ]
\ No newline at end of file
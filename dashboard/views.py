@@ -1,138 +1,137 @@
 # dashboard/views.py
 
-import io
-from datetime import datetime
-from django.shortcuts import render, redirect
-from django.http import HttpResponse
-from django.db import connection
+import csv
+from django.shortcuts import render, redirect, get_object_or_404
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
 from django.contrib import messages
 
-# Importaciones para la generación de PDF
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.units import inch
-
 from .forms import DatasetUploadForm
-from .models import CampaignRecord
-from .services.csv_importer import CsvDataImporter
-from history.models import QueryHistory
+from .models import ImportJob
+from .services.import_jobs import start_import_job, get_job_progress
+from .services.error_reports import count_error_rows, get_error_page, get_error_summary, iter_error_rows
+from .services.error_report_pdf import get_error_report_pdf
+
+ERROR_PAGE_SIZE = 100
 
 
 def upload_dataset_view(request):
-    if 'upload_errors' in request.session:
-        del request.session['upload_errors']
-    if 'error_report_filename' in request.session:
-        del request.session['error_report_filename']
+    """
+    Recibe el archivo y crea un trabajo de importación en segundo plano.
+    Responde de inmediato redirigiendo a la página de resultado del trabajo.
+    """
+    if 'error_report_id' in request.session:
+        del request.session['error_report_id']
 
     context = {'form': DatasetUploadForm()}
     
     if request.method == 'POST':
         form = DatasetUploadForm(request.POST, request.FILES)
         if form.is_valid():
-            uploaded_file = request.FILES['file']
-            
-            importer = CsvDataImporter(uploaded_file)
-            importer.process_file()
-            valid_records, errors = importer.get_results()
-
-            success = False
-
-            if valid_records and not errors:
-                try:
-                    with connection.cursor() as cursor:
-                        table_name_campaign = CampaignRecord._meta.db_table
-                        table_name_history = QueryHistory._meta.db_table
-                        cursor.execute(f'TRUNCATE TABLE "{table_name_campaign}" RESTART IDENTITY CASCADE;')
-                        cursor.execute(f'TRUNCATE TABLE "{table_name_history}" RESTART IDENTITY CASCADE;')
-
-                    CampaignRecord.objects.bulk_create(valid_records, batch_size=1000)
-                    
-                    context['success_message'] = f"¡Éxito! Se cargaron y validaron {len(valid_records)} registros. Los datos y el historial anterior han sido reiniciados."
-                    success = True # Solo se convierte en True si todo sale bien
-                except Exception as e:
-                    errors.append(f"Error crítico al interactuar con la base de datos: {str(e)}")
-            
-            if errors:
-                request.session['upload_errors'] = errors
-                request.session['error_report_filename'] = uploaded_file.name
-
-            context['errors'] = errors
-            context['records_loaded'] = len(valid_records) if success else 0
-            
-            if not success and valid_records:
-                 context['records_with_errors'] = len(errors) + len(valid_records)
-            else:
-                 context['records_with_errors'] = len(errors)
-
-            return render(request, 'dashboard/upload_result.html', context)
+            job = start_import_job(request.FILES['file'], mode=form.cleaned_data['mode'])
+            return redirect('dashboard:import_job_result', job_id=job.pk)
+        context['form'] = form
     
     return render(request, 'dashboard/upload_dataset.html', context)
 
 
-def generate_error_report_pdf_view(request):
+def import_job_result_view(request, job_id):
     """
-    Genera un reporte en PDF con los errores de validación
-    almacenados en la sesión.
+    Página de resultado de una importación. Mientras el trabajo corre
+    muestra el avance (consultando la API); al terminar, el resumen de
+    errores por campo y una página (`?page=N`) del detalle por fila.
     """
-    errors = request.session.get('upload_errors', [])
-    filename = request.session.get('error_report_filename', 'archivo_desconocido')
+    job = get_object_or_404(ImportJob, pk=job_id)
+    context = {'job': job}
+
+    if job.is_finished:
+        success = job.status == ImportJob.STATUS_DONE
+        if success:
+            if job.mode == ImportJob.MODE_APPEND:
+                skipped = job.rows_valid - job.rows_loaded
+                context['success_message'] = f"¡Éxito! Se agregaron {job.rows_loaded} registros nuevos ({skipped} ya existían y se omitieron). El historial se conservó."
+            else:
+                context['success_message'] = f"¡Éxito! Se cargaron y validaron {job.rows_loaded} registros. Los datos y el historial anterior han sido reiniciados."
+
+        if job.error_count:
+            # En la sesión solo se guarda el id; los errores están en la base de datos
+            request.session['error_report_id'] = job.pk
+
+            try:
+                page = max(int(request.GET.get('page', 1)), 1)
+            except ValueError:
+                page = 1
+            error_rows = count_error_rows(job)
+            context['general_errors'] = job.errors
+            context['error_summary'] = get_error_summary(job)
+            context['errors'] = get_error_page(job, page=page, page_size=ERROR_PAGE_SIZE)
+            context['error_page'] = page
+            context['error_num_pages'] = max((error_rows + ERROR_PAGE_SIZE - 1) // ERROR_PAGE_SIZE, 1)
+            context['has_errors'] = True
+
+        context['records_loaded'] = job.rows_loaded if success else 0
+
+        if not success and job.rows_valid:
+             context['records_with_errors'] = job.error_count + job.rows_valid
+        else:
+             context['records_with_errors'] = job.error_count
+
+    return render(request, 'dashboard/upload_result.html', context)
+
+
+def import_job_status_api_view(request, job_id):
+    """Endpoint de API con el avance de un trabajo de importación."""
+    job = get_object_or_404(ImportJob, pk=job_id)
+    return JsonResponse(get_job_progress(job))
 
-    if not errors:
+
+def _get_reported_job(request):
+    """Devuelve el trabajo cuyo id está en la sesión, si tiene errores."""
+    job = ImportJob.objects.filter(pk=request.session.get('error_report_id')).first()
+    if job is None or not job.error_count:
+        return None
+    return job
+
+
+def generate_error_report_pdf_view(request):
+    """
+    Genera un reporte en PDF con los errores de validación de la
+    importación cuyo id está en la sesión, agrupados por campo y mensaje.
+    El PDF se guarda en disco la primera vez y se envía por partes.
+    """
+    job = _get_reported_job(request)
+    if job is None:
         messages.error(request, 'No hay errores para generar un reporte.')
         return redirect('dashboard:upload_dataset')
 
-    # Crea un buffer en memoria para el archivo PDF
-    buffer = io.BytesIO()
+    path = get_error_report_pdf(job)
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename='reporte_de_errores.pdf', content_type='application/pdf')
 
-    # Crea el objeto PDF, usando el buffer como su "archivo".
-    p = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
 
-    # --- Estructura del PDF ---
-    p.setFont("Helvetica-Bold", 16)
-    p.drawCentredString(width / 2.0, height - 1 * inch, "Reporte de Errores de Validación")
+class _Echo:
+    """Pseudo-archivo para `csv.writer`: devuelve cada línea en lugar de guardarla."""
+    def write(self, value):
+        return value
 
-    p.setFont("Helvetica", 11)
-    p.drawString(0.75 * inch, height - 1.5 * inch, f"Archivo: {filename}")
-    p.drawString(0.75 * inch, height - 1.7 * inch, f"Fecha de Generación: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
-
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(0.75 * inch, height - 2.2 * inch, "Resumen:")
-    
-    p.setFont("Helvetica", 11)
-    p.drawString(1 * inch, height - 2.4 * inch, f"Total de filas con errores encontradas: {len(errors)}")
 
-    # Preparamos para escribir la lista de errores
-    text = p.beginText()
-    text.setTextOrigin(0.75 * inch, height - 3 * inch)
-    text.setFont("Courier", 9)
-    
-    # Escribimos los detalles de los errores
-    text.textLine("--- Log de Errores Detallado ---")
-    text.textLine("") # Espacio
-
-    for error in errors:
-        # Control simple de paginación
-        if text.getY() < 1 * inch:
-            p.drawText(text)
-            p.showPage() # Finaliza la página actual
-            text = p.beginText()
-            text.setTextOrigin(0.75 * inch, height - 1 * inch)
-            text.setFont("Courier", 9)
-
-        text.textLine(f"- {error}")
-    
-    p.drawText(text)
+def export_error_report_csv_view(request):
+    """
+    Exporta el detalle completo de los errores (una línea por campo inválido)
+    como CSV, generado por partes para no cargarlo en memoria.
+    """
+    job = _get_reported_job(request)
+    if job is None:
+        messages.error(request, 'No hay errores para generar un reporte.')
+        return redirect('dashboard:upload_dataset')
 
-    # Cierra el objeto PDF y lo guarda
-    p.showPage()
-    p.save()
+    writer = csv.writer(_Echo())
 
-    # Regresa el cursor del buffer al inicio para poder leerlo
-    buffer.seek(0)
-    
-    # Crea la respuesta HTTP con el tipo de contenido para PDF
-    response = HttpResponse(buffer, content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="reporte_de_errores.pdf"'
+    def rows():
+        yield writer.writerow(['Fila', 'Campo', 'Código', 'Valor', 'Mensaje'])
+        for error in job.errors:
+            yield writer.writerow(['', '', '', '', error])
+        for row in iter_error_rows(job):
+            yield writer.writerow(row)
 
-    return response
\ No newline at end of file
+    response = StreamingHttpResponse(rows(), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="detalle_de_errores.csv"'
+    return response